@@ -9,16 +9,23 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 # myproject/asgi.py
 import os
+from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 from django.urls import path
-from CodeEditor import consumers  # adjust the import according to your app name
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CodeEditor.settings')
 
+# Set up Django before importing consumers, which use the editor app.
+django_asgi_app = get_asgi_application()
+
+from CodeEditor import consumers  # adjust the import according to your app name
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": URLRouter([
+    "http": django_asgi_app,
+    # The session user lets RunJobConsumer check who started a job.
+    "websocket": AuthMiddlewareStack(URLRouter([
         path("ws/java/", consumers.JavaLanguageServerConsumer.as_asgi()),
-    ]),
-})
\ No newline at end of file
+        path("ws/run-jobs/<str:job_id>/", consumers.RunJobConsumer.as_asgi()),
+    ])),
+})
@@ -1,6 +1,8 @@
 # myapp/consumers.py
 import asyncio
-from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
+
+from editor import jobs
 
 
 class JavaLanguageServerConsumer(AsyncWebsocketConsumer):
@@ -46,3 +48,46 @@ class JavaLanguageServerConsumer(AsyncWebsocketConsumer):
         except asyncio.CancelledError:
             # Task was cancelled on disconnect.
             pass
+
+
+class RunJobConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams one run job's progress events (see editor/jobs.py) as JSON:
+    every event recorded so far on connect, then new ones as they happen.
+    The socket is closed after the done event.
+    """
+
+    async def connect(self):
+        self.job = jobs.get(self.scope["url_route"]["kwargs"]["job_id"])
+        user = self.scope.get("user")
+        if self.job is None or (self.job.owner_id is not None and getattr(user, "pk", None) != self.job.owner_id):
+            await self.close(code=4404)
+            return
+        await self.accept()
+        self.stream_task = asyncio.create_task(self.stream_events())
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'stream_task'):
+            self.stream_task.cancel()
+
+    async def stream_events(self):
+        past, queue = self.job.subscribe()
+        try:
+            for event in past:
+                await self.send_json(event)
+                if event["type"] == "done":
+                    await self.close()
+                    return
+            while True:
+                event = await queue.get()
+                # Events published while we were replaying are already sent.
+                if event["seq"] < len(past):
+                    continue
+                await self.send_json(event)
+                if event["type"] == "done":
+                    await self.close()
+                    return
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.job.unsubscribe(queue)
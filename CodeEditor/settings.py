@@ -189,3 +189,117 @@ def require(name: str) -> str:
 QUALTRICS_PREASSESSMENT_LINK = require("QUALTRICS_PREASSESSMENT_LINK")
 QUALTRICS_POSTASSESSMENT_LINK = require("QUALTRICS_POSTASSESSMENT_LINK")
 SITE_URL = env.str("SITE_URL", default="")  # e.g., https://codeeditor2025.pythonanywhere.com
+
+# --- Java execution ---
+JAVA_BIN = env.str("JAVA_BIN", default="java")
+JAVAC_BIN = env.str("JAVAC_BIN", default="javac")
+JAVA_SUPPORT_DIR = BASE_DIR / "java"  # runner / harness sources shipped with the app
+EXECUTION_CACHE_DIR = Path(env.str("EXECUTION_CACHE_DIR", default=str(BASE_DIR / ".cache")))
+
+# Run all IO test cases of a submission in one JVM when the pool is off (editor/harness.py)
+IO_HARNESS_ENABLED = env.bool("IO_HARNESS_ENABLED", default=True)
+
+# In SUBMIT mode, run the test cases that fail most often first (editor/grading.py)
+ADAPTIVE_TEST_ORDER_ENABLED = env.bool("ADAPTIVE_TEST_ORDER_ENABLED", default=True)
+
+# Warm runner JVMs shared by run_code and submit_all (editor/jvm_pool.py)
+JVM_POOL_ENABLED = env.bool("JVM_POOL_ENABLED", default=True)
+JVM_POOL_SIZE = env.int("JVM_POOL_SIZE", default=4)
+JVM_POOL_MAX_RUNS = env.int("JVM_POOL_MAX_RUNS", default=200)  # recycle a worker after this many runs
+JVM_POOL_MAX_HEAP_MB = env.int("JVM_POOL_MAX_HEAP_MB", default=192)  # ...or once it retains this much heap
+JVM_POOL_XMX_MB = env.int("JVM_POOL_XMX_MB", default=256)  # only runs with exactly this memory limit use the pool
+JVM_POOL_WAIT_SECONDS = env.int("JVM_POOL_WAIT_SECONDS", default=30)  # for a free worker, then a fresh JVM is used
+
+# Pre-started one-run JVMs for fresh-JVM runs, when JVMs are not shared (editor/standby.py)
+STANDBY_JVM_ENABLED = env.bool("STANDBY_JVM_ENABLED", default=not JVM_POOL_ENABLED)
+STANDBY_JVM_MAX_DEPTH = env.int("STANDBY_JVM_MAX_DEPTH", default=8)  # per (memory, stack) limit pair
+STANDBY_JVM_MAX_TOTAL = env.int("STANDBY_JVM_MAX_TOTAL", default=16)  # per process, across limit pairs
+STANDBY_JVM_WINDOW_SECONDS = env.int("STANDBY_JVM_WINDOW_SECONDS", default=120)  # arrival rate window; idle queues drain after it
+STANDBY_JVM_START_TIMEOUT_SECONDS = env.int("STANDBY_JVM_START_TIMEOUT_SECONDS", default=10)
+
+# Warm JShell sessions that run UNIT cases without a JVM launch (editor/jshell_pool.py).
+# Off until its verdicts are known to match the harness's.
+JSHELL_POOL_ENABLED = env.bool("JSHELL_POOL_ENABLED", default=False)
+JSHELL_POOL_SIZE = env.int("JSHELL_POOL_SIZE", default=2)
+JSHELL_POOL_MAX_RUNS = env.int("JSHELL_POOL_MAX_RUNS", default=100)  # recycle a runner after this many submissions
+JSHELL_POOL_MAX_HEAP_MB = env.int("JSHELL_POOL_MAX_HEAP_MB", default=192)  # ...or once it retains this much heap
+JSHELL_POOL_XMX_MB = env.int("JSHELL_POOL_XMX_MB", default=256)  # only questions with this memory limit use it
+JSHELL_POOL_COMPILE_TIMEOUT_SECONDS = env.int("JSHELL_POOL_COMPILE_TIMEOUT_SECONDS", default=10)
+
+# Flags for every JVM that runs participant code, plus the AppCDS archive built by manage.py build_cds_archive (editor/cds.py)
+JVM_STARTUP_FLAGS = env.str("JVM_STARTUP_FLAGS", default="-XX:+UseSerialGC -XX:TieredStopAtLevel=1 -XX:-UsePerfData")
+CDS_ENABLED = env.bool("CDS_ENABLED", default=True)
+CDS_AUTO_BUILD = env.bool("CDS_AUTO_BUILD", default=True)  # rebuild in the background when the JDK or runner changed
+
+# Where grade() executes test cases: subprocess, pool, queue or remote (editor/grading.py)
+GRADING_BACKEND = env.str("GRADING_BACKEND", default="pool" if JVM_POOL_ENABLED else "subprocess")
+GRADING_REMOTE_URL = env.str("GRADING_REMOTE_URL", default="")  # a worker's /grade/ endpoint
+GRADING_REMOTE_TOKEN = env.str("GRADING_REMOTE_TOKEN", default="")  # shared secret; workers reject requests without it
+GRADING_REMOTE_TIMEOUT_SECONDS = env.int("GRADING_REMOTE_TIMEOUT_SECONDS", default=120)
+
+# Grading jobs queued for manage.py grading_worker when GRADING_BACKEND=queue (editor/grading_queue.py)
+GRADING_QUEUE_LEASE_SECONDS = env.int("GRADING_QUEUE_LEASE_SECONDS", default=120)  # renewed while grading; a job not renewed for this long is retried
+GRADING_QUEUE_MAX_ATTEMPTS = env.int("GRADING_QUEUE_MAX_ATTEMPTS", default=3)
+GRADING_QUEUE_WAIT_SECONDS = env.int("GRADING_QUEUE_WAIT_SECONDS", default=180)  # how long a web request waits for its verdict
+GRADING_QUEUE_POLL_SECONDS = env.float("GRADING_QUEUE_POLL_SECONDS", default=0.1)
+
+# In-memory javac daemons behind compile_java_file (editor/javac_service.py)
+JAVAC_DAEMON_ENABLED = env.bool("JAVAC_DAEMON_ENABLED", default=True)
+JAVAC_DAEMON_XMX_MB = env.int("JAVAC_DAEMON_XMX_MB", default=512)
+JAVAC_DAEMON_RETRY_SECONDS = env.int("JAVAC_DAEMON_RETRY_SECONDS", default=30)  # back-off after a failed start
+JAVAC_DAEMON_POOL_SIZE = env.int("JAVAC_DAEMON_POOL_SIZE", default=2)  # compiles that can run at once
+JAVAC_DAEMON_TIMEOUT_SECONDS = env.int("JAVAC_DAEMON_TIMEOUT_SECONDS", default=20)  # then javac runs as a subprocess
+
+# Content-addressed compile cache shared by run and submit (editor/compile_cache.py)
+COMPILE_CACHE_ENABLED = env.bool("COMPILE_CACHE_ENABLED", default=True)
+COMPILE_CACHE_MAX_MB = env.int("COMPILE_CACHE_MAX_MB", default=256)  # LRU-evicted past this size
+
+# Incremental builds of multi-file questions per participant (editor/builds.py)
+INCREMENTAL_BUILD_ENABLED = env.bool("INCREMENTAL_BUILD_ENABLED", default=True)
+INCREMENTAL_BUILD_MAX_ENTRIES = env.int("INCREMENTAL_BUILD_MAX_ENTRIES", default=2000)  # LRU-evicted past this
+
+# Compile-only checks behind the editor's as-you-type markers (editor/compile_check.py)
+COMPILE_CHECK_MAX_PARALLEL = env.int("COMPILE_CHECK_MAX_PARALLEL", default=2)  # per process, also its javac daemons
+COMPILE_CHECK_MAX_EDITORS = env.int("COMPILE_CHECK_MAX_EDITORS", default=4096)  # editors whose newest request is kept
+COMPILE_CHECK_CACHE_SIZE = env.int("COMPILE_CHECK_CACHE_SIZE", default=2048)  # responses kept per source hash
+
+# Graded verdicts per (source hash, question, suite version) (editor/verdict_cache.py).
+# Bump VERSION when the shape of a verdict changes so old entries are ignored.
+VERDICT_CACHE_TIMEOUT = env.int("VERDICT_CACHE_TIMEOUT", default=7 * 24 * 3600)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "verdicts": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": EXECUTION_CACHE_DIR / "verdicts",
+        "VERSION": 3,
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+}
+
+# Max programs running at once across all participants, sync and async views alike (editor/parallel.py)
+EXECUTION_MAX_PARALLEL = env.int("EXECUTION_MAX_PARALLEL", default=os.cpu_count() or 2)
+
+# Async run_code / submit_all (editor/parallel.py)
+ASYNC_EXECUTION_THREADS = env.int("ASYNC_EXECUTION_THREADS", default=16)  # dedicated executor for blocking work
+
+# Fair-share admission in front of grading, per process (editor/scheduler.py)
+SCHEDULER_MAX_ACTIVE = env.int("SCHEDULER_MAX_ACTIVE", default=EXECUTION_MAX_PARALLEL)  # gradings at once
+SCHEDULER_MAX_QUEUE_DEPTH = env.int("SCHEDULER_MAX_QUEUE_DEPTH", default=64)  # Runs past this many waiting get HTTP 429
+SCHEDULER_MAX_QUEUED_PER_USER = env.int("SCHEDULER_MAX_QUEUED_PER_USER", default=3)
+
+# Run jobs streamed over WebSockets (editor/jobs.py)
+RUN_JOB_TTL_SECONDS = env.int("RUN_JOB_TTL_SECONDS", default=600)  # how long finished jobs can be replayed
+
+# Extra bytes of output allowed past a test case's expected output before the run is stopped (editor/comparators.py)
+OUTPUT_COMPARE_MARGIN_BYTES = env.int("OUTPUT_COMPARE_MARGIN_BYTES", default=16 * 1024)
+
+# Reused scratch directories for compile and run (editor/workspaces.py); blank root = EXECUTION_CACHE_DIR/workspaces.
+# /dev/shm/codeeditor-workspaces keeps them in RAM, but the quota only caps each file a run writes, not their total.
+WORKSPACE_ROOT = env.str("WORKSPACE_ROOT", default="")
+WORKSPACE_POOL_SIZE = env.int("WORKSPACE_POOL_SIZE", default=16)  # per process; extra ones are made when all are busy
+WORKSPACE_QUOTA_MB = env.int("WORKSPACE_QUOTA_MB", default=64)  # per file while a run is going; in total at check-in
+
+# Threads a fresh JVM starts on its own; not counted against a question's thread_limit (editor/sandbox.py)
+EXECUTION_JVM_BASE_THREADS = env.int("EXECUTION_JVM_BASE_THREADS", default=20)
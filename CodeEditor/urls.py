@@ -21,7 +21,7 @@ import control_app
 from control_app.views import ControlLoginView
 from editor import views as experimental_views
 from control_app import views as control_views
-from editor.views import create_or_edit_questions, delete_question
+from editor.views import create_or_edit_questions, delete_question, execution_stats, grade_remote
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -34,6 +34,8 @@ urlpatterns = [
     path('questions/', create_or_edit_questions, name='create-or-edit-questions'),
     path('questions/<int:question_id>/', create_or_edit_questions, name='create-or-edit-questions'),
     path('questions/delete/<int:question_id>/', delete_question, name='delete-question'),
+    path('execution-stats/', execution_stats, name='execution-stats'),
+    path('grade/', grade_remote, name='grade-remote'),
     path("pre-assessment/", control_views.pre_assessment_questionnaire, name="pre-assessment"),
     path("pre-assessment-complete/", control_views.pre_assessment_complete, name="pre-survey-complete"),
     path("post-assessment/", control_app.views.post_assessment_questionnaire, name="post-assessment"),
@@ -1,12 +1,14 @@
 from django.urls import path
 from control_app import views
-from control_app.views import run_code, submit_all
+from control_app.views import run_code_async, submit_all_async
 
 app_name = "control_app"
 
 urlpatterns = [
-    path('run-code/', run_code, name='run-code'),
+    path('run-code/', run_code_async, name='run-code'),
+    path('run-code/jobs/', views.run_job, name='run-job'),
+    path('compile-check/', views.compile_check, name='compile-check'),
     path('editor/', views.editor, name='editor'),
-    path('submit-all/', submit_all, name='submit-all'),
+    path('submit-all/', submit_all_async, name='submit-all'),
 
 ]
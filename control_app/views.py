@@ -1,12 +1,12 @@
 import hashlib
 import json
 import os
-import subprocess
-import tempfile
 import secrets
 from datetime import datetime
 from sqlite3 import IntegrityError
 
+from asgiref.sync import sync_to_async
+
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
@@ -24,7 +24,8 @@ from django.views.decorators.http import require_POST
 from CodeEditor import settings
 from decorators import *
 from editor.models import ParticipantProfile, Questions, Submission, AITelemetry
-from editor.views import compile_java_file, execute_java_file
+from editor import grading, scheduler, sources
+from editor.views import compile_check as start_compile_check, parse_run_request, start_run_job, too_busy
 
 signer = TimestampSigner(salt="pre-survey-v1")
 
@@ -149,10 +150,40 @@ def submit_all(request):
     Records a Submission per question, updates profile,
     then returns JSON with the next URL to redirect to.
     """
+    questions, codes = _load_submission(request)
+    pairs = list(zip(questions, codes))
+    ticket = scheduler.admit_submission(request.user.pk, pairs, grading.SUBMIT)
+    verdicts = ticket.run(lambda: grading.grade_many(pairs, grading.SUBMIT, safe=True, owner_id=request.user.pk))
+    return _record_submit_all(request, questions, codes, verdicts)
+
+
+@async_login_required
+async def submit_all_async(request):
+    """
+    Async submit_all (same POST params and JSON). Grading runs on the event
+    loop; the database and session work stays in sync_to_async.
+    """
+    questions, codes = await sync_to_async(_load_submission)(request)
+    pairs = list(zip(questions, codes))
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    ticket = scheduler.admit_submission(owner_id, pairs, grading.SUBMIT)
+    verdicts = await ticket.run_async(
+        lambda: grading.grade_many_async(pairs, grading.SUBMIT, safe=True, owner_id=owner_id))
+    return await sync_to_async(_record_submit_all)(request, questions, codes, verdicts)
+
+
+def _load_submission(request):
+    """The posted questions (test cases prefetched) and their code, in posted order."""
     question_ids = request.POST.getlist('question_id')
     codes = request.POST.getlist('code')
     print("POSTed QIDs:", question_ids)
 
+    questions = [get_object_or_404(Questions.objects.prefetch_related("test_cases", "files"), pk=int(qid))
+                 for qid in question_ids[:len(codes)]]
+    return questions, codes
+
+
+def _record_submit_all(request, questions, codes, verdicts):
     profile = request.user.participantprofile
     is_ctrl = profile.group == ParticipantProfile.CONTROL
 
@@ -160,43 +191,19 @@ def submit_all(request):
     control_pass = request.session.get("control_pass", 1)
 
     wrong_ids = []
-    # loop through each pair
-    for qid, code in zip(question_ids, codes):
-        q = get_object_or_404(Questions, pk=int(qid))
-        # compile & run
-        is_correct = False
-        try:
-            with tempfile.TemporaryDirectory() as tmp:
-                cp = compile_java_file(code, "Main.java", tmp)
-                if cp.returncode == 0:
-                    if q.question_type == "IO":
-                        is_correct = all(
-                            execute_java_file("Main", tmp, input_data=tc.test_input).strip()
-                            == tc.expected_output.strip()
-                            for tc in q.test_cases.all()
-                        )
-                    else:
-                        # unit‐test path (CountPositiveRunner)
-                        runner_src = "/Users/jaden/PycharmProjects/CodeEditor/java/CountPositiveRunner.java"
-                        dst = os.path.join(tmp, "CountPositiveRunner.java")
-                        subprocess.run(["cp", runner_src, dst], check=True)
-                        cr = subprocess.run(["javac", dst], capture_output=True, text=True)
-                        if cr.returncode == 0:
-                            out = execute_java_file("CountPositiveRunner", tmp).splitlines()
-                            actual = next((l.split("Actual:")[1].strip()
-                                           for l in out if l.startswith("Actual:")), None)
-                            is_correct = (actual == "6")
-        except:
-            is_correct = False
-
-        # record submission
-        Submission.objects.create(
+    # then record every submission at once
+    new_submissions = []
+    for q, verdict in zip(questions, verdicts):
+        is_correct = grading.passed(verdict)
+
+        new_submissions.append(Submission(
             user=request.user,
             question=q,
             attempt_no=control_pass,
             used_ai=(is_ctrl and control_pass == 2),
-            is_correct=is_correct
-        )
+            is_correct=is_correct,
+            resource_usage=verdict.get("usage"),
+        ))
 
         # update profile counters
         if control_pass == 1:
@@ -208,9 +215,13 @@ def submit_all(request):
         if not is_correct and control_pass == 1:
             wrong_ids.append(q.id)
 
-    print(">> received qids:", question_ids)
+    print(">> received qids:", [q.id for q in questions])
     print(">> received codes:", len(codes), "items")
-    profile.save()
+    with transaction.atomic():
+        sources.attach(new_submissions, codes)
+        Submission.objects.bulk_create(new_submissions)
+        profile.save()
+        grading.record_outcomes(verdicts)
 
     # now decide where to go
     if is_ctrl:
@@ -255,14 +266,9 @@ def run_code(request):
       - question_id: the ID of the Questions object to run against
     Returns JSON: { results: [ { input, expected_output, actual_output, passed }, … ] }
     """
-    code = request.POST.get("code", "").strip()
-    qid = request.POST.get("question_id")
-
-    # Basic validation
-    if not code:
-        return JsonResponse({"error": "No code provided."}, status=400)
-    if not qid:
-        return JsonResponse({"error": "No question_id provided."}, status=400)
+    code, qid, error = parse_run_request(request)
+    if error:
+        return error
 
     # Lookup question
     try:
@@ -270,66 +276,53 @@ def run_code(request):
     except (Questions.DoesNotExist, ValueError):
         return JsonResponse({"error": "Invalid question_id."}, status=400)
 
-    test_cases = question.test_cases.all()
-    results = []
-
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 1) Compile Main.java
-            cp = compile_java_file(code, "Main.java", temp_dir)
-            if cp.returncode != 0:
-                return JsonResponse({"error": cp.stderr}, status=200)
-
-            # 2) Branch on question type
-            if question.question_type == "IO":
-                # For each test case, run Main with test_input
-                for tc in test_cases:
-                    out = execute_java_file("Main", temp_dir, input_data=tc.test_input)
-                    expected = tc.expected_output.strip()
-                    actual = out.strip()
-                    results.append({
-                        "input": tc.test_input,
-                        "expected_output": expected,
-                        "actual_output": actual,
-                        "passed": actual == expected
-                    })
+        ticket = scheduler.admit_run(request.user.pk, question, code, grading.RUN)
+    except scheduler.Overloaded as e:
+        return too_busy(e)
+    try:
+        verdict = ticket.run(lambda: grading.grade(question, code, grading.RUN, owner_id=request.user.pk))
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    return JsonResponse(verdict)
 
-            else:
-                # Unit test via your existing CountPositiveRunner.java
-                runner_src = "/Users/jaden/PycharmProjects/CodeEditor/java/CountPositiveRunner.java"
-                dest = os.path.join(temp_dir, "CountPositiveRunner.java")
-                subprocess.run(["cp", runner_src, dest], check=True)
-
-                # Compile the runner
-                cr = subprocess.run(
-                    ["javac", dest], capture_output=True, text=True
-                )
-                if cr.returncode != 0:
-                    return JsonResponse({"error": cr.stderr}, status=200)
-
-                # Run the runner
-                out = execute_java_file("CountPositiveRunner", temp_dir)
-
-                # Parse lines for “Actual:” prefix
-                actual_val = None
-                for line in out.splitlines():
-                    if line.startswith("Actual:"):
-                        actual_val = line.split("Actual:")[1].strip()
-                        break
-
-                expected_val = "6"
-                passed = (actual_val == expected_val)
-                results.append({
-                    "input": None,
-                    "expected_output": expected_val,
-                    "actual_output": actual_val or out,
-                    "passed": passed
-                })
 
+@async_login_required
+async def run_code_async(request):
+    """Async run_code (same POST params and JSON); see editor.views.run_code_async."""
+    code, qid, error = parse_run_request(request)
+    if error:
+        return error
+
+    try:
+        question = await Questions.objects.prefetch_related("test_cases", "files").aget(pk=int(qid))
+    except (Questions.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Invalid question_id."}, status=400)
+
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    try:
+        ticket = scheduler.admit_run(owner_id, question, code, grading.RUN)
+    except scheduler.Overloaded as e:
+        return too_busy(e)
+    try:
+        verdict = await ticket.run_async(lambda: grading.grade_async(question, code, grading.RUN, owner_id=owner_id))
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-    return JsonResponse({"results": results})
+    return JsonResponse(verdict)
+
+
+@async_login_required
+async def run_job(request):
+    """Job-based run_code streamed over a WebSocket; see editor.views.start_run_job."""
+    return await start_run_job(request)
+
+
+@async_login_required
+async def compile_check(request):
+    """Compile-only diagnostics for the editor's markers; see editor.views.compile_check."""
+    return await start_compile_check(request)
 
 
 @login_required(login_url='login')
@@ -1,4 +1,6 @@
 from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 from django.urls import reverse
@@ -80,3 +82,21 @@ def guard_post(view):
         return view(request, *a, **kw)
 
     return w
+
+
+def async_login_required(view=None, login_url=None):
+    """
+    login_required for async views; Django 4.2's decorator only wraps sync ones.
+    Usable bare (@async_login_required) or with login_url=....
+    """
+    def decorator(view):
+        @wraps(view)
+        async def w(request, *a, **kw):
+            is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+            if not is_authenticated:
+                return redirect_to_login(request.get_full_path(), login_url)
+            return await view(request, *a, **kw)
+
+        return w
+
+    return decorator(view) if view else decorator
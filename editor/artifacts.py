@@ -0,0 +1,145 @@
+"""
+Registry of precompiled grading artifacts: the runner, harness and javac
+daemon classes shipped in JAVA_SUPPORT_DIR.
+
+Each artifact is compiled once into EXECUTION_CACHE_DIR/artifacts/<Name>-<hash>,
+where the hash covers the source and the JDK version. A changed source or
+JDK therefore gets a new directory instead of overwriting one a running JVM
+may be loading from. Built directories are made read-only and go on the
+classpath of every run as they are, without being copied anywhere.
+
+``manage.py build_grading_artifacts`` builds everything at deploy time,
+saving a question makes sure the artifacts it is graded with exist, and
+anything still missing is built on first use.
+"""
+import functools
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+ARTIFACTS = ("PooledRunner", "MultiCaseHarness", "StandbyRunner", "CompileServer", "JShellRunner")
+
+_lock = threading.Lock()
+_current = {}  # name -> (source mtime, directory) for the version last resolved
+
+
+@functools.lru_cache(maxsize=1)
+def jdk_version():
+    """The ``javac -version`` string, part of every artifact and compile cache key."""
+    try:
+        proc = subprocess.run([settings.JAVAC_BIN, "-version"], capture_output=True, text=True)
+        return (proc.stdout or proc.stderr).strip()
+    except OSError:
+        return "unknown"
+
+
+def _root():
+    return Path(settings.EXECUTION_CACHE_DIR) / "artifacts"
+
+
+def _source(name):
+    return Path(settings.JAVA_SUPPORT_DIR) / f"{name}.java"
+
+
+def version(name):
+    """Content hash of an artifact's source and the JDK compiling it."""
+    digest = hashlib.sha256(jdk_version().encode() + b"\0" + _source(name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _make_read_only(directory):
+    for path in sorted(directory.rglob("*"), reverse=True):
+        path.chmod(0o555 if path.is_dir() else 0o444)
+    directory.chmod(0o555)
+
+
+def _remove(directory):
+    # Read-only directories have to be made writable before their files can go.
+    for path in [directory, *directory.rglob("*")]:
+        if path.is_dir():
+            path.chmod(stat.S_IRWXU)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def build(name):
+    """
+    Compiles the current version of an artifact unless it is already there
+    and returns its directory. Raises subprocess.CalledProcessError if javac
+    fails.
+    """
+    target = _root() / f"{name}-{version(name)}"
+    if target.is_dir():
+        return target
+
+    staging = _root() / f".{target.name}.{uuid.uuid4().hex}"
+    staging.mkdir(parents=True)
+    try:
+        subprocess.run(
+            [settings.JAVAC_BIN, "-d", str(staging), str(_source(name))],
+            capture_output=True,
+            check=True,
+        )
+        _make_read_only(staging)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            if not target.is_dir():
+                raise
+            # another process built the same version first
+    finally:
+        if staging.exists():
+            _remove(staging)
+    if settings.DEBUG:
+        print(f"[DEBUG] built grading artifact {target.name}")
+    return target
+
+
+def classpath(name):
+    """The read-only directory holding the current version of an artifact."""
+    mtime = _source(name).stat().st_mtime_ns
+    with _lock:
+        cached = _current.get(name)
+        if cached is None or cached[0] != mtime or not os.path.isdir(cached[1]):
+            cached = _current[name] = (mtime, str(build(name)))
+        return cached[1]
+
+
+def for_question(question):
+    """The artifacts a question is graded with."""
+    if question.question_type == "IO" and settings.GRADING_BACKEND == "pool":
+        return ["PooledRunner", "MultiCaseHarness"]
+    if question.question_type == "UNIT" and settings.JSHELL_POOL_ENABLED:
+        return ["JShellRunner", "MultiCaseHarness"]
+    return ["MultiCaseHarness"]
+
+
+def prepare(question):
+    """Builds a question's artifacts now so its first run does not wait for javac."""
+    for name in for_question(question):
+        try:
+            classpath(name)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"[WARN] could not build grading artifact {name}: {e}")
+
+
+def prune():
+    """Removes artifact versions other than the current ones. Returns their names."""
+    keep = {f"{name}-{version(name)}" for name in ARTIFACTS}
+    removed = []
+    for path in _root().glob("*") if _root().is_dir() else []:
+        if path.is_dir() and path.name not in keep:
+            _remove(path)
+            removed.append(path.name)
+    return removed
+
+
+def snapshot():
+    with _lock:
+        return {name: os.path.basename(directory) for name, (_, directory) in _current.items()}
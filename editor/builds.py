@@ -0,0 +1,247 @@
+"""
+Incremental compilation of multi-file questions.
+
+A question can come with extra source files (QuestionFile) that compile
+together with the participant's Main.java. For each participant and
+question the class files of the last successful build are kept under
+EXECUTION_CACHE_DIR/builds, along with the hash of every source file and
+the class files each one produced (read from the SourceFile attribute javac
+writes into every class). The next build copies in the classes of the files
+that did not change and gives javac only the changed ones, with those
+classes on the classpath.
+
+An unchanged file is compiled again too when it mentions a type declared in
+a changed file, so a changed signature still gives the compile error (and a
+changed constant still gets inlined) as in a full build. Everything is
+compiled when there is no previous build, the JDK changed, or a class file
+could not be traced back to its source. The shared compile cache
+(editor/compile_cache.py) is consulted first, so a file set anyone already
+compiled is served from there. At most INCREMENTAL_BUILD_MAX_ENTRIES builds
+are kept; the least recently used go first.
+"""
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from editor import artifacts, compile_cache, javac_service
+
+_MANIFEST = "manifest.json"
+_CLASSES = "classes"
+
+_U2 = struct.Struct(">H")
+_U4 = struct.Struct(">I")
+# bytes after the tag of each constant pool entry type; Utf8 (1) is length-prefixed
+_CONSTANT_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4, 15: 3, 16: 2, 17: 4, 18: 4,
+                   19: 2, 20: 2}
+
+# "class Foo", "interface Bar", "enum Baz", "record Qux"
+_DECLARATION = re.compile(r"\b(?:class|interface|enum|record)\s+([A-Za-z_$][\w$]*)")
+
+_lock = threading.Lock()
+_entries = None  # lazily counted, then kept up to date in-process
+counters = {"builds": 0, "full": 0, "incremental": 0, "files_compiled": 0, "files_reused": 0, "evictions": 0}
+
+
+def _skip_attributes(data, offset):
+    (count,) = _U2.unpack_from(data, offset)
+    offset += 2
+    for _ in range(count):
+        offset += 6 + _U4.unpack_from(data, offset + 2)[0]
+    return offset
+
+
+def source_file(path):
+    """The SourceFile attribute of a class file, e.g. "Main.java", or None."""
+    try:
+        data = Path(path).read_bytes()
+        if data[:4] != b"\xca\xfe\xba\xbe":
+            return None
+        (count,) = _U2.unpack_from(data, 8)
+        utf8 = {}
+        offset, index = 10, 1
+        while index < count:
+            tag = data[offset]
+            offset += 1
+            if tag == 1:
+                (length,) = _U2.unpack_from(data, offset)
+                utf8[index] = data[offset + 2:offset + 2 + length]
+                offset += 2 + length
+            else:
+                offset += _CONSTANT_SIZES[tag]
+            index += 2 if tag in (5, 6) else 1  # longs and doubles take two slots
+        offset += 6  # access flags, this class, super class
+        (interfaces,) = _U2.unpack_from(data, offset)
+        offset += 2 + 2 * interfaces
+        for _ in range(2):  # fields, then methods
+            (members,) = _U2.unpack_from(data, offset)
+            offset += 2
+            for _ in range(members):
+                offset = _skip_attributes(data, offset + 6)
+        (attributes,) = _U2.unpack_from(data, offset)
+        offset += 2
+        for _ in range(attributes):
+            (name,) = _U2.unpack_from(data, offset)
+            if utf8.get(name) == b"SourceFile":
+                return utf8[_U2.unpack_from(data, offset + 6)[0]].decode()
+            offset += 6 + _U4.unpack_from(data, offset + 2)[0]
+    except (OSError, KeyError, IndexError, struct.error, UnicodeDecodeError):
+        pass
+    return None
+
+
+def _root():
+    return Path(settings.EXECUTION_CACHE_DIR) / "builds"
+
+
+def _class_files(directory):
+    directory = Path(directory)
+    return sorted(str(p.relative_to(directory)) for p in directory.rglob("*.class"))
+
+
+def _type_name(rel):
+    """The top-level type a class file belongs to: "Helper$Node.class" -> "Helper"."""
+    return os.path.basename(rel)[:-len(".class")].split("$", 1)[0]
+
+
+def _load(entry):
+    try:
+        with open(entry / _MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("jdk") != artifacts.jdk_version():
+        return None
+    return manifest
+
+
+def _copy(source_dir, out_dir, rels):
+    for rel in rels:
+        dest = Path(out_dir) / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(Path(source_dir) / rel, dest)
+
+
+def _plan(sources, hashes, previous):
+    """The files to hand javac: the changed ones and the unchanged ones that mention their types."""
+    changed = {name for name in sources if previous["files"].get(name) != hashes[name]}
+    gone = changed | (set(previous["files"]) - set(sources))
+    types = {_type_name(rel) for name in gone for rel in previous["classes"].get(name, [])}
+    for name in changed:
+        types.update(_DECLARATION.findall(sources[name]))
+    if types:
+        mentions = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in sorted(types)) + r")\b")
+        changed |= {name for name in sources if mentions.search(sources[name])}
+    return changed
+
+
+def _build(entry, sources, out_dir):
+    hashes = {name: compile_cache.source_hash(code) for name, code in sources.items()}
+    previous = _load(entry)
+    compile_names = set(sources) if previous is None else _plan(sources, hashes, previous)
+    reused = [name for name in sources if name not in compile_names]
+
+    copied = []
+    try:
+        for name in reused:
+            copied += previous["classes"][name]
+        _copy(entry / _CLASSES, out_dir, copied)
+        os.utime(entry)  # mark as recently used for LRU eviction
+    except (OSError, KeyError):
+        # replaced or evicted under us: compile everything
+        for rel in copied:
+            Path(out_dir, rel).unlink(missing_ok=True)
+        compile_names, reused, copied = set(sources), [], []
+
+    if compile_names:
+        # the reused classes are on the classpath, in out_dir itself
+        result = javac_service.compile_sources(
+            {name: sources[name] for name in sources if name in compile_names},
+            out_dir,
+            classpath=str(out_dir) if reused else "",
+        )
+    else:
+        result = javac_service.CompileResult(0, via="incremental")
+
+    with _lock:
+        counters["builds"] += 1
+        counters["incremental" if reused else "full"] += 1
+        counters["files_compiled"] += len(compile_names)
+        counters["files_reused"] += len(reused)
+    if result.returncode != 0:
+        return result  # the previous build stays the one to build on
+
+    classes = {name: previous["classes"][name] for name in reused}
+    classes.update({name: [] for name in compile_names})
+    for rel in set(_class_files(out_dir)) - set(copied):
+        origin = source_file(Path(out_dir) / rel)
+        if origin not in compile_names:
+            print(f"[WARN] cannot tell which source {rel} came from; next build compiles everything")
+            shutil.rmtree(entry, ignore_errors=True)
+            return result
+        classes[origin].append(rel)
+    _save(entry, hashes, classes, out_dir)
+    return result
+
+
+def _save(entry, hashes, classes, out_dir):
+    global _entries
+    staging = _root() / f".{entry.name}.{uuid.uuid4().hex}"
+    try:
+        staging.mkdir(parents=True)
+        _copy(out_dir, staging / _CLASSES, [rel for rels in classes.values() for rel in rels])
+        with open(staging / _MANIFEST, "w") as f:
+            json.dump({"jdk": artifacts.jdk_version(), "files": hashes, "classes": classes}, f)
+        existed = entry.exists()
+        if existed:
+            retired = _root() / f".{entry.name}.{uuid.uuid4().hex}"
+            os.rename(entry, retired)
+            shutil.rmtree(retired, ignore_errors=True)
+        os.rename(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+
+    with _lock:
+        if _entries is None:
+            _entries = sum(1 for p in _root().iterdir() if not p.name.startswith("."))
+        elif not existed:
+            _entries += 1
+        if _entries > settings.INCREMENTAL_BUILD_MAX_ENTRIES:
+            _evict()
+
+
+def _evict():
+    """Drops least recently used builds down to 90% of the cap. Holds _lock."""
+    global _entries
+    entries = sorted(
+        (p for p in _root().iterdir() if not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime,
+    )
+    for entry in entries[:max(0, len(entries) - int(settings.INCREMENTAL_BUILD_MAX_ENTRIES * 0.9))]:
+        shutil.rmtree(entry, ignore_errors=True)
+        counters["evictions"] += 1
+    _entries = sum(1 for p in _root().iterdir() if not p.name.startswith("."))
+
+
+def compile_project(sources, out_dir, owner_id=None, question_id=None):
+    """
+    Compiles ``sources`` ({file name: code}) into out_dir through the compile
+    cache. With several files and a participant, unchanged files are reused
+    from that participant's previous build of the question.
+    """
+    if not settings.INCREMENTAL_BUILD_ENABLED or owner_id is None or len(sources) < 2:
+        return compile_cache.compile_cached(sources, out_dir)
+    entry = _root() / f"{owner_id}-{question_id}"
+    return compile_cache.compile_cached(sources, out_dir, compiler=lambda s, out, classpath: _build(entry, s, out))
+
+
+def snapshot():
+    with _lock:
+        return dict(counters, entries=_entries, max_entries=settings.INCREMENTAL_BUILD_MAX_ENTRIES)
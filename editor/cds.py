@@ -0,0 +1,233 @@
+"""
+Application Class-Data Sharing (AppCDS) archive for the JVMs we launch.
+
+The archive holds the JDK classes participant programs and the harness
+load, plus the runner and harness classes themselves, pre-parsed, so a
+fresh JVM maps them instead of loading them from the JDK's modules file.
+It lives in EXECUTION_CACHE_DIR/cds/<version>.jsa, where the version covers
+the JDK and the runner artifacts. A new JDK or a changed runner gets a
+new archive; until it exists, JVMs simply start without one.
+
+``manage.py build_cds_archive`` builds it by running the question bank
+through the harness with -XX:DumpLoadedClassList and then dumping those
+classes. With CDS_AUTO_BUILD a missing archive is also built in the
+background the first time a JVM is launched after the JDK changed.
+
+An archive only applies when its classpath is a prefix of the run's, so
+every launch puts the runner artifacts first (see ``classpath``).
+"""
+import hashlib
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from editor import artifacts
+
+# On every launch's classpath, in this order (the archive was dumped with it).
+RUNNER_ARTIFACTS = ("MultiCaseHarness", "PooledRunner", "StandbyRunner")
+
+_STALE_LOCK_SECONDS = 3600
+
+_lock = threading.Lock()
+_building = set()  # versions being built by this process
+
+
+def runner_classpath():
+    return os.pathsep.join(artifacts.classpath(name) for name in RUNNER_ARTIFACTS)
+
+
+def classpath(*extra):
+    """The runner artifacts followed by ``extra`` directories."""
+    return os.pathsep.join([runner_classpath(), *extra])
+
+
+def startup_flags():
+    """The JVM_STARTUP_FLAGS profile, without the archive."""
+    return shlex.split(settings.JVM_STARTUP_FLAGS)
+
+
+def version():
+    digest = hashlib.sha256(f"{settings.JAVA_BIN}\0{artifacts.jdk_version()}\0{runner_classpath()}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _root():
+    return Path(settings.EXECUTION_CACHE_DIR) / "cds"
+
+
+def archive_path():
+    return _root() / f"{version()}.jsa"
+
+
+def archive_flags():
+    """
+    Flags that make a JVM use the current archive, or [] when there is none
+    (in which case a background build may be started, see CDS_AUTO_BUILD).
+    """
+    if not settings.CDS_ENABLED:
+        return []
+    try:
+        path = archive_path()
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    if path.exists():
+        return [f"-XX:SharedArchiveFile={path}", "-Xshare:auto"]
+    if settings.CDS_AUTO_BUILD:
+        _build_in_background()
+    return []
+
+
+def java_flags():
+    """Startup profile plus archive, for a fresh JVM running participant code."""
+    return startup_flags() + archive_flags()
+
+
+def _build_in_background():
+    current = version()
+    with _lock:
+        if current in _building:
+            return
+        _building.add(current)
+
+    def run():
+        try:
+            build()
+        except Exception as e:
+            print(f"[WARN] could not build the CDS archive: {e}")
+
+    threading.Thread(target=run, name="cds-build", daemon=True).start()
+
+
+def _train(class_list_dir, questions):
+    """
+    Runs every question's reference (or starter) code through the harness
+    with -XX:DumpLoadedClassList and returns the class list files written.
+    """
+    # imported here because harness -> sandbox -> cds
+    from editor import grading, harness, sandbox, workspaces
+
+    lists = []
+    for question in questions:
+        code = question.instructor_code or question.user_starter_code
+        test_cases = list(question.test_cases.all())
+        if not code.strip() or not test_cases:
+            continue
+        limits = sandbox.Limits.for_question(question)
+        with workspaces.checkout() as temp_dir:
+            if grading.compile_submission(question, code, temp_dir).returncode != 0:
+                continue
+            if question.question_type == "IO":
+                mode, cases = "io", [[tc.test_input] for tc in test_cases]
+            else:
+                mode, cases = "unit", [[tc.method_name, tc.arg_types, tc.test_input or "[]"] for tc in test_cases]
+            class_list = Path(class_list_dir) / f"q{question.pk}.lst"
+            command = harness.harness_command(mode, "Main", temp_dir, limits)
+            command.insert(1, f"-XX:DumpLoadedClassList={class_list}")
+            try:
+                subprocess.run(command, input=harness.encode_cases(cases), capture_output=True,
+                               timeout=limits.time_limit_ms / 1000 * len(cases) + 10)
+            except subprocess.TimeoutExpired:
+                pass
+            if class_list.exists():
+                lists.append(class_list)
+    return lists
+
+
+def _runner_classes():
+    """Every class in the runner artifacts, including the ones training never touched."""
+    names = []
+    for name in RUNNER_ARTIFACTS:
+        directory = Path(artifacts.classpath(name))
+        names += [str(p.relative_to(directory).with_suffix("")) for p in directory.rglob("*.class")]
+    return names
+
+
+def build(questions=None):
+    """
+    Trains on ``questions`` (default: the whole question bank), dumps the
+    archive for the current version and returns its path. Other processes
+    building the same version at the same time are left to it.
+    """
+    from editor.models import Questions
+
+    if questions is None:
+        questions = Questions.objects.prefetch_related("test_cases", "files").order_by("id")
+    target = archive_path()
+    _root().mkdir(parents=True, exist_ok=True)
+    lock = target.with_suffix(".building")
+    try:
+        if time.time() - lock.stat().st_mtime > _STALE_LOCK_SECONDS:
+            lock.unlink(missing_ok=True)  # its builder died
+    except FileNotFoundError:
+        pass
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if settings.DEBUG:
+            print(f"[DEBUG] CDS archive {target.name} is already being built")
+        return target
+    os.close(fd)
+
+    try:
+        with tempfile.TemporaryDirectory(dir=_root()) as work:
+            seen, classes = set(), []
+            for class_list in _train(work, questions):
+                # "java/lang/Object id: 0"; the ids and @-directives only make
+                # sense within one list, so the merged list keeps plain names
+                for line in class_list.read_text().splitlines():
+                    name = line.split()[0] if line.strip() and line[0] not in "#@" else None
+                    if name and name not in seen:
+                        seen.add(name)
+                        classes.append(name)
+            for name in _runner_classes():
+                if name not in seen:
+                    seen.add(name)
+                    classes.append(name)
+            merged = Path(work) / "classes.lst"
+            merged.write_text("\n".join(classes) + "\n")
+
+            staging = Path(work) / "archive.jsa"
+            subprocess.run(
+                [settings.JAVA_BIN, *startup_flags(), "-Xshare:dump",
+                 f"-XX:SharedClassListFile={merged}", f"-XX:SharedArchiveFile={staging}",
+                 "-cp", runner_classpath()],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                check=True,
+            )
+            os.replace(staging, target)
+        if settings.DEBUG:
+            print(f"[DEBUG] built CDS archive {target.name} with {len(classes)} classes")
+        return target
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def prune():
+    """Removes archives of other JDK or runner versions. Returns their names."""
+    keep = archive_path().name
+    removed = []
+    for path in _root().glob("*.jsa") if _root().is_dir() else []:
+        if path.name != keep:
+            path.unlink(missing_ok=True)
+            removed.append(path.name)
+    return removed
+
+
+def snapshot():
+    try:
+        path = archive_path()
+    except (OSError, subprocess.CalledProcessError):
+        return {"enabled": settings.CDS_ENABLED, "archive": None}
+    return {
+        "enabled": settings.CDS_ENABLED,
+        "archive": path.name if path.exists() else None,
+        "size_kb": path.stat().st_size // 1024 if path.exists() else 0,
+        "building": path.with_suffix(".building").exists(),
+    }
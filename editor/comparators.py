@@ -0,0 +1,111 @@
+"""
+How an IO test case's output is compared with its expected output, chosen
+per question:
+
+    exact       the same text once leading/trailing whitespace is stripped
+    whitespace  the same text once all whitespace is removed
+    tokens      the same whitespace-separated tokens
+    float       the same tokens, numbers equal within float_tolerance
+                (absolute, or relative for numbers above 1)
+
+Each comparator can also check output while the program is still running
+(see Checker), so a run is stopped as soon as its output can no longer
+match, or grows past the expected length plus OUTPUT_COMPARE_MARGIN_BYTES.
+"""
+import codecs
+import math
+
+from django.conf import settings
+
+EXACT = "exact"
+WHITESPACE = "whitespace"
+TOKENS = "tokens"
+FLOAT = "float"
+
+CHOICES = [
+    (EXACT, "Exact (ignoring leading/trailing whitespace)"),
+    (WHITESPACE, "Whitespace-insensitive"),
+    (TOKENS, "Token-wise"),
+    (FLOAT, "Token-wise, numbers within a tolerance"),
+]
+
+
+def _same_token(actual, expected, tolerance):
+    if actual == expected:
+        return True
+    try:
+        a, e = float(actual), float(expected)
+    except ValueError:
+        return False
+    if math.isnan(a) or math.isnan(e):
+        return math.isnan(a) and math.isnan(e)
+    return abs(a - e) <= tolerance * max(1.0, abs(e))
+
+
+class Comparator:
+    """Compares finished output with the expected output for one comparator kind."""
+
+    def __init__(self, kind=EXACT, tolerance=1e-6):
+        self.kind = kind
+        self.tolerance = tolerance
+
+    @classmethod
+    def for_question(cls, question):
+        return cls(question.comparator, question.float_tolerance)
+
+    def matches(self, actual, expected):
+        if self.kind == EXACT:
+            return actual.strip() == expected.strip()
+        if self.kind == WHITESPACE:
+            return "".join(actual.split()) == "".join(expected.split())
+        actual, expected = actual.split(), expected.split()
+        if self.kind == TOKENS:
+            return actual == expected
+        return len(actual) == len(expected) and all(
+            _same_token(a, e, self.tolerance) for a, e in zip(actual, expected)
+        )
+
+    def prefix_matches(self, actual, expected):
+        """False once ``actual``, the output so far, can no longer end up matching."""
+        if self.kind == EXACT:
+            return expected.strip().startswith(actual.strip())
+        if self.kind == WHITESPACE:
+            return "".join(expected.split()).startswith("".join(actual.split()))
+
+        tokens, wanted = actual.split(), expected.split()
+        partial = tokens.pop() if tokens and not actual[-1].isspace() else None
+        if len(tokens) > len(wanted):
+            return False
+        if self.kind == TOKENS:
+            if tokens != wanted[:len(tokens)]:
+                return False
+            return partial is None or (len(tokens) < len(wanted) and wanted[len(tokens)].startswith(partial))
+        # a partial number could still become anything, so only whole tokens are checked
+        return all(_same_token(a, e, self.tolerance) for a, e in zip(tokens, wanted)) and (
+            partial is None or len(tokens) < len(wanted)
+        )
+
+    def checker(self, expected):
+        return Checker(self, expected)
+
+
+class Checker:
+    """
+    Follows one run's stdout as it arrives. ``feed`` returns False as soon
+    as the output can no longer match, or is longer than ``max_bytes``.
+    """
+
+    def __init__(self, comparator, expected):
+        self.comparator = comparator
+        self.expected = expected
+        self.max_bytes = len(expected.encode()) + settings.OUTPUT_COMPARE_MARGIN_BYTES
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._text = ""
+        self._bytes = 0
+
+    def feed(self, chunk):
+        self._bytes += len(chunk)
+        if self._bytes > self.max_bytes:
+            return False
+        self._text += self._decoder.decode(chunk)
+        return not self._text or self.comparator.prefix_matches(self._text, self.expected)
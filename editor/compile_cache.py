@@ -0,0 +1,171 @@
+"""
+Content-addressed cache of compilation results.
+
+Entries are keyed by the SHA-256 of the JDK version plus the source files,
+so pressing Run again on the same code (or submitting code that was just
+run) reuses the earlier .class files or javac diagnostics instead of
+compiling again. Entries live on disk under EXECUTION_CACHE_DIR/compile and
+the least recently used ones are evicted once the total size passes
+COMPILE_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from editor import artifacts, javac_service
+
+_RESULT_FILE = "result.json"
+
+_lock = threading.Lock()
+_total_bytes = None  # lazily measured, then kept up to date in-process
+counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def source_hash(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def cache_key(sources, classpath=""):
+    digest = hashlib.sha256(artifacts.jdk_version().encode())
+    digest.update(b"\0" + classpath.encode())
+    for name in sorted(sources):
+        digest.update(b"\0" + name.encode() + b"\0" + sources[name].encode())
+    return digest.hexdigest()
+
+
+def _root():
+    return Path(settings.EXECUTION_CACHE_DIR) / "compile"
+
+
+def _entry_dir(key):
+    return _root() / key[:2] / key
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def _class_files(directory):
+    directory = Path(directory)
+    return [p.relative_to(directory) for p in directory.rglob("*.class")]
+
+
+def lookup(key, out_dir):
+    """
+    Copies a cached entry's class files into out_dir and returns its
+    CompileResult, or None on a miss.
+    """
+    entry = _entry_dir(key)
+    try:
+        with open(entry / _RESULT_FILE) as f:
+            meta = json.load(f)
+        for rel in _class_files(entry):
+            dest = Path(out_dir) / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry / rel, dest)
+        os.utime(entry)  # mark as recently used for LRU eviction
+    except (OSError, ValueError):
+        return None
+    return javac_service.CompileResult(
+        returncode=meta["returncode"],
+        stderr=meta["stderr"],
+        diagnostics=meta["diagnostics"],
+        via="cache",
+    )
+
+
+def store(key, result, out_dir):
+    """Saves result and the class files it produced in out_dir."""
+    global _total_bytes
+    entry = _entry_dir(key)
+    if entry.exists():
+        return
+    staging = entry.parent / f".{key}.{uuid.uuid4().hex}"
+    try:
+        staging.mkdir(parents=True)
+        if result.returncode == 0:
+            for rel in _class_files(out_dir):
+                (staging / rel).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(Path(out_dir) / rel, staging / rel)
+        with open(staging / _RESULT_FILE, "w") as f:
+            json.dump({
+                "returncode": result.returncode,
+                "stderr": result.stderr,
+                "diagnostics": result.diagnostics,
+            }, f)
+        size = _dir_size(staging)
+        os.rename(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+
+    with _lock:
+        counters["stores"] += 1
+        if _total_bytes is None:
+            _total_bytes = _dir_size(_root())
+        else:
+            _total_bytes += size
+        if _total_bytes > settings.COMPILE_CACHE_MAX_MB * 1024 * 1024:
+            _evict()
+
+
+def _evict():
+    """Drops least recently used entries until the cache is at 90% of its cap. Holds _lock."""
+    global _total_bytes
+    entries = sorted(
+        (p for p in _root().glob("*/*") if not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime,
+    )
+    target = settings.COMPILE_CACHE_MAX_MB * 1024 * 1024 * 0.9
+    for entry in entries:
+        if _total_bytes <= target:
+            break
+        size = _dir_size(entry)
+        shutil.rmtree(entry, ignore_errors=True)
+        _total_bytes -= size
+        counters["evictions"] += 1
+
+
+def compile_cached(sources, out_dir, classpath="", compiler=None):
+    """
+    Compiles ``sources`` ({file name: code}) into out_dir, serving the result
+    from the cache when the same sources were compiled before. ``compiler``
+    replaces javac_service.compile_sources on a miss (see editor/builds.py).
+    """
+    compiler = compiler or javac_service.compile_sources
+    if not settings.COMPILE_CACHE_ENABLED:
+        return compiler(sources, out_dir, classpath)
+
+    start = time.perf_counter()
+    key = cache_key(sources, classpath)
+    cached = lookup(key, out_dir)
+    if cached is not None:
+        cached.compile_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            counters["hits"] += 1
+        return cached
+
+    with _lock:
+        counters["misses"] += 1
+    result = compiler(sources, out_dir, classpath)
+    if result.cacheable:
+        store(key, result, out_dir)
+    return result
+
+
+def snapshot():
+    with _lock:
+        lookups = counters["hits"] + counters["misses"]
+        return dict(
+            counters,
+            hit_rate=round(counters["hits"] / lookups, 3) if lookups else None,
+            size_bytes=_total_bytes,
+            max_bytes=settings.COMPILE_CACHE_MAX_MB * 1024 * 1024,
+        )
@@ -0,0 +1,116 @@
+"""
+Compile-only checks for the editor's as-you-type diagnostics.
+
+A check compiles Main.java, with the question's files if any, and returns
+javac's diagnostics for Main.java; nothing runs. Results are kept per
+source hash in memory, on top of the shared compile
+cache. Checks are requested by each editor after a pause in
+typing, so a request that a newer one from the same editor has overtaken
+is dropped before it reaches javac. At most COMPILE_CHECK_MAX_PARALLEL
+checks compile at once, on javac daemons of their own (javac_service.CHECKS),
+so they do not queue for the daemons grading compiles on; they still share
+the host's CPUs with it. The newest request number is kept for the
+COMPILE_CHECK_MAX_EDITORS most recently active editors.
+"""
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+from editor import compile_cache, javac_service, parallel, workspaces
+
+_lock = threading.Lock()
+_latest = OrderedDict()  # (owner id, editor id) -> sequence number of the newest request, least recent first
+_results = OrderedDict()  # hash of the sources -> response, least recently used first
+_slots = weakref.WeakKeyDictionary()  # one semaphore per event loop
+counters = {"checks": 0, "hits": 0, "superseded": 0}
+
+
+def begin(owner_id, editor_id, seq):
+    """Records a request as its editor's newest, unless a newer one is already known. Returns the key."""
+    key = (owner_id, editor_id)
+    with _lock:
+        counters["checks"] += 1
+        if seq >= _latest.get(key, -1):
+            _latest[key] = seq
+        _latest.move_to_end(key)
+        while len(_latest) > settings.COMPILE_CHECK_MAX_EDITORS:
+            _latest.popitem(last=False)
+    return key
+
+
+def _superseded(key, seq):
+    with _lock:
+        if _latest.get(key, -1) > seq:
+            counters["superseded"] += 1
+            return True
+        return False
+
+
+def _remember(digest, response):
+    with _lock:
+        _results[digest] = response
+        _results.move_to_end(digest)
+        while len(_results) > settings.COMPILE_CHECK_CACHE_SIZE:
+            _results.popitem(last=False)
+
+
+def _compile(sources):
+    start = time.perf_counter()
+    with workspaces.checkout() as temp_dir:
+        result = compile_cache.compile_cached(
+            sources, temp_dir, compiler=functools.partial(javac_service.compile_sources, lane=javac_service.CHECKS)
+        )
+    return {
+        "ok": result.returncode == 0,
+        "diagnostics": [
+            {
+                "line": d["line"],
+                "column": d["column"],
+                "severity": d["severity"],
+                "message": d["message"],
+            }
+            for d in result.diagnostics
+            if d.get("file") in ("Main.java", "", None)
+        ],
+        "compile_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+async def check(sources, key, seq):
+    """
+    Compiles ``sources`` ({file name: code}, Main.java among them). Returns { ok, diagnostics: [ { line, column, severity, message } ],
+    compile_ms, cached }, or None when a newer request from the same
+    editor made this one stale.
+    """
+    digest = compile_cache.cache_key(sources)
+    with _lock:
+        cached = _results.get(digest)
+        if cached is not None:
+            _results.move_to_end(digest)
+            counters["hits"] += 1
+    if cached is not None:
+        return dict(cached, compile_ms=0, cached=True)
+
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(settings.COMPILE_CHECK_MAX_PARALLEL)
+    if _superseded(key, seq):
+        return None
+    async with slots:
+        # waiting for a slot can take a while under load: check again
+        if _superseded(key, seq):
+            return None
+        response = await parallel.run_blocking(_compile, sources)
+    _remember(digest, response)
+    return dict(response, cached=False)
+
+
+def snapshot():
+    with _lock:
+        return dict(counters, cached=len(_results), editors=len(_latest))
@@ -1,8 +1,11 @@
+import json
+import re
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.forms.models import inlineformset_factory, BaseInlineFormSet
-from .models import Questions, TestCase, QUESTION_TYPE_CHOICES
+from .models import Questions, QuestionFile, TestCase, QUESTION_TYPE_CHOICES
 
 
 class QuestionsForm(forms.ModelForm):
@@ -14,17 +17,44 @@ class QuestionsForm(forms.ModelForm):
 
     class Meta:
         model = Questions
-        fields = ['question_string', 'question_type', 'user_starter_code', 'instructor_code']
+        fields = ['question_string', 'question_type', 'user_starter_code', 'instructor_code',
+                  'time_limit_ms', 'cpu_limit_seconds', 'memory_limit_mb', 'stack_limit_kb',
+                  'output_limit_kb', 'thread_limit', 'comparator', 'float_tolerance']
         widgets = {
             'user_starter_code': forms.Textarea(attrs={'class': 'd-none'}),
             'instructor_code': forms.Textarea(attrs={'class': 'd-none'}),
         }
+        help_texts = {
+            'comparator': "How IO output is compared with the expected output",
+            'float_tolerance': "Float comparator only: allowed absolute (or, above 1, relative) difference",
+        }
 
 
 class TestCaseForm(forms.ModelForm):
     class Meta:
         model = TestCase
-        fields = ['test_input', 'expected_output']
+        fields = ['test_input', 'expected_output', 'method_name', 'arg_types']
+        help_texts = {
+            'test_input': "IO: the program's input. UNIT: JSON array of arguments, e.g. [[1, -2, 3]]",
+            'expected_output': "IO: the expected output. UNIT: the expected return value as JSON, e.g. 2",
+            'method_name': "UNIT only: the method of Main to call, e.g. countPositive",
+            'arg_types': "UNIT only: comma-separated parameter types, e.g. int[], String",
+        }
+
+
+def split_arg_types(spec):
+    """Splits "int[], Map<String, Integer>" on the commas that are not inside <...>."""
+    types, depth, current = [], 0, ""
+    for c in spec:
+        if c == "," and depth == 0:
+            types.append(current.strip())
+            current = ""
+            continue
+        depth += {"<": 1, ">": -1}.get(c, 0)
+        current += c
+    if current.strip():
+        types.append(current.strip())
+    return types
 
 
 # Custom inline formset to perform conditional validation.
@@ -32,20 +62,38 @@ class BaseTestCaseFormSet(BaseInlineFormSet):
     def clean(self):
         """
         If the question's type is not UNIT, then each non-deleted test case must have a test_input.
+        UNIT test cases need a method name, JSON arguments matching the parameter types and a JSON
+        expected return value.
         """
         super().clean()
         # Only check if the parent instance exists.
-        if self.instance and self.instance.question_type != 'UNIT':
-            for form in self.forms:
-                # Skip forms marked for deletion
-                if self.can_delete and self._should_delete_form(form):
-                    continue
-                # If the form is not valid, skip validation here.
-                if not form.cleaned_data:
-                    continue
-                test_input = form.cleaned_data.get('test_input')
+        if not self.instance:
+            return
+        for form in self.forms:
+            # Skip forms marked for deletion
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            # If the form is not valid, skip validation here.
+            if not form.cleaned_data:
+                continue
+            test_input = form.cleaned_data.get('test_input')
+            if self.instance.question_type != 'UNIT':
                 if not test_input:
                     raise forms.ValidationError("Test input is required unless the question type is UNIT.")
+                continue
+
+            if not form.cleaned_data.get('method_name'):
+                raise forms.ValidationError("UNIT test cases need the name of the method to call.")
+            try:
+                args = json.loads(test_input or "[]")
+                json.loads(form.cleaned_data.get('expected_output') or "")
+            except ValueError:
+                raise forms.ValidationError("UNIT test arguments and expected values must be valid JSON.")
+            arg_types = split_arg_types(form.cleaned_data.get('arg_types') or "")
+            if not isinstance(args, list) or len(args) != len(arg_types):
+                raise forms.ValidationError(
+                    "UNIT test arguments must be a JSON array with one value per parameter type."
+                )
 
 
 # Create the inline formset. Allow one extra empty form and deletion.
@@ -59,6 +107,35 @@ TestCaseFormSet = inlineformset_factory(
 )
 
 
+class QuestionFileForm(forms.ModelForm):
+    class Meta:
+        model = QuestionFile
+        fields = ['name', 'content']
+        widgets = {
+            'content': forms.Textarea(attrs={'rows': 8, 'class': 'font-monospace'}),
+        }
+        help_texts = {
+            'name': "e.g. Helper.java; compiled with the participant's Main.java, which it may not replace",
+        }
+
+    def clean_name(self):
+        name = self.cleaned_data['name'].strip()
+        if not re.fullmatch(r"[A-Za-z_$][\w$]*\.java", name):
+            raise forms.ValidationError("File names look like Helper.java (no directories).")
+        if name == "Main.java":
+            raise forms.ValidationError("Main.java is the participant's file.")
+        return name
+
+
+QuestionFileFormSet = inlineformset_factory(
+    parent_model=Questions,
+    model=QuestionFile,
+    form=QuestionFileForm,
+    extra=1,
+    can_delete=True
+)
+
+
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
         model = User
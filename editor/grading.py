@@ -0,0 +1,510 @@
+"""
+The grading engine: ``grade(question, source, mode)`` compiles a submission,
+runs it against the question's test cases and compares the output. run_code,
+submit_all, their async versions in both apps and run jobs all go through it.
+
+Verdicts the code alone decides (see _cacheable) are memoized in
+editor/verdict_cache.py. How the test cases of a
+fresh submission get executed is up to the backend named by GRADING_BACKEND:
+
+    subprocess  fresh JVMs: every case in one MultiCaseHarness JVM, or one
+                sandboxed JVM per case with IO_HARNESS_ENABLED off; with
+                JSHELL_POOL_ENABLED, UNIT cases run in warm JShell
+                sessions (editor/jshell_pool.py) once javac accepted the code
+    pool        IO cases on warm JVMs from editor/jvm_pool.py, in parallel;
+                cases whose limits the pool cannot honour use subprocess
+    queue       the submission is queued in the database for a grading
+                worker process (manage.py grading_worker, editor/grading_queue.py)
+    remote      the submission is POSTed to a grading worker running this
+                app (GRADING_REMOTE_URL), which grades it with its own
+                local backend (/grade/, editor.views.grade_remote)
+
+RUN grades every test case; SUBMIT stops at the first one that fails, and
+runs the cases that failed most often in the past first (each TestCase
+counts its runs and failures, recorded by the submit_all views through
+record_outcomes).
+"""
+import asyncio
+import json
+from collections import Counter
+import urllib.request
+
+from django.conf import settings
+from django.db.models import F
+
+from editor import (builds, comparators, compile_cache, grading_queue, harness, jshell_pool, jvm_pool, parallel,
+                    sandbox, usage, verdict_cache, workspaces)
+from editor.models import TestCase
+
+RUN = "run"
+SUBMIT = "submit"
+MODES = (RUN, SUBMIT)
+
+
+def grade(question, source, mode=RUN, progress=None, backend=None, owner_id=None):
+    """
+    Grades source, as Main.java next to the question's files, against the
+    question's test cases. Returns
+      { error, compile_error, compile_ms }       when the code does not compile
+      { results: [ { input, expected_output, actual_output, passed, verdict }, … ],
+        case_ids, complete, compile_ms, cached, usage }    otherwise
+    where case_ids are the TestCase pks behind results and usage is the
+    resources the compile and runs took (editor/usage.py), or None for a
+    verdict served from the verdict cache, since nothing ran for it.
+    In SUBMIT mode the cases stop at the first failure (complete=False).
+    progress(event_type, **payload), if given, is called with "compile-done"
+    and then one "test-result" (index, result) per test case as they finish.
+    owner_id, the participant, lets a multi-file question build on their
+    previous build (editor/builds.py).
+    """
+    fail_fast = _fail_fast(mode)
+    cached = verdict_cache.get(question, source)
+    if _reusable(cached, fail_fast):
+        if progress:
+            _replay(cached, progress)
+        return _from_cache(cached)
+
+    verdict = (backend or get_backend()).grade(question, source, fail_fast, progress, owner_id)
+    if _cacheable(verdict):
+        verdict_cache.put(question, source, verdict)
+    # a queue or remote worker may have answered from its own verdict cache
+    return dict(verdict, cached=verdict.get("cached", False))
+
+
+async def grade_async(question, source, mode=RUN, backend=None, owner_id=None):
+    """
+    grade for the async views. The question must come with its test cases
+    and files prefetched. Blocking steps run on the grading executor.
+    """
+    fail_fast = _fail_fast(mode)
+    cached = await parallel.run_blocking(verdict_cache.get, question, source)
+    if _reusable(cached, fail_fast):
+        return _from_cache(cached)
+
+    verdict = await (backend or get_backend()).grade_async(question, source, fail_fast, owner_id)
+    if _cacheable(verdict):
+        await parallel.run_blocking(verdict_cache.put, question, source, verdict)
+    # a queue or remote worker may have answered from its own verdict cache
+    return dict(verdict, cached=verdict.get("cached", False))
+
+
+def grade_many(pairs, mode=SUBMIT, safe=False, owner_id=None):
+    """
+    Grades several (question, source) pairs in parallel and returns their
+    verdicts in the same order. Questions should come with their test cases
+    and files prefetched, which leaves the worker threads only the verdict
+    cache to query. With safe, a pair whose grading raised gets {"error": …}
+    instead of failing the batch.
+    """
+    def evaluate(pair):
+        try:
+            return grade(*pair, mode=mode, owner_id=owner_id)
+        except Exception as e:
+            if not safe:
+                raise
+            return {"error": str(e)}
+
+    return parallel.map_ordered(evaluate, pairs)
+
+
+async def grade_many_async(pairs, mode=SUBMIT, safe=False, owner_id=None):
+    """grade_many for the async views."""
+    async def evaluate(pair):
+        try:
+            return await grade_async(*pair, mode=mode, owner_id=owner_id)
+        except Exception as e:
+            if not safe:
+                raise
+            return {"error": str(e)}
+
+    return await asyncio.gather(*(evaluate(pair) for pair in pairs))
+
+
+def passed(verdict):
+    """True when the code compiled and every test case that ran passed."""
+    return "results" in verdict and all(r["passed"] for r in verdict["results"])
+
+
+def _fail_fast(mode):
+    if mode not in MODES:
+        raise ValueError(f"unknown grading mode {mode!r}")
+    return mode == SUBMIT
+
+
+def _replay(verdict, progress):
+    """Reports a cached verdict through a progress callback."""
+    progress("compile-done", ok="error" not in verdict, error=verdict.get("error"), compile_ms=0)
+    for index, result in enumerate(verdict.get("results", [])):
+        progress("test-result", index=index, result=result)
+
+
+def _cacheable(verdict):
+    """
+    True when a verdict is down to the code alone, so an identical
+    submission may be answered with it: a compile error, or runs none of
+    which hit the time or CPU limit (those also depend on how busy the host
+    was). Errors from the compiler or the backend itself are never kept.
+    """
+    if "error" in verdict:
+        return verdict.get("compile_error", False)
+    return all(result["verdict"] != sandbox.TLE for result in verdict.get("results", []))
+
+
+def _compile_failed(cp):
+    """The verdict of code that did not compile; compile_error is False when javac itself failed."""
+    return {"error": cp.stderr, "compile_error": cp.cacheable, "compile_ms": cp.compile_ms,
+            "usage": usage.summary(cp, [])}
+
+
+def _from_cache(cached):
+    """A cached verdict as the answer to this request: no compile and no runs of its own."""
+    return dict(cached, compile_ms=0, usage=None, cached=True)
+
+
+def _reusable(cached, fail_fast):
+    """A cached verdict answers this request if it is complete, or shows a failure in fail-fast mode."""
+    return cached is not None and (cached.get("complete", True) or (fail_fast and not passed(cached)))
+
+
+def compile_java_file(code, filename, temp_dir):
+    """
+    Compiles Java code into temp_dir and returns the result
+    (returncode, stderr, diagnostics, compile_ms).
+    """
+    result = compile_cache.compile_cached({filename: code}, temp_dir)
+    if settings.DEBUG:
+        print(f"[DEBUG] compiled {filename} via {result.via} in {result.compile_ms:.1f} ms")
+    return result
+
+
+def question_sources(question, code):
+    """{file name: code} for a submission: the question's files, plus the code as Main.java."""
+    sources = {f.name: f.content for f in question.files.all()}
+    sources["Main.java"] = code
+    return sources
+
+
+def compile_submission(question, code, temp_dir, owner_id=None):
+    """compile_java_file for a submission, with the question's files (see question_sources)."""
+    sources = question_sources(question, code)
+    if len(sources) == 1:
+        return compile_java_file(code, "Main.java", temp_dir)
+    result = builds.compile_project(sources, temp_dir, owner_id, question.pk)
+    if settings.DEBUG:
+        print(f"[DEBUG] compiled {len(sources)} files via {result.via} in {result.compile_ms:.1f} ms")
+    return result
+
+
+def _test_cases(question, fail_fast):
+    """
+    The question's test cases in the order to run them. In fail-fast mode
+    the ones with the highest failure rate go first (smoothed, so a case
+    without history starts at 1/2), which stops most wrong submissions after
+    a single case; otherwise, and on ties, they keep their order.
+    """
+    test_cases = list(question.test_cases.all())
+    if fail_fast and settings.ADAPTIVE_TEST_ORDER_ENABLED:
+        test_cases.sort(key=lambda tc: -(tc.failures + 1) / (tc.runs + 2))
+    return test_cases
+
+
+def record_outcomes(verdicts):
+    """
+    Counts the cases that ran in freshly graded SUBMIT ``verdicts`` towards
+    their failure rates (see _test_cases). The submit_all views call it once,
+    inside the transaction that saves the submissions.
+    """
+    runs, failures = Counter(), Counter()
+    for verdict in verdicts:
+        if verdict.get("cached") or "results" not in verdict:
+            continue
+        for pk, result in zip(verdict.get("case_ids", []), verdict["results"]):
+            runs[pk] += 1
+            if not result["passed"]:
+                failures[pk] += 1
+    for field, counts in (("runs", runs), ("failures", failures)):
+        # one UPDATE per distinct increment, usually just +1
+        by_amount = {}
+        for pk, amount in counts.items():
+            by_amount.setdefault(amount, []).append(pk)
+        for amount, pks in by_amount.items():
+            TestCase.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+
+
+def _by_result(stop_when):
+    """stop_when for the (test case pk, result) pairs the parallel runs return."""
+    return (lambda ran: stop_when(ran[1])) if stop_when else None
+
+
+def _io_result(tc, run, comparator):
+    expected = tc.expected_output.strip()
+    actual = run.output.strip()
+    return {
+        "input": tc.test_input,
+        "expected_output": expected,
+        "actual_output": actual,
+        "passed": run.limit is None and comparator.matches(run.stdout, tc.expected_output),
+        "verdict": run.verdict,
+    }
+
+
+def _unit_result(tc, run):
+    expected = tc.expected_output.strip()
+    passed = run.limit is None and run.value is not None and _same_json(run.value, expected)
+    return {
+        "input": f"{tc.method_name}({(tc.test_input or '[]').strip()[1:-1]})",
+        "expected_output": expected,
+        "actual_output": run.value if run.value is not None else run.output,
+        "passed": passed,
+        "verdict": run.verdict,
+    }
+
+
+def _same_json(actual, expected):
+    try:
+        return json.loads(actual) == json.loads(expected)
+    except ValueError:
+        return actual.strip() == expected.strip()
+
+
+class SubprocessBackend:
+    """Runs submissions in fresh, sandboxed JVMs on this host."""
+
+    name = "subprocess"
+
+    def uses_harness(self, limits):
+        """True when IO cases run together in one MultiCaseHarness JVM instead of one run per case."""
+        return settings.IO_HARNESS_ENABLED
+
+    def execute(self, class_name, temp_dir, input_data, limits, checker):
+        """
+        Runs one IO case and returns a sandbox.ExecutionResult, stopping it
+        once ``checker`` (a comparators.Checker) sees its stdout go wrong.
+        """
+        with parallel.execution_slot():
+            return sandbox.run_java(class_name, temp_dir, input_data, limits, checker.feed)
+
+    async def execute_async(self, class_name, temp_dir, input_data, limits, checker):
+        async with parallel.async_execution_slot():
+            return await sandbox.run_java_async(class_name, temp_dir, input_data, limits, checker.feed)
+
+    def grade(self, question, source, fail_fast, progress=None, owner_id=None):
+        test_cases = _test_cases(question, fail_fast)
+        limits = sandbox.Limits.for_question(question)
+        comparator = comparators.Comparator.for_question(question)
+        results = []
+        runs = []  # the ExecutionResults behind results, for the usage summary
+        case_ids = []  # the TestCase behind each of results
+        progress = progress or (lambda event_type, **payload: None)
+
+        with workspaces.checkout() as temp_dir:
+            # 1) Compile Main.java with the question's files
+            cp = compile_submission(question, source, temp_dir, owner_id)
+            progress("compile-done", ok=cp.returncode == 0, error=cp.stderr or None, compile_ms=cp.compile_ms)
+            if cp.returncode != 0:
+                return _compile_failed(cp)
+
+            # 2) Branch on question type
+            stop_when = (lambda r: not r["passed"]) if fail_fast else None
+
+            def on_result(index, run):
+                # harness callback: cases finish in order, one at a time
+                runs.append(run)
+                if question.question_type == "IO":
+                    results.append(_io_result(test_cases[index], run, comparator))
+                else:
+                    results.append(_unit_result(test_cases[index], run))
+                case_ids.append(test_cases[index].pk)
+                progress("test-result", index=index, result=results[-1])
+                return stop_when is not None and stop_when(results[-1])
+
+            if question.question_type == "IO" and self.uses_harness(limits):
+                # Run every test case inside one JVM, reporting each as it finishes;
+                # a case whose output goes wrong is stopped there
+                inputs = [tc.test_input for tc in test_cases]
+                checkers = [comparator.checker(tc.expected_output) for tc in test_cases]
+                with parallel.execution_slot():
+                    harness.run_cases("Main", temp_dir, inputs, limits, on_result, checkers)
+
+            elif question.question_type == "IO":
+                # Run Main against every test case at once; results keep test-case order
+                def run_case(indexed):
+                    index, tc = indexed
+                    checker = comparator.checker(tc.expected_output)
+                    run = self.execute("Main", temp_dir, tc.test_input, limits, checker)
+                    runs.append(run)
+                    result = _io_result(tc, run, comparator)
+                    progress("test-result", index=index, result=result)
+                    return tc.pk, result
+
+                ran = parallel.map_ordered(run_case, enumerate(test_cases), stop_when=_by_result(stop_when))
+                case_ids = [pk for pk, _ in ran]
+                results = [result for _, result in ran]
+
+            else:
+                # Unit test: call the method named by each test case, all inside one JVM
+                calls = [(tc.method_name, tc.arg_types, tc.test_input or "[]") for tc in test_cases]
+                with parallel.execution_slot():
+                    if not self._run_in_jshell(question, source, calls, limits, on_result):
+                        harness.run_unit_cases("Main", temp_dir, calls, limits, on_result)
+
+        return {
+            "results": results,
+            "case_ids": case_ids,
+            "complete": len(results) == len(test_cases),
+            "compile_ms": cp.compile_ms,
+            "usage": usage.summary(cp, runs),
+        }
+
+    def _run_in_jshell(self, question, source, calls, limits, on_result):
+        """
+        Runs a UNIT submission's cases on the JShell pool when it is on and
+        fits the question. False, with no case run, when the harness should.
+        """
+        if not jshell_pool.enabled_for(limits):
+            return False
+        try:
+            jshell_pool.get_pool().evaluate(question_sources(question, source), calls, limits, on_result)
+            return True
+        except jshell_pool.PoolUnavailable as e:
+            print(f"[WARN] JShell pool unavailable, running the harness: {e}")
+            return False
+
+    async def grade_async(self, question, source, fail_fast, owner_id=None):
+        limits = sandbox.Limits.for_question(question)
+        if question.question_type != "IO" or self.uses_harness(limits):
+            return await parallel.run_blocking(self.grade, question, source, fail_fast, owner_id=owner_id)
+
+        test_cases = _test_cases(question, fail_fast)
+        comparator = comparators.Comparator.for_question(question)
+        with workspaces.checkout() as temp_dir:
+            cp = await parallel.run_blocking(compile_submission, question, source, temp_dir, owner_id)
+            if cp.returncode != 0:
+                return _compile_failed(cp)
+
+            runs = []
+
+            async def run_case(tc):
+                checker = comparator.checker(tc.expected_output)
+                run = await self.execute_async("Main", temp_dir, tc.test_input, limits, checker)
+                runs.append(run)
+                return tc.pk, _io_result(tc, run, comparator)
+
+            stop_when = (lambda r: not r["passed"]) if fail_fast else None
+            ran = await parallel.gather_ordered([run_case(tc) for tc in test_cases], stop_when=_by_result(stop_when))
+
+        return {
+            "results": [result for _, result in ran],
+            "case_ids": [pk for pk, _ in ran],
+            "complete": len(ran) == len(test_cases),
+            "compile_ms": cp.compile_ms,
+            "usage": usage.summary(cp, runs),
+        }
+
+
+class PoolBackend(SubprocessBackend):
+    """
+    Runs IO cases on warm pool JVMs, one case per worker in parallel. Runs
+    allowed more memory than a worker has, and UNIT questions, use fresh JVMs.
+    """
+
+    name = "pool"
+
+    def uses_harness(self, limits):
+        return not jvm_pool.fits(limits) and super().uses_harness(limits)
+
+    def execute(self, class_name, temp_dir, input_data, limits, checker):
+        if jvm_pool.fits(limits):
+            # The runner streams stdout back to the checker and also cuts it
+            # off past the checker's cap.
+            try:
+                with parallel.execution_slot():
+                    return jvm_pool.get_pool().run(
+                        temp_dir, class_name, input_data, limits.with_output_cap(checker.max_bytes), checker.feed
+                    )
+            except jvm_pool.PoolUnavailable as e:
+                print(f"[WARN] JVM pool unavailable, starting a fresh JVM: {e}")
+        return super().execute(class_name, temp_dir, input_data, limits, checker)
+
+    async def execute_async(self, class_name, temp_dir, input_data, limits, checker):
+        if jvm_pool.fits(limits):
+            return await parallel.run_blocking(self.execute, class_name, temp_dir, input_data, limits, checker)
+        return await super().execute_async(class_name, temp_dir, input_data, limits, checker)
+
+
+class RemoteBackend:
+    """
+    Sends submissions to a grading worker over HTTP. The worker shares the
+    database, so only the question id, the source and the mode travel.
+    Progress is reported once the worker's verdict comes back.
+    """
+
+    name = "remote"
+
+    def grade(self, question, source, fail_fast, progress=None, owner_id=None):
+        body = json.dumps({
+            "question_id": question.pk,
+            "source": source,
+            "mode": SUBMIT if fail_fast else RUN,
+        }).encode()
+        request = urllib.request.Request(
+            settings.GRADING_REMOTE_URL,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.GRADING_REMOTE_TOKEN}",
+            },
+        )
+        with urllib.request.urlopen(request, timeout=settings.GRADING_REMOTE_TIMEOUT_SECONDS) as response:
+            verdict = json.loads(response.read())
+        verdict.pop("cached", None)
+        if progress:
+            _replay(verdict, progress)
+        return verdict
+
+    async def grade_async(self, question, source, fail_fast, owner_id=None):
+        return await parallel.run_blocking(self.grade, question, source, fail_fast)
+
+
+class QueueBackend:
+    """
+    Queues submissions for the grading workers and waits for their verdict,
+    so compiling and running never happen in the web process.
+    """
+
+    name = "queue"
+
+    def grade(self, question, source, fail_fast, progress=None, owner_id=None):
+        job = grading_queue.enqueue(question, source, SUBMIT if fail_fast else RUN)
+        verdict = grading_queue.wait(job)
+        if progress:
+            _replay(verdict, progress)
+        return verdict
+
+    async def grade_async(self, question, source, fail_fast, owner_id=None):
+        job = await parallel.run_blocking(grading_queue.enqueue, question, source, SUBMIT if fail_fast else RUN)
+        return await grading_queue.wait_async(job)
+
+
+BACKENDS = {backend.name: backend for backend in (SubprocessBackend, PoolBackend, QueueBackend, RemoteBackend)}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """The backend called ``name``, by default the one GRADING_BACKEND selects."""
+    name = name or settings.GRADING_BACKEND
+    if name not in _backends:
+        try:
+            _backends[name] = BACKENDS[name]()
+        except KeyError:
+            raise ValueError(f"unknown GRADING_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return _backends[name]
+
+
+def local_backend():
+    """The configured backend, or a local one when that hands work elsewhere (used by grading workers)."""
+    backend = get_backend()
+    if isinstance(backend, (QueueBackend, RemoteBackend)):
+        return get_backend(PoolBackend.name if settings.JVM_POOL_ENABLED else SubprocessBackend.name)
+    return backend
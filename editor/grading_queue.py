@@ -0,0 +1,134 @@
+"""
+Durable queue of grading jobs, stored as GradingJob rows.
+
+Web processes enqueue submissions and wait for the verdict (the "queue"
+backend in editor/grading.py); ``manage.py grading_worker`` processes claim
+jobs, grade them with their local backend and write the verdict back. Any
+number of workers can share the queue, on one box or on several pointed at
+the same database, so grading capacity scales apart from the web workers.
+
+A worker holds a job under a lease (GRADING_QUEUE_LEASE_SECONDS) that it
+renews while grading, so a slow job is not taken over by another worker.
+A job whose worker died is picked up again once its lease runs out, and a
+job whose grading raised is retried, both up to GRADING_QUEUE_MAX_ATTEMPTS.
+"""
+import asyncio
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from editor.models import GradingJob
+
+
+class JobFailed(Exception):
+    """The job ran out of attempts, or no verdict arrived in time."""
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(question, source, mode):
+    return GradingJob.objects.create(question=question, source=source, mode=mode)
+
+
+def claim(worker):
+    """
+    Takes the oldest job that is queued or whose lease ran out, or returns
+    None. Safe to call from many workers at once: the conditional update
+    lets exactly one of them win each job.
+    """
+    now = timezone.now()
+    claimable = Q(status=GradingJob.QUEUED) | Q(status=GradingJob.RUNNING, lease_expires_at__lt=now)
+    for job in GradingJob.objects.filter(claimable).order_by("created_at")[:10]:
+        if job.attempts >= settings.GRADING_QUEUE_MAX_ATTEMPTS:
+            _finish(job.pk, job.status, GradingJob.FAILED, error=job.error or "worker lost the job")
+            continue
+        won = GradingJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status=GradingJob.RUNNING,
+            attempts=job.attempts + 1,
+            worker=worker,
+            started_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.GRADING_QUEUE_LEASE_SECONDS),
+        )
+        if won:
+            return GradingJob.objects.select_related("question").get(pk=job.pk)
+    return None
+
+
+def renew(job):
+    """Extends the lease of a job this worker still holds; False if it no longer does."""
+    return bool(GradingJob.objects.filter(
+        pk=job.pk, status=GradingJob.RUNNING, worker=job.worker, attempts=job.attempts
+    ).update(lease_expires_at=timezone.now() + timedelta(seconds=settings.GRADING_QUEUE_LEASE_SECONDS)))
+
+
+def _finish(pk, from_status, status, verdict=None, error=""):
+    GradingJob.objects.filter(pk=pk, status=from_status).update(
+        status=status, verdict=verdict, error=error, finished_at=timezone.now(), lease_expires_at=None
+    )
+
+
+def complete(job, verdict):
+    _finish(job.pk, GradingJob.RUNNING, GradingJob.DONE, verdict=verdict)
+
+
+def fail(job, error):
+    """Puts the job back in the queue, or marks it failed once it is out of attempts."""
+    if job.attempts < settings.GRADING_QUEUE_MAX_ATTEMPTS:
+        GradingJob.objects.filter(pk=job.pk, status=GradingJob.RUNNING).update(
+            status=GradingJob.QUEUED, error=error, lease_expires_at=None
+        )
+    else:
+        _finish(job.pk, GradingJob.RUNNING, GradingJob.FAILED, error=error)
+
+
+def _result(job):
+    if job.status == GradingJob.DONE:
+        return job.verdict
+    raise JobFailed(f"grading failed after {job.attempts} attempts: {job.error}")
+
+
+def wait(job):
+    """Blocks until a worker has graded the job and returns its verdict."""
+    deadline = time.monotonic() + settings.GRADING_QUEUE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        job = GradingJob.objects.get(pk=job.pk)
+        if job.status in (GradingJob.DONE, GradingJob.FAILED):
+            return _result(job)
+        time.sleep(settings.GRADING_QUEUE_POLL_SECONDS)
+    raise JobFailed(f"no grading worker answered within {settings.GRADING_QUEUE_WAIT_SECONDS} s")
+
+
+async def wait_async(job):
+    """wait for the async views, sleeping on the event loop between polls."""
+    deadline = time.monotonic() + settings.GRADING_QUEUE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        job = await GradingJob.objects.aget(pk=job.pk)
+        if job.status in (GradingJob.DONE, GradingJob.FAILED):
+            return _result(job)
+        await asyncio.sleep(settings.GRADING_QUEUE_POLL_SECONDS)
+    raise JobFailed(f"no grading worker answered within {settings.GRADING_QUEUE_WAIT_SECONDS} s")
+
+
+def depth():
+    """Job counts per status, plus the age of the oldest queued job in seconds."""
+    counts = dict.fromkeys((status for status, _ in GradingJob.STATUS_CHOICES), 0)
+    for row in GradingJob.objects.values("status").annotate(n=Count("id")):
+        counts[row["status"]] = row["n"]
+    oldest = GradingJob.objects.filter(status=GradingJob.QUEUED).order_by("created_at").first()
+    counts["oldest_queued_seconds"] = (timezone.now() - oldest.created_at).total_seconds() if oldest else 0
+    return counts
+
+
+def purge(older_than):
+    """Deletes finished jobs older than ``older_than`` (a timedelta). Returns how many."""
+    finished = GradingJob.objects.filter(
+        status__in=(GradingJob.DONE, GradingJob.FAILED), finished_at__lt=timezone.now() - older_than
+    )
+    return finished.delete()[0]
@@ -0,0 +1,221 @@
+"""
+Runs all the test cases of a submission in one JVM (see
+java/MultiCaseHarness.java) instead of launching a JVM per case: IO cases
+run main with each input, UNIT cases call a method with JSON arguments.
+
+The harness reports each case as soon as it finishes. If it stops early
+(a case hit a limit, called System.exit or crashed the JVM), a new harness
+is started for the cases that are left, so one bad case never costs the
+others their results. While an IO case runs, the harness streams its stdout
+back, so a case whose output has already gone wrong is stopped there.
+"""
+import select
+import struct
+import subprocess
+import time
+
+from django.conf import settings
+
+from editor import cds, jvm_pool, sandbox, usage
+
+# Same statuses as PooledRunner, plus a per-case timeout.
+STATUS_TIMEOUT = 6
+STATUS_OUTPUT_CHUNK = jvm_pool.STATUS_OUTPUT_CHUNK
+
+_INT = struct.Struct(">i")
+_CASE_HEADER = struct.Struct(">iiq")
+
+_OUTCOMES = {**jvm_pool.OUTCOMES, STATUS_TIMEOUT: (1, "time")}
+
+# Allowance for JVM startup on top of a case's own time limit before the
+# harness is considered hung.
+_STARTUP_SECONDS = 2.0
+
+
+def _read_exact(stream, size):
+    # stdout is unbuffered (so select sees everything not yet read): reads can come up short
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("harness closed its output")
+        data += chunk
+    return data
+
+
+def _read_bytes(stream):
+    (size,) = _INT.unpack(_read_exact(stream, _INT.size))
+    return _read_exact(stream, size)
+
+
+def _read_frame(stream):
+    """One frame: (position, status, nanos, stdout, stderr, value), the outputs as bytes."""
+    position, status, nanos = _CASE_HEADER.unpack(_read_exact(stream, _CASE_HEADER.size))
+    return position, status, nanos, _read_bytes(stream), _read_bytes(stream), _read_bytes(stream)
+
+
+def harness_command(mode, class_name, classpath, limits):
+    return [
+        settings.JAVA_BIN,
+        f"-Xmx{limits.memory_limit_mb}m",
+        *cds.java_flags(),
+        "-cp", cds.classpath(),
+        "MultiCaseHarness",
+        mode,
+        classpath,
+        class_name,
+        str(limits.time_limit_ms),
+        str(limits.max_output_bytes),
+        str(limits.thread_limit),
+        str(limits.stack_limit_kb * 1024),
+    ]
+
+
+def encode_cases(cases):
+    """The harness's stdin: the case count, then each case's fields."""
+    request = _INT.pack(len(cases))
+    for fields in cases:
+        request += _INT.pack(len(fields))
+        for text in fields:
+            data = (text or "").encode()
+            request += _INT.pack(len(data)) + data
+    return request
+
+
+def _start(mode, class_name, classpath, cases, limits):
+    proc = subprocess.Popen(
+        harness_command(mode, class_name, classpath, limits),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        bufsize=0,
+        start_new_session=True,
+    )
+    sandbox.apply_cpu_limit(proc.pid, limits.cpu_limit_seconds * len(cases))
+    sandbox.apply_file_limit(proc.pid)
+    try:
+        proc.stdin.write(encode_cases(cases))
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    return proc
+
+
+def _stop(proc):
+    if usage.reap(proc, block=False) is None:
+        sandbox.kill_group(proc)
+    usage.reap(proc)
+    proc.stdout.close()
+
+
+def run_cases(class_name, classpath, inputs, limits, on_result=None, checkers=None):
+    """
+    Runs class_name once per input and returns a sandbox.ExecutionResult per
+    case, in input order. ``on_result(index, result)`` is called as each case
+    finishes; if it returns True the remaining cases are skipped and only
+    the results so far are returned. ``checkers`` optionally gives each case
+    a comparators.Checker: its stdout is fed to it as it arrives, and a case
+    that can no longer match, or prints past the checker's ``max_bytes``, is
+    stopped and reported as a mismatch.
+    """
+    if checkers is None:
+        return _run("io", class_name, classpath, [[text] for text in inputs], limits, on_result)
+    cases = [[text, str(checker.max_bytes)] for text, checker in zip(inputs, checkers)]
+    case_limits = [limits.with_output_cap(checker.max_bytes) for checker in checkers]
+    return _run("io", class_name, classpath, cases, limits, on_result, case_limits, checkers)
+
+
+def run_unit_cases(class_name, classpath, calls, limits, on_result=None):
+    """
+    run_cases for UNIT questions: ``calls`` are (method name, comma-separated
+    Java parameter types, JSON array of arguments). Each result's ``value``
+    is the JSON the method returned, or None if it threw.
+    """
+    return _run("unit", class_name, classpath, [list(call) for call in calls], limits, on_result)
+
+
+def _run(mode, class_name, classpath, cases, limits, on_result, case_limits=None, checkers=None):
+    case_limits = case_limits or [limits] * len(cases)
+    results = {}
+    pending = list(range(len(cases)))
+    case_seconds = limits.time_limit_ms / 1000
+
+    while pending:
+        proc = _start(mode, class_name, classpath, [cases[i] for i in pending], limits)
+        launched = time.monotonic()
+        reported = output_bytes = peak_kb = 0
+        stop = hung = diverged = False
+        streamed = b""  # stdout of the running case, as streamed so far
+        started = time.monotonic()
+        try:
+            while reported < len(pending):
+                timeout = started + case_seconds + _STARTUP_SECONDS - time.monotonic()
+                ready, _, _ = select.select([proc.stdout], [], [], max(timeout, 0))
+                if not ready:
+                    hung = True  # stuck past the case's own time limit
+                    break
+                try:
+                    position, status, nanos, stdout, stderr, value = _read_frame(proc.stdout)
+                except (EOFError, struct.error):
+                    break
+                index = pending[position]
+                if status == STATUS_OUTPUT_CHUNK:
+                    streamed += stdout
+                    if checkers is not None and not checkers[index].feed(stdout):
+                        diverged = True  # the output can no longer match
+                        output_bytes += len(streamed)
+                        break
+                    continue
+                streamed = b""
+                value = value.decode("utf-8", errors="replace")
+                output_bytes += len(stdout) + len(stderr)
+                peak_kb = max(peak_kb, usage.peak_rss_kb(proc.pid) or 0)
+                returncode, limit = _OUTCOMES.get(status, (1, None))
+                results[index] = sandbox.classify(
+                    returncode,
+                    stdout.decode("utf-8", errors="replace"),
+                    stderr.decode("utf-8", errors="replace"),
+                    limit,
+                    case_limits[index],
+                    nanos / 1e6,
+                )
+                results[index].value = value or None
+                reported = position + 1
+                started = time.monotonic()
+                if on_result and on_result(index, results[index]):
+                    stop = True
+                    break
+        finally:
+            _stop(proc)
+
+        # the cases this JVM ran share its usage
+        process_usage = usage.Usage.from_rusage(
+            getattr(proc, "rusage", None), (time.monotonic() - launched) * 1000, output_bytes, peak_kb
+        )
+        for index in pending[:reported]:
+            results[index].usage = process_usage
+
+        if stop:
+            break
+        # The harness exits after a case that stopped at a limit or left
+        # threads behind; a fresh one picks up the rest. Only a hang, output
+        # that went wrong, or dying before reporting anything, is charged to
+        # the case it was running.
+        if reported < len(pending) and (hung or diverged or reported == 0):
+            index = pending[reported]
+            elapsed_ms = (time.monotonic() - started) * 1000
+            if diverged:
+                stdout = streamed.decode("utf-8", errors="replace")
+                results[index] = sandbox.classify(1, stdout, "", "mismatch", case_limits[index], elapsed_ms)
+            elif hung:
+                results[index] = sandbox.classify(None, "", "", "time", case_limits[index], elapsed_ms)
+            else:
+                message = f"JVM exited with status {proc.returncode}" if proc.returncode >= 0 else ""
+                results[index] = sandbox.classify(proc.returncode or 1, "", message, None, case_limits[index], elapsed_ms)
+            results[index].usage = process_usage
+            reported += 1
+            if on_result and on_result(index, results[index]):
+                break
+        pending = pending[reported:]
+
+    return [results[i] for i in sorted(results)]
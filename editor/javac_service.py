@@ -0,0 +1,351 @@
+"""
+Client for the long-running javac daemon (see java/CompileServer.java).
+
+The daemon keeps javax.tools.JavaCompiler warm and compiles in memory, so a
+Run click no longer pays javac's JVM startup and JIT warmup. Up to
+JAVAC_DAEMON_POOL_SIZE daemons compile side by side, one request each, and
+the editor's compile checks (editor/compile_check.py) have daemons of their
+own, so they never wait for grading's or hold them up. A daemon that has
+not answered within JAVAC_DAEMON_TIMEOUT_SECONDS is killed.
+When no daemon can be used, compilation falls back to writing the file and
+running ``javac``.
+"""
+import atexit
+import os
+import queue
+import re
+import select
+import struct
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+from editor import artifacts, usage
+
+STATUS_OK = 0
+STATUS_ERRORS = 1
+STATUS_CRASHED = 2
+
+# daemon pools: grading compiles, and the compile checks behind the editor's diagnostics
+GRADING = "grading"
+CHECKS = "checks"
+
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+
+SEVERITIES = {
+    "ERROR": "error",
+    "WARNING": "warning",
+    "MANDATORY_WARNING": "warning",
+    "NOTE": "info",
+    "OTHER": "info",
+}
+
+# "/tmp/abc/Main.java:3: error: ';' expected"
+_JAVAC_LINE = re.compile(r"^(?P<file>.+?\.java):(?P<line>\d+): (?P<kind>error|warning): (?P<message>.*)$")
+
+
+class CompileResult:
+    """
+    Outcome of one compilation. Quacks like the CompletedProcess the views
+    used to get from subprocess.run (returncode, stdout, stderr) and adds the
+    structured diagnostics and how long javac took.
+    """
+
+    def __init__(self, returncode, stderr="", diagnostics=None, compile_ms=0.0, via="javac", cacheable=True,
+                 cpu_ms=None):
+        self.returncode = returncode
+        self.stdout = ""
+        self.stderr = stderr
+        self.diagnostics = diagnostics or []
+        self.compile_ms = compile_ms
+        self.cpu_ms = cpu_ms  # javac's user + system CPU, when it ran as a subprocess
+        self.via = via
+        self.cacheable = cacheable  # False when the compiler itself failed
+
+
+class DaemonUnavailable(Exception):
+    """No daemon can take the request; the caller should use the javac subprocess."""
+
+
+class CompileTimedOut(Exception):
+    """The daemon did not answer in time; it must be killed."""
+
+
+def _read_exact(stream, size, deadline):
+    # stdout is unbuffered, so select sees everything not read yet; reads can come up short
+    data = b""
+    while len(data) < size:
+        if not select.select([stream], [], [], max(0.0, deadline - time.monotonic()))[0]:
+            raise CompileTimedOut(f"no answer within {settings.JAVAC_DAEMON_TIMEOUT_SECONDS} s")
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("javac daemon closed its output")
+        data += chunk
+    return data
+
+
+def _read_int(stream, deadline):
+    return _INT.unpack(_read_exact(stream, _INT.size, deadline))[0]
+
+
+def _read_long(stream, deadline):
+    return _LONG.unpack(_read_exact(stream, _LONG.size, deadline))[0]
+
+
+def _read_bytes(stream, deadline):
+    return _read_exact(stream, _read_int(stream, deadline), deadline)
+
+
+def _read_str(stream, deadline):
+    return _read_bytes(stream, deadline).decode("utf-8", errors="replace")
+
+
+def _frame(text):
+    data = text.encode()
+    return _INT.pack(len(data)) + data
+
+
+def format_diagnostics(diagnostics, sources):
+    """
+    Renders diagnostics the way command-line javac prints them (message,
+    offending source line, caret), so the editor output looks the same
+    whichever path compiled the code.
+    """
+    lines = []
+    errors = warnings = 0
+    for d in diagnostics:
+        location = f"{d['file']}:{d['line']}: " if d["file"] and d["line"] > 0 else ""
+        kind = "error" if d["severity"] == "error" else "warning" if d["severity"] == "warning" else "note"
+        lines.append(f"{location}{kind}: {d['message']}")
+        source_lines = sources.get(d["file"], "").splitlines()
+        if 0 < d["line"] <= len(source_lines) and d["column"] > 0:
+            lines.append(source_lines[d["line"] - 1])
+            lines.append(" " * (d["column"] - 1) + "^")
+        errors += kind == "error"
+        warnings += kind == "warning"
+    for count, noun in ((errors, "error"), (warnings, "warning")):
+        if count:
+            lines.append(f"{count} {noun}{'s' if count > 1 else ''}")
+    return "\n".join(lines)
+
+
+def parse_javac_output(stderr):
+    """Turns command-line javac output back into structured diagnostics."""
+    diagnostics = []
+    lines = stderr.splitlines()
+    for i, line in enumerate(lines):
+        m = _JAVAC_LINE.match(line)
+        if not m:
+            continue
+        column = 0
+        # javac follows each message with the source line and a caret line
+        if i + 2 < len(lines) and lines[i + 2].strip() == "^":
+            column = lines[i + 2].index("^") + 1
+        diagnostics.append({
+            "severity": m.group("kind"),
+            "file": os.path.basename(m.group("file")),
+            "line": int(m.group("line")),
+            "column": column,
+            "message": m.group("message"),
+        })
+    return diagnostics
+
+
+class JavacDaemon:
+    """One CompileServer JVM, serving one request at a time (see DaemonPool)."""
+
+    def __init__(self, server_cp):
+        self.proc = subprocess.Popen(
+            [settings.JAVA_BIN, f"-Xmx{settings.JAVAC_DAEMON_XMX_MB}m", "-cp", server_cp, "CompileServer"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def compile(self, sources, classpath=""):
+        """
+        Compiles ``sources`` ({file name: code}) and returns
+        (status, compile_nanos, {binary name: class bytes}, diagnostics).
+        Raises CompileTimedOut past JAVAC_DAEMON_TIMEOUT_SECONDS.
+        """
+        request = _INT.pack(len(sources))
+        for name, code in sources.items():
+            request += _frame(name) + _frame(code)
+        request += _frame(classpath)
+
+        self.proc.stdin.write(request)
+        self.proc.stdin.flush()
+        deadline = time.monotonic() + settings.JAVAC_DAEMON_TIMEOUT_SECONDS
+        out = self.proc.stdout
+        status = _read_int(out, deadline)
+        nanos = _read_long(out, deadline)
+        classes = {}
+        for _ in range(_read_int(out, deadline)):
+            name = _read_str(out, deadline)
+            classes[name] = _read_bytes(out, deadline)
+        diagnostics = []
+        for _ in range(_read_int(out, deadline)):
+            kind = _read_str(out, deadline)
+            diagnostics.append({
+                "severity": SEVERITIES.get(kind, "info"),
+                "file": _read_str(out, deadline),
+                "line": _read_long(out, deadline),
+                "column": _read_long(out, deadline),
+                "message": _read_str(out, deadline),
+            })
+        return status, nanos, classes, diagnostics
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+
+
+class DaemonPool:
+    """
+    Up to ``size`` daemons, started on demand. A compile blocks while all of
+    them are busy. After a failed start no daemon is started for
+    JAVAC_DAEMON_RETRY_SECONDS.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._slots = threading.Semaphore(size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self.stats = {"compiles": 0, "started": 0, "timed_out": 0, "crashed": 0}
+
+    def _checkout(self):
+        while True:
+            try:
+                daemon = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if daemon.alive():
+                return daemon
+            daemon.close()
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                raise DaemonUnavailable("javac daemon is down")
+            try:
+                daemon = JavacDaemon(artifacts.classpath("CompileServer"))
+            except (OSError, subprocess.CalledProcessError) as e:
+                self._retry_at = time.monotonic() + settings.JAVAC_DAEMON_RETRY_SECONDS
+                raise DaemonUnavailable(f"could not start javac daemon: {e}") from e
+            self.stats["started"] += 1
+            return daemon
+
+    def compile(self, sources, classpath=""):
+        """JavacDaemon.compile on an idle daemon; raises DaemonUnavailable when none can do it."""
+        with self._slots:
+            daemon = self._checkout()
+            try:
+                result = daemon.compile(sources, classpath)
+            except (OSError, EOFError, struct.error, CompileTimedOut) as e:
+                daemon.close()
+                with self._lock:
+                    self.stats["timed_out" if isinstance(e, CompileTimedOut) else "crashed"] += 1
+                raise DaemonUnavailable(str(e)) from e
+            with self._lock:
+                self.stats["compiles"] += 1
+            self._idle.put(daemon)
+            return result
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, size=self.size, idle=self._idle.qsize())
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}  # GRADING or CHECKS -> DaemonPool
+_pool_lock = threading.Lock()
+
+
+def get_pool(lane=GRADING):
+    """The process-wide daemon pool of ``lane``."""
+    with _pool_lock:
+        if lane not in _pools:
+            size = settings.COMPILE_CHECK_MAX_PARALLEL if lane == CHECKS else settings.JAVAC_DAEMON_POOL_SIZE
+            _pools[lane] = DaemonPool(size)
+            atexit.register(_pools[lane].shutdown)
+        return _pools[lane]
+
+
+def _write_classes(classes, out_dir):
+    for binary_name, data in classes.items():
+        path = os.path.join(out_dir, *binary_name.split(".")) + ".class"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def compile_with_daemon(sources, out_dir, classpath="", lane=GRADING):
+    """Compiles through a daemon of ``lane`` and writes the class files into out_dir."""
+    status, nanos, classes, diagnostics = get_pool(lane).compile(sources, classpath)
+    _write_classes(classes, out_dir)
+    return CompileResult(
+        returncode=0 if status == STATUS_OK else 1,
+        stderr="" if status == STATUS_OK else format_diagnostics(diagnostics, sources),
+        diagnostics=diagnostics,
+        compile_ms=nanos / 1e6,
+        via="daemon",
+        cacheable=status != STATUS_CRASHED,
+    )
+
+
+def compile_with_subprocess(sources, out_dir, classpath=""):
+    """The original path: write the sources to disk and run javac on them."""
+    paths = []
+    for name, code in sources.items():
+        path = os.path.join(out_dir, name)
+        with open(path, "w") as f:
+            f.write(code)
+        paths.append(path)
+
+    cmd = [settings.JAVAC_BIN]
+    if classpath:
+        cmd += ["-cp", classpath]
+    start = time.perf_counter()
+    # javac only writes to stderr; reaped with wait4 to get its rusage
+    proc = subprocess.Popen(cmd + paths, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    with proc.stderr:
+        stderr = proc.stderr.read()
+    usage.reap(proc)
+    elapsed = (time.perf_counter() - start) * 1000
+    rusage = getattr(proc, "rusage", None)
+    return CompileResult(
+        returncode=proc.returncode,
+        stderr=stderr,
+        diagnostics=parse_javac_output(stderr),
+        compile_ms=elapsed,
+        via="javac",
+        cpu_ms=(rusage.ru_utime + rusage.ru_stime) * 1000 if rusage else None,
+    )
+
+
+def compile_sources(sources, out_dir, classpath="", lane=GRADING):
+    """
+    Compiles ``sources`` ({file name: code}) into ``out_dir``, preferring a
+    daemon of ``lane`` and falling back to a javac subprocess when none is
+    available.
+    """
+    if settings.JAVAC_DAEMON_ENABLED:
+        try:
+            return compile_with_daemon(sources, out_dir, classpath, lane)
+        except DaemonUnavailable as e:
+            print(f"[WARN] javac daemon unavailable, running javac: {e}")
+    return compile_with_subprocess(sources, out_dir, classpath)
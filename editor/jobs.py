@@ -0,0 +1,104 @@
+"""
+In-process registry of run jobs.
+
+Pressing Run starts a job and answers straight away with its id. The job
+grades the code on the grading executor and records progress events as it
+goes (compile-done, one test-result per test case, then done); the
+RunJobConsumer in CodeEditor/consumers.py replays and streams those events to
+the browser over a WebSocket. Finished jobs are forgotten after
+RUN_JOB_TTL_SECONDS.
+
+Jobs live in this process's memory, so the WebSocket must reach the same
+server process that started the job.
+"""
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from editor import parallel
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class RunJob:
+    """One run: its ordered event log plus the queues of connected listeners."""
+
+    def __init__(self, owner_id):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.events = []
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._listeners = []  # (event loop, asyncio.Queue)
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def publish(self, event_type, **payload):
+        """Appends an event and hands it to every listener. Safe from any thread."""
+        with self._lock:
+            event = dict(payload, type=event_type, seq=len(self.events))
+            self.events.append(event)
+            if event_type == "done":
+                self.finished_at = time.monotonic()
+            listeners = list(self._listeners)
+        for loop, q in listeners:
+            loop.call_soon_threadsafe(q.put_nowait, event)
+
+    def subscribe(self):
+        """
+        Returns (past events, queue) for the calling event loop. Events
+        published from now on are put on the queue.
+        """
+        q = asyncio.Queue()
+        with self._lock:
+            self._listeners.append((asyncio.get_running_loop(), q))
+            return list(self.events), q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._listeners = [(loop, other) for loop, other in self._listeners if other is not q]
+
+
+def _prune():
+    """Drops jobs that finished more than RUN_JOB_TTL_SECONDS ago. Holds _jobs_lock."""
+    cutoff = time.monotonic() - settings.RUN_JOB_TTL_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.done and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def start(owner_id, grade, ready=None):
+    """
+    Registers a job and runs ``grade(progress)`` for it on the grading
+    executor. ``grade`` gets the job's publish method as its progress
+    callback and returns the final verdict, published as the done event.
+    With ``ready`` (a concurrent Future, see editor/scheduler.py) the job
+    only goes to the executor once it is done, so no thread sits waiting.
+    """
+    job = RunJob(owner_id)
+    with _jobs_lock:
+        _prune()
+        _jobs[job.id] = job
+
+    def run():
+        try:
+            verdict = grade(job.publish)
+        except Exception as e:
+            verdict = {"error": str(e)}
+        job.publish("done", verdict=verdict)
+
+    if ready is None:
+        parallel.blocking_executor().submit(run)
+    else:
+        ready.add_done_callback(lambda _: parallel.blocking_executor().submit(run))
+    return job
+
+
+def get(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
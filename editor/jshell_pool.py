@@ -0,0 +1,329 @@
+"""
+Pool of warm JShell runner JVMs for UNIT questions (see java/JShellRunner.java).
+
+A UNIT question only needs a method called, so once javac has accepted a
+submission its test cases can run in a JVM that is already up instead of a
+fresh MultiCaseHarness launch: the code is evaluated in a JShell session
+there and every test case calls the method in that JVM. A session serves
+one submission (one case, unless none of the loaded classes has static
+state) and is replaced by a fresh one, warmed up while the worker is idle.
+
+Runs get the question's limits like the harness: the runner caps output,
+threads and CPU time and times each case, the pool kills a worker that
+stops answering, and memory is the worker heap, so only questions whose
+memory limit is exactly JSHELL_POOL_XMX_MB come here. A case that hit a
+limit ends its worker; the remaining cases continue on another one.
+Workers are also recycled after JSHELL_POOL_MAX_RUNS submissions or once
+their retained heap passes JSHELL_POOL_MAX_HEAP_MB.
+"""
+import atexit
+import os
+import queue
+import select
+import struct
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+from editor import artifacts, harness, javac_service, jvm_pool, sandbox, usage
+
+COMPILED = 0
+COMPILE_ERRORS = 1
+
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+_LIMITS = struct.Struct(">qqiqq")
+_CASE_HEADER = struct.Struct(">iiq")
+
+_OUTCOMES = {**jvm_pool.OUTCOMES, harness.STATUS_TIMEOUT: (1, "time")}
+
+# Allowance on top of a case's own time limit before the worker is considered hung.
+_CASE_GRACE_SECONDS = 2.0
+
+
+class PoolUnavailable(Exception):
+    """The pool cannot evaluate this submission; the caller should run it with the harness."""
+
+
+class RunTimedOut(Exception):
+    """The worker stopped answering; it must be killed."""
+
+
+def enabled_for(limits):
+    """True when JShell evaluation is on and the worker heap is the question's memory limit."""
+    return settings.JSHELL_POOL_ENABLED and limits.memory_limit_mb == settings.JSHELL_POOL_XMX_MB
+
+
+def _read_exact(stream, size):
+    # stdout is unbuffered (so select sees everything not yet read): reads can come up short
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("JShell runner closed its output")
+        data += chunk
+    return data
+
+
+def _read_bytes(stream):
+    (size,) = _INT.unpack(_read_exact(stream, _INT.size))
+    return _read_exact(stream, size)
+
+
+def _read_str(stream):
+    return _read_bytes(stream).decode("utf-8", errors="replace")
+
+
+def _frame(text):
+    data = (text or "").encode()
+    return _INT.pack(len(data)) + data
+
+
+class JShellWorker:
+    """One JShellRunner JVM, talking its framing over the pipes."""
+
+    def __init__(self, runner_cp):
+        self.proc = subprocess.Popen(
+            [settings.JAVA_BIN, f"-Xmx{settings.JSHELL_POOL_XMX_MB}m", "-cp", runner_cp, "JShellRunner"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        sandbox.apply_file_limit(self.proc.pid)
+        self.runs = 0
+        self.retained_heap = 0
+
+    def _wait(self, seconds):
+        ready, _, _ = select.select([self.proc.stdout], [], [], seconds)
+        if not ready:
+            raise RunTimedOut(f"no answer within {seconds:.1f} s")
+
+    def send(self, sources, calls, limits):
+        request = _INT.pack(len(sources))
+        for name, code in sources.items():
+            request += _frame(name) + _frame(code)
+        request += _INT.pack(len(calls))
+        for call in calls:
+            request += b"".join(_frame(field) for field in call)
+        request += _LIMITS.pack(limits.time_limit_ms, limits.max_output_bytes, limits.thread_limit,
+                                limits.stack_limit_kb * 1024, limits.cpu_limit_seconds * 1_000_000_000)
+        self.proc.stdin.write(request)
+        self.proc.stdin.flush()
+        self.runs += 1
+
+    def read_compile(self):
+        """(compiled, eval nanos, diagnostics in javac_service's form)."""
+        self._wait(settings.JSHELL_POOL_COMPILE_TIMEOUT_SECONDS)
+        out = self.proc.stdout
+        status, nanos = _INT.unpack(_read_exact(out, _INT.size))[0], _LONG.unpack(_read_exact(out, _LONG.size))[0]
+        diagnostics = []
+        for _ in range(_INT.unpack(_read_exact(out, _INT.size))[0]):
+            kind = _read_str(out)
+            diagnostics.append({
+                "severity": javac_service.SEVERITIES.get(kind, "info"),
+                "file": _read_str(out),
+                "line": _LONG.unpack(_read_exact(out, _LONG.size))[0],
+                "column": _LONG.unpack(_read_exact(out, _LONG.size))[0],
+                "message": _read_str(out),
+            })
+        return status == COMPILED, nanos, diagnostics
+
+    def read_case(self, seconds):
+        """(position, status, nanos, stdout, stderr, value) of the next case."""
+        self._wait(seconds)
+        position, status, nanos = _CASE_HEADER.unpack(_read_exact(self.proc.stdout, _CASE_HEADER.size))
+        stdout = _read_bytes(self.proc.stdout)
+        stderr = _read_bytes(self.proc.stdout)
+        value = _read_str(self.proc.stdout)
+        return position, status, nanos, stdout, stderr, value
+
+    def read_trailer(self):
+        self._wait(_CASE_GRACE_SECONDS)
+        (self.retained_heap,) = _LONG.unpack(_read_exact(self.proc.stdout, _LONG.size))
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+
+
+class JShellPool:
+    """
+    Hands out warm workers, blocking when all ``size`` of them are busy.
+    Retired workers are replaced in the background so the pool stays warm.
+    """
+
+    def __init__(self, size, max_runs, max_heap_mb):
+        self.size = size
+        self.max_runs = max_runs
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+        # Unit.call's argument conversion comes from MultiCaseHarness
+        self._runner_cp = os.pathsep.join(artifacts.classpath(name) for name in ("JShellRunner", "MultiCaseHarness"))
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self.stats = {"submissions": 0, "cases": 0, "rejected": 0, "spawned": 0, "recycled": 0,
+                      "crashed": 0, "timed_out": 0}
+
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = JShellWorker(self._runner_cp)
+        with self._lock:
+            self._workers.add(worker)
+            self.stats["spawned"] += 1
+        return worker
+
+    def _retire(self, worker, reason):
+        with self._lock:
+            self._workers.discard(worker)
+            self.stats[reason] += 1
+        worker.close()
+        threading.Thread(target=self._replace, daemon=True).start()
+
+    def _replace(self):
+        try:
+            self._idle.put(self._spawn())
+        except OSError:
+            # The java binary went away; evaluate() notices the empty pool.
+            pass
+
+    def _checkin(self, worker):
+        if not worker.alive() or worker.runs >= self.max_runs or worker.retained_heap >= self.max_heap_bytes:
+            self._retire(worker, "recycled")
+        else:
+            self._idle.put(worker)
+
+    def evaluate(self, sources, calls, limits, on_result=None):
+        """
+        Evaluates ``sources`` ({file name: code}, Main.java among them, that
+        javac already accepted) and runs ``calls`` as harness.run_unit_cases
+        does, with the same ``on_result`` (returning True skips the results
+        still to come) and return value. Raises PoolUnavailable, before any
+        case ran, when no worker is up or JShell rejects the code.
+        """
+        compiled = False
+        results = {}
+        pending = list(range(len(calls)))
+        stop = False
+
+        while not compiled or (pending and not stop):
+            with self._lock:
+                if not self._workers:
+                    raise PoolUnavailable("no live JShell runners")
+            worker = self._idle.get()
+            reported = 0
+            started = time.monotonic()
+            try:
+                worker.send(sources, [calls[i] for i in pending], limits)
+                ok, _, diagnostics = worker.read_compile()
+                if not ok:
+                    worker.read_trailer()
+                    self._checkin(worker)
+                    with self._lock:
+                        self.stats["rejected"] += 1
+                    if compiled:
+                        break  # accepted by an earlier runner: leave the rest unrun rather than run them twice
+                    raise PoolUnavailable(javac_service.format_diagnostics(diagnostics, sources))
+                if not compiled:
+                    compiled = True
+                    with self._lock:
+                        self.stats["submissions"] += 1
+
+                while reported < len(pending):
+                    started = time.monotonic()
+                    position, status, case_nanos, stdout, stderr, value = worker.read_case(
+                        limits.time_limit_ms / 1000 + _CASE_GRACE_SECONDS
+                    )
+                    reported = position + 1
+                    if stop:
+                        continue  # read only to keep the worker in step
+                    returncode, limit = _OUTCOMES.get(status, (1, None))
+                    index = pending[position]
+                    run = sandbox.classify(
+                        returncode,
+                        stdout.decode("utf-8", errors="replace"),
+                        stderr.decode("utf-8", errors="replace"),
+                        limit,
+                        limits,
+                        case_nanos / 1e6,
+                    )
+                    run.value = value or None
+                    # the worker JVM is shared, so there is no rusage of this case alone
+                    run.usage = usage.Usage(case_nanos / 1e6, output_bytes=len(stdout) + len(stderr))
+                    results[index] = run
+                    with self._lock:
+                        self.stats["cases"] += 1
+                    if on_result and on_result(index, run):
+                        stop = True
+                worker.read_trailer()
+                self._checkin(worker)
+                pending = []
+            except RunTimedOut:
+                self._retire(worker, "timed_out")
+                if not compiled:
+                    raise PoolUnavailable("JShell runner did not compile in time")
+                if reported < len(pending):
+                    # the case it was running is charged with the hang, unless the caller stopped listening
+                    if not stop:
+                        index = pending[reported]
+                        elapsed_ms = (time.monotonic() - started) * 1000
+                        results[index] = sandbox.classify(None, "", "", "time", limits, elapsed_ms)
+                        if on_result and on_result(index, results[index]):
+                            stop = True
+                    reported += 1
+            except (OSError, EOFError, struct.error) as e:
+                # after a case that hit a limit the runner exits on purpose
+                self._retire(worker, "recycled" if reported else "crashed")
+                if not compiled:
+                    raise PoolUnavailable(str(e)) from e
+                if reported == 0 and pending and not stop:
+                    # it died on the first case it ran: that case is charged with it
+                    index = pending[0]
+                    elapsed_ms = (time.monotonic() - started) * 1000
+                    results[index] = sandbox.classify(1, "", "JShell runner exited", None, limits, elapsed_ms)
+                    reported = 1
+                    if on_result and not stop and on_result(index, results[index]):
+                        stop = True
+            pending = pending[reported:]
+
+        return [results[i] for i in sorted(results)]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, size=self.size, idle=self._idle.qsize())
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = JShellPool(
+                    size=settings.JSHELL_POOL_SIZE,
+                    max_runs=settings.JSHELL_POOL_MAX_RUNS,
+                    max_heap_mb=settings.JSHELL_POOL_MAX_HEAP_MB,
+                )
+            except (OSError, subprocess.CalledProcessError) as e:
+                raise PoolUnavailable(f"could not start JShell pool: {e}") from e
+            atexit.register(_pool.shutdown)
+        return _pool
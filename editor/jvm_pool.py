@@ -0,0 +1,273 @@
+"""
+Pool of long-lived runner JVMs (see java/PooledRunner.java).
+
+Each worker keeps one JVM warm and runs participant programs inside it, one
+at a time, so a test case costs a class load instead of a JVM cold start.
+Workers are recycled after JVM_POOL_MAX_RUNS runs, or once the heap they
+retain after garbage collection passes JVM_POOL_MAX_HEAP_MB.
+
+Runs get the question's limits (see editor/sandbox.py): the runner caps
+output, threads and CPU time itself, the pool kills a worker that overruns
+the wall-clock limit, and memory is the worker heap (JVM_POOL_XMX_MB), so
+only runs whose memory limit is exactly that come here; the rest use a
+fresh JVM. The runner streams stdout back while the job runs, so a job
+whose output has already gone wrong is stopped there, as in a fresh JVM.
+"""
+import atexit
+import queue
+import select
+import struct
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+from editor import cds, sandbox, usage
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_EXITED = 2
+STATUS_OUTPUT_LIMIT = 3
+STATUS_MEMORY_LIMIT = 4
+STATUS_THREAD_LIMIT = 5
+STATUS_CPU_LIMIT = 7  # 6 is harness.STATUS_TIMEOUT
+STATUS_OUTPUT_CHUNK = 8  # stdout printed so far, ahead of the result
+STATUS_MISMATCH = -1  # not sent by a runner: the caller stopped a job whose output went wrong
+
+_INT = struct.Struct(">i")
+_LIMITS = struct.Struct(">qiqq")
+_RESULT_TAIL = struct.Struct(">q?")  # after the status
+
+# runner status -> (exit code for sandbox.classify, limit that was hit)
+OUTCOMES = {
+    STATUS_OK: (0, None),
+    STATUS_ERROR: (1, None),
+    STATUS_EXITED: (0, None),
+    STATUS_OUTPUT_LIMIT: (1, "output"),
+    STATUS_MEMORY_LIMIT: (1, "memory"),
+    STATUS_THREAD_LIMIT: (1, "threads"),
+    STATUS_CPU_LIMIT: (1, "cpu"),
+    STATUS_MISMATCH: (1, "mismatch"),
+}
+
+
+class PoolUnavailable(Exception):
+    """The pool cannot run this job; the caller should start a fresh JVM."""
+
+
+class RunTimedOut(Exception):
+    """The job overran its wall-clock limit; the worker must be killed."""
+
+
+def fits(limits):
+    """True when the pool can honour ``limits`` (see the module docstring)."""
+    return limits.memory_limit_mb == settings.JVM_POOL_XMX_MB
+
+
+def _read_exact(stream, size):
+    # stdout is unbuffered (so select sees everything not yet read): reads can come up short
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("runner JVM closed its output")
+        data += chunk
+    return data
+
+
+def _read_bytes(stream):
+    (size,) = _INT.unpack(_read_exact(stream, _INT.size))
+    return _read_exact(stream, size)
+
+
+def _frame(data):
+    return _INT.pack(len(data)) + data
+
+
+class JvmWorker:
+    """One warm runner JVM, talking the PooledRunner framing over its pipes."""
+
+    def __init__(self, runner_cp):
+        self.proc = subprocess.Popen(
+            [settings.JAVA_BIN, f"-Xmx{settings.JVM_POOL_XMX_MB}m", *cds.java_flags(),
+             "-cp", runner_cp, "PooledRunner"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        sandbox.apply_file_limit(self.proc.pid)
+        self.runs = 0
+        self.retained_heap = 0
+        self.lingering = False  # the last job left threads running
+
+    def run(self, classpath, class_name, input_data, limits, on_stdout=None):
+        """
+        Returns (status, stdout, stderr) for one run of ``class_name``.
+        ``on_stdout(chunk)`` sees stdout as the runner streams it; once it
+        returns False the job is abandoned with STATUS_MISMATCH and the
+        stdout seen so far, leaving the JVM to be killed. Raises RunTimedOut
+        if no answer arrives within the time limit.
+        """
+        request = (
+            _frame(classpath.encode())
+            + _frame(class_name.encode())
+            + _frame((input_data or "").encode())
+            + _LIMITS.pack(limits.max_output_bytes, limits.thread_limit, limits.stack_limit_kb * 1024,
+                           limits.cpu_limit_seconds * 1_000_000_000)
+        )
+        self.proc.stdin.write(request)
+        self.proc.stdin.flush()
+
+        deadline = time.monotonic() + limits.time_limit_ms / 1000
+        streamed = b""
+        while True:
+            ready, _, _ = select.select([self.proc.stdout], [], [], max(deadline - time.monotonic(), 0))
+            if not ready:
+                raise RunTimedOut(f"no answer within {limits.time_limit_ms} ms")
+            (status,) = _INT.unpack(_read_exact(self.proc.stdout, _INT.size))
+            if status != STATUS_OUTPUT_CHUNK:
+                break
+            chunk = _read_bytes(self.proc.stdout)
+            streamed += chunk
+            if on_stdout is not None and not on_stdout(chunk):
+                self.runs += 1
+                return STATUS_MISMATCH, streamed.decode("utf-8", errors="replace"), ""
+        self.retained_heap, self.lingering = _RESULT_TAIL.unpack(_read_exact(self.proc.stdout, _RESULT_TAIL.size))
+        stdout = _read_bytes(self.proc.stdout).decode("utf-8", errors="replace")
+        stderr = _read_bytes(self.proc.stdout).decode("utf-8", errors="replace")
+        self.runs += 1
+        return status, stdout, stderr
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+
+
+class JvmPool:
+    """
+    Hands out warm workers, blocking when all ``size`` of them are busy.
+    Retired workers are replaced in the background so the pool stays warm.
+    """
+
+    def __init__(self, size, max_runs, max_heap_mb):
+        self.size = size
+        self.max_runs = max_runs
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+        self._runner_cp = cds.runner_classpath()  # the archive's classpath, PooledRunner included
+        self._idle = queue.LifoQueue()  # most recently used = warmest JIT
+        self._lock = threading.Lock()
+        self._workers = set()
+        self.stats = {"runs": 0, "spawned": 0, "recycled": 0, "crashed": 0, "timed_out": 0}
+
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = JvmWorker(self._runner_cp)
+        with self._lock:
+            self._workers.add(worker)
+            self.stats["spawned"] += 1
+        return worker
+
+    def _retire(self, worker, reason):
+        with self._lock:
+            self._workers.discard(worker)
+            self.stats[reason] += 1
+        worker.close()
+        threading.Thread(target=self._replace, daemon=True).start()
+
+    def _replace(self):
+        try:
+            self._idle.put(self._spawn())
+        except OSError as e:
+            # The java binary went away; run() notices the empty pool.
+            print(f"[WARN] could not replace a runner JVM: {e}")
+
+    def _needs_recycling(self, worker):
+        return (
+            not worker.alive()
+            or worker.lingering
+            or worker.runs >= self.max_runs
+            or worker.retained_heap >= self.max_heap_bytes
+        )
+
+    def run(self, classpath, class_name, input_data=None, limits=None, on_stdout=None):
+        """
+        Runs ``class_name`` from ``classpath`` on a warm worker under
+        ``limits`` and returns a sandbox.ExecutionResult. ``on_stdout(chunk)``
+        sees stdout as it arrives; once it returns False the program is
+        stopped with limit="mismatch", as in sandbox.run_java. Raises
+        PoolUnavailable if no worker is free within JVM_POOL_WAIT_SECONDS or
+        the worker died without answering, so the caller can fall back to a
+        fresh JVM.
+        """
+        limits = limits or sandbox.Limits()
+        with self._lock:
+            if not self._workers:
+                raise PoolUnavailable("no live runner JVMs")
+        try:
+            worker = self._idle.get(timeout=settings.JVM_POOL_WAIT_SECONDS)
+        except queue.Empty:
+            raise PoolUnavailable(f"no runner JVM free within {settings.JVM_POOL_WAIT_SECONDS} s")
+        start = time.monotonic()
+        try:
+            status, stdout, stderr = worker.run(classpath, class_name, input_data, limits, on_stdout)
+        except RunTimedOut:
+            self._retire(worker, "timed_out")
+            return sandbox.classify(None, "", "", "time", limits, (time.monotonic() - start) * 1000)
+        except (OSError, EOFError, struct.error) as e:
+            self._retire(worker, "crashed")
+            raise PoolUnavailable(str(e)) from e
+
+        with self._lock:
+            self.stats["runs"] += 1
+        returncode, limit = OUTCOMES.get(status, (1, None))
+        if limit is not None or self._needs_recycling(worker):
+            # a job stopped at a limit may have left threads or garbage behind,
+            # and one stopped on a mismatch is still running
+            self._retire(worker, "recycled")
+        else:
+            self._idle.put(worker)
+        elapsed_ms = (time.monotonic() - start) * 1000
+        result = sandbox.classify(returncode, stdout, stderr, limit, limits, elapsed_ms)
+        # the worker JVM is shared, so there is no rusage of this run alone
+        result.usage = usage.Usage(elapsed_ms, output_bytes=len(stdout.encode()) + len(stderr.encode()))
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, size=self.size, idle=self._idle.qsize())
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = JvmPool(
+                    size=settings.JVM_POOL_SIZE,
+                    max_runs=settings.JVM_POOL_MAX_RUNS,
+                    max_heap_mb=settings.JVM_POOL_MAX_HEAP_MB,
+                )
+            except (OSError, subprocess.CalledProcessError) as e:
+                raise PoolUnavailable(f"could not start JVM pool: {e}") from e
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,83 @@
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from editor import cds, grading, workspaces
+from editor.models import Questions
+
+HELLO = """
+import java.util.Scanner;
+
+public class Main {
+    public static void main(String[] args) {
+        Scanner in = new Scanner(System.in);
+        long sum = 0;
+        while (in.hasNextLong()) {
+            sum += in.nextLong();
+        }
+        System.out.println(sum);
+    }
+}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Launches a small program in a fresh JVM N times with the JDK's default flags, with the "
+        "JVM_STARTUP_FLAGS profile, and with the profile plus the AppCDS archive, and reports launch times."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20, help="launches per configuration")
+        parser.add_argument("--question", type=int, help="run this question's reference code and first test input")
+
+    def handle(self, *args, **options):
+        code, stdin, question = HELLO, "1 2 3", None
+        if options["question"]:
+            question = Questions.objects.filter(pk=options["question"]).prefetch_related("test_cases", "files").first()
+            if question is None:
+                raise CommandError("No such question.")
+            code = question.instructor_code or question.user_starter_code
+            first = question.test_cases.first()
+            stdin = first.test_input if first else ""
+
+        archive = cds.archive_path()
+        if not archive.exists():
+            raise CommandError(f"No CDS archive at {archive}; run manage.py build_cds_archive first.")
+
+        with workspaces.checkout() as temp_dir:
+            compiled = (grading.compile_submission(question, code, temp_dir) if question
+                        else grading.compile_java_file(code, "Main.java", temp_dir))
+            if compiled.returncode != 0:
+                raise CommandError("The program does not compile.")
+
+            base = [settings.JAVA_BIN, "-Xmx256m"]
+            configurations = (
+                ("JDK defaults", base + ["-cp", temp_dir, "Main"]),
+                ("startup profile", base + cds.startup_flags() + ["-cp", cds.classpath(temp_dir), "Main"]),
+                ("profile + AppCDS", base + cds.startup_flags() + cds.archive_flags()
+                 + ["-cp", cds.classpath(temp_dir), "Main"]),
+            )
+            self.stdout.write(f"{options['runs']} launches each, archive {archive.name}")
+            for label, command in configurations:
+                timings = self._launch(command, stdin, options["runs"])
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f"{label:18} mean {statistics.mean(timings):7.1f} ms  "
+                    f"median {statistics.median(timings):7.1f} ms  p95 {p95:7.1f} ms"
+                )
+
+    def _launch(self, command, stdin, runs):
+        subprocess.run(command, input=stdin, capture_output=True, text=True)  # warm the page cache
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run(command, input=stdin, capture_output=True, text=True)
+            timings.append((time.perf_counter() - start) * 1000)
+            if proc.returncode != 0:
+                raise CommandError(f"{' '.join(command)} failed:\n{proc.stderr}")
+        return timings
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from editor import views
+from editor.models import Questions
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires N concurrent Run requests at the sync run_code view (run the way ASGI runs "
+        "sync views: thread-sensitive, one at a time) and at run_code_async, and reports throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="concurrent requests per view")
+        parser.add_argument("--question", type=int, help="question id (default: first IO question)")
+
+    def handle(self, *args, **options):
+        if options["question"]:
+            question = Questions.objects.filter(pk=options["question"]).first()
+        else:
+            question = Questions.objects.filter(question_type="IO").order_by("id").first()
+        if question is None:
+            raise CommandError("No such question.")
+        code = question.instructor_code or question.user_starter_code
+        if not code.strip():
+            raise CommandError(f"Question {question.pk} has no instructor or starter code to run.")
+
+        n = options["requests"]
+        factory = RequestFactory()
+
+        def make_request():
+            # a unique trailing comment keeps every request out of the compile and verdict caches
+            request = factory.post("/e/run-code/", {
+                "code": f"{code}\n// bench {uuid.uuid4().hex}",
+                "question_id": question.pk,
+            })
+            request.user = AnonymousUser()
+            return request
+
+        self.stdout.write(f"Question {question.pk}, {n} concurrent Run requests per view")
+        for label, view in (
+            ("sync run_code (before)", sync_to_async(views.run_code, thread_sensitive=True)),
+            ("async run_code_async (after)", views.run_code_async),
+        ):
+            elapsed, statuses = asyncio.run(self._fire(view, make_request, n))
+            errors = sum(1 for s in statuses if s != "ok")
+            self.stdout.write(
+                f"{label:30} {elapsed:7.2f} s  {n / elapsed:6.1f} req/s  ({errors} errored)"
+            )
+
+    async def _fire(self, view, make_request, n):
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(view(make_request()) for _ in range(n)))
+        elapsed = time.perf_counter() - start
+
+        statuses = []
+        for response in responses:
+            body = json.loads(response.content)
+            statuses.append("ok" if response.status_code == 200 and "results" in body else "error")
+        return elapsed, statuses
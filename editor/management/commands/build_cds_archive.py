@@ -0,0 +1,32 @@
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from editor import cds
+from editor.models import Questions
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the question bank through the harness to record the classes participant programs load, "
+        "then dumps them with the runner classes into the AppCDS archive for the current JDK."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--question", type=int, action="append", help="train on these question ids only")
+        parser.add_argument("--prune", action="store_true", help="remove archives for other JDK or runner versions")
+
+    def handle(self, *args, **options):
+        questions = Questions.objects.prefetch_related("test_cases", "files").order_by("id")
+        if options["question"]:
+            questions = questions.filter(pk__in=options["question"])
+        try:
+            path = cds.build(questions)
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f"java -Xshare:dump failed:\n{e.stderr.decode(errors='replace')}")
+        except OSError as e:
+            raise CommandError(f"could not build the CDS archive: {e}")
+        self.stdout.write(f"CDS archive: {path}")
+        if options["prune"]:
+            for removed in cds.prune():
+                self.stdout.write(f"removed {removed}")
@@ -0,0 +1,28 @@
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from editor import artifacts
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles the runner, harness and javac daemon classes into the read-only, "
+        "content-hashed artifact directories the grading runs use. Run at deploy time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="remove artifact versions that are no longer current")
+
+    def handle(self, *args, **options):
+        for name in artifacts.ARTIFACTS:
+            try:
+                directory = artifacts.build(name)
+            except subprocess.CalledProcessError as e:
+                raise CommandError(f"javac failed for {name}:\n{e.stderr.decode(errors='replace')}")
+            except OSError as e:
+                raise CommandError(f"could not build {name}: {e}")
+            self.stdout.write(f"{name}: {directory}")
+        if options["prune"]:
+            for removed in artifacts.prune():
+                self.stdout.write(f"removed {removed}")
@@ -0,0 +1,107 @@
+import json
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from editor import grading, grading_queue
+
+# seconds between claims after the database failed, doubling up to the max
+_BACKOFF_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 30.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Grades submissions queued by the web processes (GRADING_BACKEND=queue). Start as many "
+        "as the box has room for, on this box or others sharing the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1, help="jobs graded at once by this process")
+        parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+        parser.add_argument("--idle-sleep", type=float, default=0.2, help="seconds between polls of an empty queue")
+        parser.add_argument("--stats", action="store_true", help="print the queue depth and exit")
+        parser.add_argument("--purge-days", type=int, help="delete finished jobs older than this many days and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(grading_queue.depth(), indent=2))
+            return
+        if options["purge_days"] is not None:
+            removed = grading_queue.purge(timedelta(days=options["purge_days"]))
+            self.stdout.write(f"deleted {removed} finished jobs")
+            return
+
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        backend = grading.local_backend()
+        self.stdout.write(f"grading worker {grading_queue.worker_name()} using the {backend.name} backend")
+        threads = [
+            threading.Thread(target=self.work, args=(f"{grading_queue.worker_name()}/{n}", backend, options))
+            for n in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def work(self, worker, backend, options):
+        backoff = _BACKOFF_SECONDS
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = grading_queue.claim(worker)
+                    if job is None:
+                        if options["once"]:
+                            return
+                        self.stopping.wait(options["idle_sleep"])
+                        continue
+                    self.grade(job, backend)
+                except DatabaseError as e:
+                    print(f"[WARN] {worker}: database error, retrying in {backoff:.0f} s: {e}")
+                    close_old_connections()
+                    self.stopping.wait(backoff)
+                    backoff = min(backoff * 2, _MAX_BACKOFF_SECONDS)
+                    continue
+                backoff = _BACKOFF_SECONDS
+        finally:
+            close_old_connections()
+
+    def heartbeat(self, job, done):
+        """Renews the job's lease until ``done`` is set, so only a dead worker's jobs are taken over."""
+        try:
+            while not done.wait(settings.GRADING_QUEUE_LEASE_SECONDS / 3):
+                try:
+                    if not grading_queue.renew(job):
+                        print(f"[WARN] lost the lease on grading job {job.pk}")
+                        return
+                except DatabaseError as e:
+                    print(f"[WARN] could not renew the lease on grading job {job.pk}: {e}")
+        finally:
+            connection.close()
+
+    def grade(self, job, backend):
+        started = time.monotonic()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                verdict = grading.grade(job.question, job.source, job.mode, backend=backend)
+            except Exception as e:
+                print(f"[WARN] grading job {job.pk} failed (attempt {job.attempts}): {e}")
+                grading_queue.fail(job, str(e))
+                return
+            grading_queue.complete(job, verdict)
+        finally:
+            done.set()
+        if settings.DEBUG:
+            print(f"[DEBUG] graded job {job.pk} in {(time.monotonic() - started) * 1000:.0f} ms")
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from editor.models import Submission
+
+# column -> how to read it from a Submission's resource_usage
+METRICS = {
+    "compile_ms": lambda u: u.get("compile_ms"),
+    "wall_ms": lambda u: u.get("wall_ms"),
+    "cpu_ms": lambda u: u["user_ms"] + u["sys_ms"] if "user_ms" in u and "sys_ms" in u else None,
+    "rss_mb": lambda u: u["max_rss_kb"] / 1024 if "max_rss_kb" in u else None,
+    "out_kb": lambda u: u["output_bytes"] / 1024 if "output_bytes" in u else None,
+}
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports percentiles of the resources recorded with each Submission (compile and wall time, "
+        "CPU, peak RSS, output size) per question, for capacity planning."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, help="only submissions from the last N days")
+        parser.add_argument("--question", type=int, help="only this question")
+        parser.add_argument("--percentiles", default="50,90,99", help="comma-separated, default 50,90,99")
+
+    def handle(self, *args, **options):
+        try:
+            percentiles = [float(p) for p in options["percentiles"].split(",")]
+        except ValueError:
+            raise CommandError("--percentiles takes numbers like 50,90,99")
+
+        submissions = Submission.objects.exclude(resource_usage=None)
+        if options["days"]:
+            submissions = submissions.filter(timestamp__gte=timezone.now() - timedelta(days=options["days"]))
+        if options["question"]:
+            submissions = submissions.filter(question_id=options["question"])
+
+        per_question = {}
+        for question_id, resource_usage in submissions.values_list("question_id", "resource_usage").iterator():
+            per_question.setdefault(question_id, []).append(resource_usage)
+        if not per_question:
+            self.stdout.write("No submissions with recorded usage.")
+            return
+
+        labels = "/".join(f"p{p:g}" for p in percentiles)
+        for question_id in sorted(per_question):
+            records = per_question[question_id]
+            self.stdout.write(f"question {question_id}: {len(records)} submissions ({labels})")
+            for metric, read in METRICS.items():
+                values = sorted(v for v in map(read, records) if v is not None)
+                if not values:
+                    continue
+                cells = "  ".join(f"{percentile(values, p):9.1f}" for p in percentiles)
+                self.stdout.write(f"  {metric:11} {cells}   max {values[-1]:9.1f}  (n={len(values)})")
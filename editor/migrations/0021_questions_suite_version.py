@@ -0,0 +1,18 @@
+# Generated by Django 4.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0020_participantprofile_post_assessment_started'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questions',
+            name='suite_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0021_questions_suite_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questions',
+            name='cpu_limit_seconds',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='memory_limit_mb',
+            field=models.PositiveIntegerField(default=256),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='output_limit_kb',
+            field=models.PositiveIntegerField(default=1024),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='stack_limit_kb',
+            field=models.PositiveIntegerField(default=1024),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='thread_limit',
+            field=models.PositiveIntegerField(default=16),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='time_limit_ms',
+            field=models.PositiveIntegerField(default=5000),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def count_positive_calls(apps, schema_editor):
+    """
+    UNIT test cases used to be graded by java/CountPositiveRunner.java, which
+    called countPositive on a fixed array. Spell that call out on the rows.
+    """
+    TestCase = apps.get_model('editor', 'TestCase')
+    Questions = apps.get_model('editor', 'Questions')
+    rows = TestCase.objects.filter(question__question_type='UNIT', method_name='')
+    question_ids = list(rows.values_list('question_id', flat=True))
+    rows.update(
+        method_name='countPositive',
+        arg_types='int[]',
+        test_input='[[3, 5, 12, -4, -1, 5, 4, -7, 9, 0]]',
+    )
+    Questions.objects.filter(pk__in=question_ids).update(suite_version=F('suite_version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0022_questions_resource_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='arg_types',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='method_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(count_positive_calls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0024_grading_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questions',
+            name='comparator',
+            field=models.CharField(choices=[('exact', 'Exact (ignoring leading/trailing whitespace)'), ('whitespace', 'Whitespace-insensitive'), ('tokens', 'Token-wise'), ('float', 'Token-wise, numbers within a tolerance')], default='exact', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='questions',
+            name='float_tolerance',
+            field=models.FloatField(default=1e-06),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0025_questions_comparator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='resource_usage',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0026_submission_resource_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='submissions', to='editor.sourceblob'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0027_source_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='editor.questions')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='questionfile',
+            constraint=models.UniqueConstraint(fields=('question', 'name'), name='unique_question_file_name'),
+        ),
+    ]
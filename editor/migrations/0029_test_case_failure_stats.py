@@ -0,0 +1,23 @@
+# Generated by Django 4.2.18 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0028_question_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='runs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
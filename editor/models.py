@@ -4,6 +4,8 @@ from django.db import models
 
 from django.db import migrations
 
+from editor import comparators
+
 QUESTION_TYPE_CHOICES = [
     ('IO', 'I/O'),
     ('UNIT', 'Unit'),
@@ -15,6 +17,18 @@ class Questions(models.Model):
     question_type = models.CharField(max_length=10, choices=QUESTION_TYPE_CHOICES)
     user_starter_code = models.CharField(max_length=20000, default="")
     instructor_code = models.CharField(max_length=20000, default="")
+    # bumped whenever the question or its test cases are saved; part of the verdict cache key
+    suite_version = models.PositiveIntegerField(default=1)
+    # per-run resource limits (editor/sandbox.py)
+    time_limit_ms = models.PositiveIntegerField(default=5000)
+    cpu_limit_seconds = models.PositiveIntegerField(default=10)
+    memory_limit_mb = models.PositiveIntegerField(default=256)
+    stack_limit_kb = models.PositiveIntegerField(default=1024)
+    output_limit_kb = models.PositiveIntegerField(default=1024)
+    thread_limit = models.PositiveIntegerField(default=16)
+    # how IO output is compared with the expected output (editor/comparators.py)
+    comparator = models.CharField(max_length=10, choices=comparators.CHOICES, default=comparators.EXACT)
+    float_tolerance = models.FloatField(default=1e-6)
 
     def __str__(self):
         return self.question_string
@@ -22,13 +36,40 @@ class Questions(models.Model):
 
 class TestCase(models.Model):
     question = models.ForeignKey(Questions, related_name='test_cases', on_delete=models.CASCADE)
-    test_input = models.CharField(max_length=2000, blank=True)  # allow blank input for UNIT tests
+    # IO: the program's stdin. UNIT: JSON array of arguments (blank = no arguments)
+    test_input = models.CharField(max_length=2000, blank=True)
+    # IO: expected stdout. UNIT: expected return value as JSON
     expected_output = models.CharField(max_length=2000)
+    # UNIT only: the method of Main to call and its comma-separated parameter types
+    method_name = models.CharField(max_length=200, blank=True)
+    arg_types = models.CharField(max_length=500, blank=True)
+    # how often graded submissions ran this case and failed it; SUBMIT runs likely failures first
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"TestCase for {self.question.id}: Input {self.test_input}"
 
 
+class QuestionFile(models.Model):
+    """
+    A source file compiled together with the participant's Main.java, such
+    as a helper class or provided library code. Participants see it but
+    cannot change it.
+    """
+    question = models.ForeignKey(Questions, related_name='files', on_delete=models.CASCADE)
+    name = models.CharField(max_length=200)  # e.g. Helper.java
+    content = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["question", "name"], name="unique_question_file_name"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} for {self.question.id}"
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     score = models.IntegerField(default=0)
@@ -67,6 +108,22 @@ class ParticipantProfile(models.Model):
     post_assessment_completed_at = models.DateTimeField(null=True, blank=True)
 
 
+class SourceBlob(models.Model):
+    """
+    Submitted source, stored once per distinct text (editor/sources.py):
+    keyed by its SHA-256 and zlib-compressed.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()  # uncompressed, in bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def text(self):
+        from editor import sources  # imported here because sources -> models
+        return sources.decompress(self.data)
+
+
 class Submission(models.Model):
     """
     One code submission for one question.
@@ -78,6 +135,11 @@ class Submission(models.Model):
     used_ai = models.BooleanField()  # True if Gemini pane allowed
     is_correct = models.BooleanField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # what grading took: compile_ms, wall_ms, user_ms, sys_ms, max_rss_kb, output_bytes, ... (editor/usage.py)
+    resource_usage = models.JSONField(null=True, blank=True)
+    # the graded code; null for submissions recorded before sources were kept
+    source = models.ForeignKey(SourceBlob, null=True, blank=True, on_delete=models.PROTECT,
+                               related_name="submissions")
 
 
 class EnrollmentCap(models.Model):
@@ -123,3 +185,37 @@ class AITelemetry(models.Model):
             models.Index(fields=["user", "attempt_no", "event"]),
             models.Index(fields=["created_at"]),
         ]
+
+
+class GradingJob(models.Model):
+    """
+    A submission waiting for, or graded by, a grading worker
+    (manage.py grading_worker; see editor/grading_queue.py).
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+    question = models.ForeignKey(Questions, on_delete=models.CASCADE)
+    source = models.TextField()
+    mode = models.CharField(max_length=10)  # grading.RUN or grading.SUBMIT
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    verdict = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=200, blank=True)  # host:pid of the worker holding it
+    lease_expires_at = models.DateTimeField(null=True, blank=True)  # a running job past this is retried
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
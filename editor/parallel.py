@@ -0,0 +1,144 @@
+"""
+Bounded concurrency for program runs.
+
+The test cases of one submission run at the same time on a small thread pool
+sized to the available cores, and results come back in the original order.
+A process-wide semaphore (EXECUTION_MAX_PARALLEL) caps how many programs run
+at once across all participants, so concurrent submissions queue for a slot
+instead of oversubscribing the machine.
+
+The async views use the asyncio equivalents at the bottom of this module;
+their runs take slots from the same semaphore.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _semaphore():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.EXECUTION_MAX_PARALLEL)
+        return _slots
+
+
+@contextmanager
+def execution_slot():
+    """Holds one of the global execution slots for the duration of a run."""
+    slots = _semaphore()
+    slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def map_ordered(fn, items, stop_when=None):
+    """
+    Calls fn(item) for every item concurrently and returns the results in
+    the order of ``items``. If ``stop_when(result)`` is true for a result,
+    cases that have not started yet are cancelled and only the finished
+    results are returned (still in input order).
+    """
+    items = list(items)
+    if len(items) <= 1:
+        results = []
+        for item in items:
+            results.append(fn(item))
+            if stop_when and stop_when(results[-1]):
+                break
+        return results
+
+    workers = min(len(items), os.cpu_count() or 1)
+    done_results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(fn, item): i for i, item in enumerate(items)}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            stop = False
+            for future in finished:
+                index = pending.pop(future)
+                done_results[index] = future.result()
+                stop = stop or (stop_when is not None and stop_when(done_results[index]))
+            if stop:
+                for future in pending:
+                    future.cancel()
+                break
+    return [done_results[i] for i in sorted(done_results)]
+
+
+_blocking_executor = None
+# how often a run on the event loop looks for a free execution slot
+_SLOT_POLL_SECONDS = 0.005
+
+
+def blocking_executor():
+    """
+    Dedicated threads for blocking grading work (cache lookups, compiles,
+    warm-pool runs) done on behalf of async views, so it never occupies the
+    thread-sensitive thread that Django shares between sync views.
+    """
+    global _blocking_executor
+    with _slots_lock:
+        if _blocking_executor is None:
+            _blocking_executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_EXECUTION_THREADS, thread_name_prefix="grading"
+            )
+        return _blocking_executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Awaits fn(*args, **kwargs) run on the grading executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor(), functools.partial(fn, *args, **kwargs))
+
+
+@asynccontextmanager
+async def async_execution_slot():
+    """
+    execution_slot for programs started from the event loop. It polls the
+    shared semaphore rather than blocking a grading executor thread on it,
+    since the runs holding the slots may need those threads to finish.
+    """
+    slots = _semaphore()
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(_SLOT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+async def gather_ordered(coros, stop_when=None):
+    """
+    Async map_ordered: awaits all coroutines concurrently and returns their
+    results in input order, cancelling the unfinished ones once
+    ``stop_when(result)`` is true for a finished one.
+    """
+    pending = {asyncio.ensure_future(c): i for i, c in enumerate(coros)}
+    done_results = {}
+    try:
+        while pending:
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            stop = False
+            for task in finished:
+                index = pending.pop(task)
+                done_results[index] = task.result()
+                stop = stop or (stop_when is not None and stop_when(done_results[index]))
+            if stop:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    return [done_results[i] for i in sorted(done_results)]
@@ -0,0 +1,390 @@
+"""
+Resource limits for participant programs.
+
+Every run gets the limits configured on its question: a wall-clock timeout
+(the whole process group is killed), an RLIMIT_CPU cap, -Xmx/-Xss for the
+JVM, a cap on stdout+stderr bytes and a cap on the number of threads. The
+result says which limit, if any, stopped the program:
+
+    OK   finished normally        RE   exception or non-zero exit
+    TLE  wall-clock or CPU limit  MLE  OutOfMemoryError
+    OLE  printed too much         WA   output stopped matching
+
+A program that starts too many threads is killed and reported as RE with
+limit="threads". WA (limit="mismatch") is given to a run stopped early
+because its output can no longer match the expected output
+(editor/comparators.py), either seen while streaming its stdout or because
+it passed the output cap set from the expected length.
+"""
+import asyncio
+import copy
+import os
+import resource
+import select
+import selectors
+import signal
+import subprocess
+import time
+
+from django.conf import settings
+
+from editor import cds, parallel, usage
+
+OK = "OK"
+RE = "RE"
+TLE = "TLE"
+MLE = "MLE"
+OLE = "OLE"
+WA = "WA"
+
+_POLL_SECONDS = 0.05
+_READ_CHUNK = 64 * 1024
+
+_MESSAGES = {
+    "time": "Time limit exceeded ({limits.time_limit_ms} ms)",
+    "cpu": "CPU time limit exceeded ({limits.cpu_limit_seconds} s)",
+    "memory": "Memory limit exceeded ({limits.memory_limit_mb} MB)",
+    "output": "Output limit exceeded ({limits.output_limit_kb} KB)",
+    "threads": "Thread limit exceeded ({limits.thread_limit} threads)",
+    "mismatch": "Output does not match the expected output; stopped early",
+}
+
+
+class Limits:
+    """The per-run limits, normally read from a question."""
+
+    def __init__(self, time_limit_ms=5000, cpu_limit_seconds=10, memory_limit_mb=256,
+                 stack_limit_kb=1024, output_limit_kb=1024, thread_limit=16, output_cap_bytes=None):
+        self.time_limit_ms = time_limit_ms
+        self.cpu_limit_seconds = cpu_limit_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.stack_limit_kb = stack_limit_kb
+        self.output_limit_kb = output_limit_kb
+        self.thread_limit = thread_limit
+        self.output_cap_bytes = output_cap_bytes  # tighter cap derived from the expected output
+
+    @classmethod
+    def for_question(cls, question):
+        return cls(
+            time_limit_ms=question.time_limit_ms,
+            cpu_limit_seconds=question.cpu_limit_seconds,
+            memory_limit_mb=question.memory_limit_mb,
+            stack_limit_kb=question.stack_limit_kb,
+            output_limit_kb=question.output_limit_kb,
+            thread_limit=question.thread_limit,
+        )
+
+    def with_output_cap(self, nbytes):
+        """A copy whose output is cut off after ``nbytes`` (reported as WA, not OLE)."""
+        capped = copy.copy(self)
+        capped.output_cap_bytes = nbytes
+        return capped
+
+    @property
+    def max_output_bytes(self):
+        if self.output_cap_bytes is not None:
+            return min(self.output_limit_kb * 1024, self.output_cap_bytes)
+        return self.output_limit_kb * 1024
+
+
+class ExecutionResult:
+    """Outcome of one run: the verdict, which limit was hit and what was printed."""
+
+    def __init__(self, verdict, stdout="", stderr="", limit=None, limits=None, elapsed_ms=0.0):
+        self.verdict = verdict
+        self.stdout = stdout
+        self.stderr = stderr
+        self.limit = limit  # "time", "cpu", "memory", "output", "threads", "mismatch" or None
+        self.limits = limits
+        self.elapsed_ms = elapsed_ms
+        self.value = None  # JSON return value of a UNIT call (editor/harness.py)
+        self.usage = None  # usage.Usage of the process that ran it
+
+    @property
+    def output(self):
+        """What the editor shows: stdout, else stderr, plus the limit that was hit."""
+        text = self.stdout.strip() or self.stderr.strip()
+        if self.limit:
+            message = f"[{self.verdict}] " + _MESSAGES[self.limit].format(limits=self.limits)
+            text = f"{text}\n{message}" if text else message
+        return text
+
+
+def java_command(class_name, classpath, limits):
+    return [
+        settings.JAVA_BIN,
+        f"-Xmx{limits.memory_limit_mb}m",
+        f"-Xss{limits.stack_limit_kb}k",
+        *cds.java_flags(),  # startup profile and class-data archive (editor/cds.py)
+        "-cp", cds.classpath(classpath),
+        class_name,
+    ]
+
+
+def apply_cpu_limit(pid, seconds):
+    # Applied right after the fork instead of in a preexec_fn, which is not
+    # safe to use from the grading threads.
+    if hasattr(resource, "prlimit"):
+        try:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (seconds, seconds + 1))
+        except (OSError, ValueError):
+            pass
+
+
+def apply_file_limit(pid):
+    """Caps any file the program writes at the workspace quota (editor/workspaces.py)."""
+    if hasattr(resource, "prlimit"):
+        size = settings.WORKSPACE_QUOTA_MB * 1024 * 1024
+        try:
+            resource.prlimit(pid, resource.RLIMIT_FSIZE, (size, size))
+        except (OSError, ValueError):
+            pass
+
+
+def _thread_count(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _threads_exceeded(pid, limits):
+    # The JVM's own threads (GC, compiler, signal handling, ...) don't count.
+    return _thread_count(pid) > limits.thread_limit + settings.EXECUTION_JVM_BASE_THREADS
+
+
+def kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def classify(returncode, stdout, stderr, limit, limits, elapsed_ms):
+    """Builds the ExecutionResult for a finished (or killed) run."""
+    if limit is None and returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        limit = "cpu"
+    if limit is None and "java.lang.OutOfMemoryError" in stderr:
+        limit = "memory"
+    if limit == "output" and limits is not None and limits.max_output_bytes < limits.output_limit_kb * 1024:
+        limit = "mismatch"  # stopped at the expected-output cap, not the question's limit
+    if limit in ("time", "cpu"):
+        verdict = TLE
+    elif limit == "memory":
+        verdict = MLE
+    elif limit == "output":
+        verdict = OLE
+    elif limit == "mismatch":
+        verdict = WA
+    elif limit == "threads" or returncode != 0:
+        verdict = RE
+    else:
+        verdict = OK
+    return ExecutionResult(verdict, stdout, stderr, limit, limits, elapsed_ms)
+
+
+def run_java(class_name, classpath, input_data, limits, on_stdout=None):
+    """
+    Runs class_name in a fresh JVM (a pre-started one when one is ready,
+    see editor/standby.py) under ``limits`` and returns an
+    ExecutionResult. ``on_stdout(chunk)`` sees stdout as it arrives; once it
+    returns False the program is killed with limit="mismatch".
+    """
+    start = time.monotonic()
+    deadline = start + limits.time_limit_ms / 1000
+    # imported here because standby -> sandbox
+    from editor import standby
+
+    # a pre-started JVM when one is ready: it gets the program from a control line before its input
+    proc, control = standby.take(class_name, classpath, limits)
+    if proc is None:
+        try:
+            proc = subprocess.Popen(
+                java_command(class_name, classpath, limits),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,  # own process group, so the kill takes every child
+            )
+        except OSError as e:
+            return ExecutionResult(RE, stderr=str(e), limits=limits)
+        apply_cpu_limit(proc.pid, limits.cpu_limit_seconds)
+        apply_file_limit(proc.pid)
+
+    pending_input = memoryview(control + (input_data or "").encode())
+    out_fd, err_fd = proc.stdout.fileno(), proc.stderr.fileno()
+    captured = {out_fd: bytearray(), err_fd: bytearray()}
+    total = 0
+    peak_kb = 0
+    limit = None
+
+    with selectors.DefaultSelector() as selector:
+        if pending_input:
+            selector.register(proc.stdin, selectors.EVENT_WRITE)
+        else:
+            proc.stdin.close()
+        selector.register(proc.stdout, selectors.EVENT_READ)
+        selector.register(proc.stderr, selectors.EVENT_READ)
+
+        while len(selector.get_map()) and limit is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                limit = "time"
+                break
+            for key, _ in selector.select(min(remaining, _POLL_SECONDS)):
+                if key.fileobj is proc.stdin:
+                    try:
+                        written = os.write(key.fd, pending_input[:select.PIPE_BUF])
+                        pending_input = pending_input[written:]
+                    except BrokenPipeError:
+                        pending_input = pending_input[:0]
+                    if not pending_input:
+                        selector.unregister(proc.stdin)
+                        proc.stdin.close()
+                    continue
+                chunk = os.read(key.fd, _READ_CHUNK)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                total += len(chunk)
+                captured[key.fd] += chunk
+                if total > limits.max_output_bytes:
+                    limit = "output"
+                    break
+                if on_stdout is not None and key.fd == out_fd and not on_stdout(chunk):
+                    limit = "mismatch"
+                    break
+            if limit is None and _threads_exceeded(proc.pid, limits):
+                limit = "threads"
+            peak_kb = max(peak_kb, usage.peak_rss_kb(proc.pid) or 0)
+
+    # The pipes are closed, but the program may still be running.
+    while limit is None and usage.reap(proc, block=False) is None:
+        peak_kb = max(peak_kb, usage.peak_rss_kb(proc.pid) or 0)
+        if time.monotonic() >= deadline:
+            limit = "time"
+        elif _threads_exceeded(proc.pid, limits):
+            limit = "threads"
+        else:
+            time.sleep(_POLL_SECONDS / 5)
+    if limit is not None:
+        kill_group(proc)
+    usage.reap(proc)
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        if not stream.closed:
+            stream.close()
+
+    elapsed_ms = (time.monotonic() - start) * 1000
+    result = classify(
+        proc.returncode,
+        _decode(captured[out_fd], limits),
+        _decode(captured[err_fd], limits),
+        limit,
+        limits,
+        elapsed_ms,
+    )
+    result.usage = usage.Usage.from_rusage(getattr(proc, "rusage", None), elapsed_ms, total, peak_kb)
+    return result
+
+
+def _decode(data, limits):
+    return bytes(data[:limits.max_output_bytes]).decode("utf-8", errors="replace")
+
+
+async def run_java_async(class_name, classpath, input_data, limits, on_stdout=None):
+    """run_java for the async views, using an asyncio subprocess."""
+    if settings.STANDBY_JVM_ENABLED:
+        # standby JVMs are plain subprocesses, so their runs are driven from a thread
+        return await parallel.run_blocking(run_java, class_name, classpath, input_data, limits, on_stdout)
+    start = time.monotonic()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *java_command(class_name, classpath, limits),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+    except OSError as e:
+        return ExecutionResult(RE, stderr=str(e), limits=limits)
+    apply_cpu_limit(proc.pid, limits.cpu_limit_seconds)
+    apply_file_limit(proc.pid)
+
+    captured = {"stdout": bytearray(), "stderr": bytearray()}
+    total = 0
+    limit = None
+    over = asyncio.Event()
+
+    async def feed():
+        try:
+            proc.stdin.write((input_data or "").encode())
+            await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    async def drain(name, stream):
+        nonlocal total, limit
+        while chunk := await stream.read(_READ_CHUNK):
+            total += len(chunk)
+            captured[name] += chunk
+            if total > limits.max_output_bytes:
+                limit = limit or "output"
+                over.set()
+                return
+            if on_stdout is not None and name == "stdout" and not on_stdout(chunk):
+                limit = limit or "mismatch"
+                over.set()
+                return
+
+    sampled = None  # asyncio reaps the child itself, so its usage is sampled from /proc instead
+
+    async def watch_threads():
+        nonlocal limit, sampled
+        while proc.returncode is None:
+            sampled = usage.sample(proc.pid) or sampled
+            if _threads_exceeded(proc.pid, limits):
+                limit = limit or "threads"
+                over.set()
+                return
+            await asyncio.sleep(_POLL_SECONDS)
+
+    async def finish():
+        await asyncio.gather(feed(), drain("stdout", proc.stdout), drain("stderr", proc.stderr))
+        await proc.wait()
+
+    finished = asyncio.ensure_future(finish())
+    watcher = asyncio.ensure_future(watch_threads())
+    stopped = asyncio.ensure_future(over.wait())
+    try:
+        done, _ = await asyncio.wait(
+            {finished, stopped}, timeout=limits.time_limit_ms / 1000, return_when=asyncio.FIRST_COMPLETED
+        )
+        if not done:
+            limit = "time"
+    finally:
+        # Also reached when fail-fast cancels this case: never leave the JVM running.
+        if proc.returncode is None:
+            kill_group(proc)
+        for task in (finished, watcher, stopped):
+            task.cancel()
+        await asyncio.gather(finished, watcher, stopped, return_exceptions=True)
+        await proc.wait()
+
+    elapsed_ms = (time.monotonic() - start) * 1000
+    result = classify(
+        proc.returncode,
+        _decode(captured["stdout"], limits),
+        _decode(captured["stderr"], limits),
+        limit,
+        limits,
+        elapsed_ms,
+    )
+    output_bytes = len(captured["stdout"]) + len(captured["stderr"])
+    result.usage = usage.Usage(elapsed_ms, *sampled, output_bytes) if sampled else usage.Usage(
+        elapsed_ms, output_bytes=output_bytes)
+    return result
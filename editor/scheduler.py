@@ -0,0 +1,243 @@
+"""
+Fair-share admission in front of grading.
+
+Every Run and Submit goes through one scheduler per process before it is
+graded. At most SCHEDULER_MAX_ACTIVE gradings run at once; the rest wait in
+one FIFO queue per participant, and a freed slot goes to the participant
+with the fewest gradings running, taking turns between participants on a
+tie, so someone clicking Run over and over only delays themselves.
+
+A Run identical to one of the same participant's runs still in flight (same
+question, same code) is not queued again but gets that run's verdict. When
+SCHEDULER_MAX_QUEUE_DEPTH runs are already waiting, or the participant has
+SCHEDULER_MAX_QUEUED_PER_USER waiting, a new Run is refused with Overloaded,
+which the views turn into HTTP 429 with Retry-After. Submissions are never
+refused, only queued.
+
+Each verdict reports how long it waited for a slot as queue_wait_ms.
+"""
+import asyncio
+import collections
+import math
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from editor import compile_cache
+
+
+class Overloaded(Exception):
+    """Too many runs are waiting; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"The grader is busy; try again in {retry_after} s.")
+        self.retry_after = retry_after
+
+
+def _annotate(result, **fields):
+    """Adds ``fields`` to a verdict, or to each verdict of a submission."""
+    if isinstance(result, list):
+        return [dict(verdict, **fields) for verdict in result]
+    return dict(result, **fields)
+
+
+class Ticket:
+    """
+    One admitted request. ``run``/``run_async`` wait for its slot, grade,
+    free the slot and return the verdict; a coalesced ticket instead waits
+    for the identical request already in flight.
+    """
+
+    def __init__(self, scheduler, owner_id, key, shared, leader):
+        self.scheduler = scheduler
+        self.owner_id = owner_id
+        self.key = key
+        self.shared = shared  # the verdict, for this ticket and any duplicates
+        self.leader = leader
+        self.granted = Future()
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def ready(self):
+        """Done once ``run`` would no longer block: the slot is granted, or the original has finished."""
+        return self.granted if self.leader else self.shared
+
+    def run(self, grade):
+        """grade() in this ticket's slot; for a duplicate, the original's verdict."""
+        if not self.leader:
+            return _annotate(self.shared.result(), coalesced=True)
+        try:
+            self.granted.result()
+        except BaseException as e:
+            self.scheduler._withdraw(self, e)
+            raise
+        return self._finish(grade)
+
+    async def run_async(self, grade):
+        """run for coroutines: ``grade()`` returns an awaitable."""
+        if not self.leader:
+            # shielded: a cancelled duplicate must not cancel the original
+            return _annotate(await asyncio.shield(asyncio.wrap_future(self.shared)), coalesced=True)
+        try:
+            await asyncio.wrap_future(self.granted)
+        except BaseException as e:
+            self.scheduler._withdraw(self, e)
+            raise
+        return await self._finish_async(grade)
+
+    def _finish(self, grade):
+        waited_ms = (time.monotonic() - self.enqueued_at) * 1000
+        start = time.monotonic()
+        try:
+            verdict = _annotate(grade(), queue_wait_ms=round(waited_ms, 1))
+        except BaseException as e:
+            self.scheduler._release(self, time.monotonic() - start, e)
+            raise
+        self.scheduler._release(self, time.monotonic() - start, verdict=verdict)
+        return verdict
+
+    async def _finish_async(self, grade):
+        waited_ms = (time.monotonic() - self.enqueued_at) * 1000
+        start = time.monotonic()
+        try:
+            verdict = _annotate(await grade(), queue_wait_ms=round(waited_ms, 1))
+        except BaseException as e:
+            self.scheduler._release(self, time.monotonic() - start, e)
+            raise
+        self.scheduler._release(self, time.monotonic() - start, verdict=verdict)
+        return verdict
+
+
+class FairScheduler:
+    """Per-participant queues sharing ``slots`` grading slots."""
+
+    def __init__(self, slots, max_queue_depth, max_queued_per_user):
+        self.slots = slots
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_per_user = max_queued_per_user
+        self._lock = threading.Lock()
+        self._waiting = collections.defaultdict(collections.deque)  # owner -> tickets, oldest first
+        self._active = collections.Counter()  # owner -> gradings running
+        self._last_granted = {}  # owner -> when their last grading started, for taking turns
+        self._inflight = {}  # key -> leader ticket, for coalescing
+        self._service_seconds = 2.0  # moving average of grading time, for Retry-After
+        self.stats = {"admitted": 0, "coalesced": 0, "rejected": 0, "granted": 0, "wait_ms": 0.0}
+
+    def admit(self, owner_id, key, reject=True):
+        """
+        Queues a request and returns its Ticket. With ``reject``, raises
+        Overloaded instead when the queues are full.
+        """
+        with self._lock:
+            leader = self._inflight.get(key)
+            if leader is not None:
+                self.stats["coalesced"] += 1
+                return Ticket(self, owner_id, key, leader.shared, leader=False)
+            depth = sum(len(q) for q in self._waiting.values())
+            if reject and (depth >= self.max_queue_depth
+                           or len(self._waiting.get(owner_id, ())) >= self.max_queued_per_user):
+                self.stats["rejected"] += 1
+                raise Overloaded(self._retry_after(depth))
+            ticket = Ticket(self, owner_id, key, Future(), leader=True)
+            self._inflight[key] = ticket
+            self._waiting[owner_id].append(ticket)
+            self.stats["admitted"] += 1
+            self._dispatch()
+        return ticket
+
+    def _retry_after(self, depth):
+        return max(1, math.ceil(depth / self.slots * self._service_seconds))
+
+    def _dispatch(self):
+        """Hands free slots to the waiting owners with the fewest runs going. Holds _lock."""
+        while sum(self._active.values()) < self.slots:
+            owners = [owner for owner, q in self._waiting.items() if q]
+            if not owners:
+                return
+            owner = min(owners, key=lambda o: (self._active[o], self._last_granted.get(o, 0.0),
+                                               self._waiting[o][0].enqueued_at))
+            ticket = self._waiting[owner].popleft()
+            if not self._waiting[owner]:
+                del self._waiting[owner]
+            if not ticket.granted.set_running_or_notify_cancel():
+                continue  # its caller gave up while waiting
+            self._active[owner] += 1
+            self._last_granted[owner] = time.monotonic()
+            self.stats["granted"] += 1
+            self.stats["wait_ms"] += (time.monotonic() - ticket.enqueued_at) * 1000
+            ticket.granted.set_result(None)
+
+    def _release(self, ticket, seconds, error=None, verdict=None):
+        with self._lock:
+            self._active[ticket.owner_id] -= 1
+            if not self._active[ticket.owner_id]:
+                del self._active[ticket.owner_id]
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * seconds
+            self._inflight.pop(ticket.key, None)
+            self._dispatch()
+        if error is None:
+            ticket.shared.set_result(verdict)
+        else:
+            ticket.shared.set_exception(error if isinstance(error, Exception) else RuntimeError("run cancelled"))
+
+    def _withdraw(self, ticket, error):
+        """Called when a leader stops waiting for its slot (cancelled or failed)."""
+        with self._lock:
+            queue = self._waiting.get(ticket.owner_id)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._waiting[ticket.owner_id]
+                granted = False
+            else:
+                granted = ticket.granted.done() and not ticket.granted.cancelled()
+            if not granted:
+                self._inflight.pop(ticket.key, None)
+        if granted:
+            self._release(ticket, 0, error)
+        else:
+            ticket.shared.set_exception(RuntimeError("run cancelled"))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                slots=self.slots,
+                active=sum(self._active.values()),
+                waiting=sum(len(q) for q in self._waiting.values()),
+                waiting_users=len(self._waiting),
+            )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns this process's scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler(
+                slots=settings.SCHEDULER_MAX_ACTIVE,
+                max_queue_depth=settings.SCHEDULER_MAX_QUEUE_DEPTH,
+                max_queued_per_user=settings.SCHEDULER_MAX_QUEUED_PER_USER,
+            )
+        return _scheduler
+
+
+def request_key(owner_id, mode, pairs):
+    """What makes two requests identical: owner, mode, and each question with its code."""
+    return owner_id, mode, tuple((question.pk, compile_cache.source_hash(code)) for question, code in pairs)
+
+
+def admit_run(owner_id, question, code, mode):
+    """Admits one Run of ``code`` against ``question``; raises Overloaded."""
+    return get_scheduler().admit(owner_id, request_key(owner_id, mode, [(question, code)]))
+
+
+def admit_submission(owner_id, pairs, mode):
+    """Admits a submission of [(question, code), ...]; queued but never refused."""
+    return get_scheduler().admit(owner_id, request_key(owner_id, mode, pairs), reject=False)
@@ -0,0 +1,47 @@
+"""
+Content-addressed storage for submitted code.
+
+Each distinct source is kept once as a SourceBlob, keyed by its SHA-256 and
+zlib-compressed; a Submission points at its blob. Untouched starter code
+submitted by hundreds of participants is therefore one row.
+
+``attach`` is called with the Submissions of one submit_all just before they
+are bulk-created: it inserts the missing blobs with a single INSERT that
+skips hashes already stored, so recording a submission costs one extra
+statement however many questions it has, and no lookups.
+"""
+import zlib
+
+from editor import compile_cache
+from editor.models import SourceBlob
+
+# zlib level: Java source compresses about 4x at 6, and costs well under a ms
+COMPRESSION_LEVEL = 6
+
+
+def compress(code):
+    return zlib.compress(code.encode(), COMPRESSION_LEVEL)
+
+
+def decompress(data):
+    return zlib.decompress(bytes(data)).decode()
+
+
+def attach(submissions, codes):
+    """
+    Points each unsaved Submission at the blob of its code, storing the
+    blobs not stored yet. Call inside the transaction that saves them.
+    """
+    blobs = {}
+    for submission, code in zip(submissions, codes):
+        digest = compile_cache.source_hash(code)
+        if digest not in blobs:
+            blobs[digest] = SourceBlob(sha256=digest, data=compress(code), size=len(code.encode()))
+        submission.source_id = digest
+    if blobs:
+        SourceBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+
+
+def source_of(submission):
+    """The code of a Submission, or None if it predates stored sources."""
+    return submission.source.text if submission.source_id else None
@@ -0,0 +1,235 @@
+"""
+Pre-started JVMs for one-process-per-run execution (see java/StandbyRunner.java).
+
+For deployments that do not share a JVM between submissions, sandbox.run_java
+can take a JVM that was started earlier and is blocked reading a control
+line instead of launching one. The control line names the program's class
+directory and main class; the JVM runs that one program and exits, so a
+run is as isolated as in a fresh process, without the startup on the
+request path. Each handed-out JVM is replaced in the background.
+
+JVMs are started with the -Xmx/-Xss of the runs they will serve, so there is
+one standby queue per (memory, stack) limit pair. The depth of each queue
+follows the recent arrival rate: enough JVMs to cover the arrivals expected
+while one is being started (Little's law) with room for bursts, at least
+one and at most STANDBY_JVM_MAX_DEPTH, and none once a limit pair has not
+been used for STANDBY_JVM_WINDOW_SECONDS. A run that finds its queue empty simply gets a
+fresh JVM.
+"""
+import atexit
+import collections
+import math
+import os
+import select
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+from editor import cds, sandbox, usage
+
+_READY = b"READY\n"
+_TICK_SECONDS = 0.5
+_BURST_SECONDS = 10  # arrivals over this short window are weighed too, so a burst deepens a queue at once
+_RETRY_SECONDS = 30  # back-off after a JVM failed to start
+
+
+def _key(limits):
+    return limits.memory_limit_mb, limits.stack_limit_kb
+
+
+class StandbyPool:
+    """Standby JVMs per limit pair, topped up by a maintenance thread."""
+
+    def __init__(self, max_depth, max_total, window_seconds, start_timeout):
+        self.max_depth = max_depth
+        self.max_total = max_total
+        self.window_seconds = window_seconds
+        self.start_timeout = start_timeout
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(collections.deque)  # key -> ready JVMs, oldest first
+        self._starting = collections.Counter()  # key -> JVMs being started
+        self._arrivals = collections.defaultdict(collections.deque)  # key -> recent take() times
+        self._start_seconds = 1.0  # moving average of how long a JVM takes to become ready
+        self._wake = threading.Event()
+        self._closed = False
+        self._failed_at = None
+        self.stats = {"hits": 0, "misses": 0, "started": 0, "failed": 0, "retired": 0}
+        threading.Thread(target=self._maintain, name="standby-jvms", daemon=True).start()
+
+    def _command(self, key):
+        memory_mb, stack_kb = key
+        return [
+            settings.JAVA_BIN,
+            f"-Xmx{memory_mb}m",
+            f"-Xss{stack_kb}k",
+            *cds.java_flags(),
+            "-cp", cds.runner_classpath(),
+            "StandbyRunner",
+        ]
+
+    def take(self, class_name, classpath, limits):
+        """
+        Returns (process, control line) for a ready JVM that will run
+        ``class_name`` from ``classpath`` once the control line is written
+        to its stdin, or (None, b"") when none is ready.
+        """
+        key = _key(limits)
+        now = time.monotonic()
+        with self._lock:
+            self._arrivals[key].append(now)
+            proc = None
+            while self._idle[key]:
+                candidate = self._idle[key].popleft()
+                if candidate.poll() is None:
+                    proc = candidate
+                    break
+            self.stats["hits" if proc else "misses"] += 1
+        self._wake.set()
+        if proc is None:
+            return None, b""
+        # RLIMIT_CPU counts the startup too, so the program gets its full allowance on top
+        user_ms, sys_ms, _ = usage.sample(proc.pid) or (0, 0, None)
+        sandbox.apply_cpu_limit(proc.pid, limits.cpu_limit_seconds + math.ceil((user_ms + sys_ms) / 1000))
+        return proc, f"{classpath}\t{class_name}\n".encode()
+
+    def _target(self, key, now):
+        arrivals = self._arrivals[key]
+        while arrivals and arrivals[0] < now - self.window_seconds:
+            arrivals.popleft()
+        if not arrivals:
+            return 0
+        burst = sum(1 for t in arrivals if t >= now - _BURST_SECONDS)
+        rate = max(len(arrivals) / self.window_seconds, burst / _BURST_SECONDS)
+        # arrivals while a replacement starts, plus two standard deviations (Poisson)
+        expected = rate * self._start_seconds
+        return max(1, min(self.max_depth, math.ceil(expected + 2 * math.sqrt(expected))))
+
+    def _maintain(self):
+        while not self._closed:
+            self._wake.wait(_TICK_SECONDS)
+            self._wake.clear()
+            now = time.monotonic()
+            surplus, wanted = [], []
+            with self._lock:
+                backing_off = self._failed_at is not None and now - self._failed_at < _RETRY_SECONDS
+                total = sum(len(q) for q in self._idle.values()) + sum(self._starting.values())
+                for key in list(self._arrivals.keys() | self._idle.keys()):
+                    target = self._target(key, now)
+                    idle = self._idle[key]
+                    while len(idle) > target:
+                        surplus.append(idle.popleft())
+                        total -= 1
+                    for _ in range(target - len(idle) - self._starting[key]):
+                        if backing_off or total >= self.max_total:
+                            break
+                        self._starting[key] += 1
+                        total += 1
+                        wanted.append(key)
+                    if not target and not idle and not self._starting[key]:
+                        self._arrivals.pop(key, None)
+                        self._idle.pop(key, None)
+                self.stats["retired"] += len(surplus)
+            for proc in surplus:
+                self._close(proc)
+            for key in wanted:
+                threading.Thread(target=self._start, args=(key,), daemon=True).start()
+
+    def _start(self, key):
+        began = time.monotonic()
+        proc = None
+        try:
+            proc = subprocess.Popen(
+                self._command(key),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,  # own process group, like a fresh run (sandbox.kill_group)
+            )
+            sandbox.apply_file_limit(proc.pid)
+            if not self._await_ready(proc):
+                raise OSError("standby JVM did not become ready")
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"[WARN] could not start a standby JVM: {e}")
+            if proc is not None:
+                self._close(proc)
+            with self._lock:
+                self._starting[key] -= 1
+                self.stats["failed"] += 1
+                self._failed_at = time.monotonic()
+            return
+        elapsed = time.monotonic() - began
+        with self._lock:
+            self._starting[key] -= 1
+            self.stats["started"] += 1
+            self._start_seconds = 0.8 * self._start_seconds + 0.2 * elapsed
+            if self._closed:
+                proc.kill()
+            else:
+                self._idle[key].append(proc)
+
+    def _await_ready(self, proc):
+        fd = proc.stdout.fileno()
+        deadline = time.monotonic() + self.start_timeout
+        received = b""
+        while len(received) < len(_READY):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return False
+            chunk = os.read(fd, len(_READY) - len(received))
+            if not chunk:
+                return False
+            received += chunk
+        return received == _READY
+
+    @staticmethod
+    def _close(proc):
+        sandbox.kill_group(proc)
+        proc.wait()
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            stream.close()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                idle={f"{m}m/{s}k": len(q) for (m, s), q in self._idle.items()},
+                starting=sum(self._starting.values()),
+                start_ms=round(self._start_seconds * 1000, 1),
+            )
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            procs = [proc for q in self._idle.values() for proc in q]
+            self._idle.clear()
+        self._wake.set()
+        for proc in procs:
+            self._close(proc)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns this process's standby pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = StandbyPool(
+                max_depth=settings.STANDBY_JVM_MAX_DEPTH,
+                max_total=settings.STANDBY_JVM_MAX_TOTAL,
+                window_seconds=settings.STANDBY_JVM_WINDOW_SECONDS,
+                start_timeout=settings.STANDBY_JVM_START_TIMEOUT_SECONDS,
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def take(class_name, classpath, limits):
+    """StandbyPool.take on this process's pool, or (None, b"") when standby JVMs are off."""
+    if not settings.STANDBY_JVM_ENABLED:
+        return None, b""
+    return get_pool().take(class_name, classpath, limits)
@@ -1,3 +1,725 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import queue
+import signal
+import struct
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from editor import (builds, comparators, grading, harness, jshell_pool, jvm_pool, sandbox, scheduler, sources,
+                    verdict_cache)
+from editor.models import Questions, SourceBlob, Submission
+
+
+class PrefixMatchTests(SimpleTestCase):
+    """Comparator.prefix_matches on output that is still arriving."""
+
+    def test_exact(self):
+        exact = comparators.Comparator(comparators.EXACT)
+        self.assertTrue(exact.prefix_matches("hel", "hello\n"))
+        self.assertFalse(exact.prefix_matches("hex", "hello\n"))
+
+    def test_whitespace(self):
+        whitespace = comparators.Comparator(comparators.WHITESPACE)
+        self.assertTrue(whitespace.prefix_matches("a b", "ab c"))
+        self.assertFalse(whitespace.prefix_matches("a c", "ab c"))
+
+    def test_partial_token_is_a_prefix_of_the_next_expected_one(self):
+        tokens = comparators.Comparator(comparators.TOKENS)
+        self.assertTrue(tokens.prefix_matches("1 2", "1 23"))
+        self.assertFalse(tokens.prefix_matches("1 24", "1 23"))
+
+    def test_finished_token_must_equal_the_expected_one(self):
+        tokens = comparators.Comparator(comparators.TOKENS)
+        self.assertFalse(tokens.prefix_matches("1 2 ", "1 23"))
+        self.assertTrue(tokens.prefix_matches("1 23\n", "1 23"))
+
+    def test_partial_token_past_the_expected_ones(self):
+        tokens = comparators.Comparator(comparators.TOKENS)
+        self.assertFalse(tokens.prefix_matches("1 23 4", "1 23"))
+        self.assertFalse(comparators.Comparator(comparators.FLOAT).prefix_matches("1 23 4", "1 23"))
+
+    def test_float_partial_number_is_not_compared(self):
+        floats = comparators.Comparator(comparators.FLOAT, tolerance=1e-3)
+        self.assertTrue(floats.prefix_matches("3.1", "3.14159"))
+        self.assertTrue(floats.prefix_matches("9", "3.14159 2"))
+        self.assertTrue(floats.prefix_matches("3.1416 ", "3.14159 2"))
+        self.assertFalse(floats.prefix_matches("3.2 ", "3.14159 2"))
+
+
+class CheckerTests(SimpleTestCase):
+
+    def test_stops_once_output_goes_wrong(self):
+        checker = comparators.Comparator(comparators.TOKENS).checker("10 20\n")
+        self.assertTrue(checker.feed(b"1"))
+        self.assertTrue(checker.feed(b"0 2"))
+        self.assertFalse(checker.feed(b"1"))
+
+    def test_character_split_across_chunks(self):
+        checker = comparators.Comparator(comparators.EXACT).checker("café")
+        self.assertTrue(checker.feed("café".encode()[:4]))
+        self.assertTrue(checker.feed("café".encode()[4:]))
+
+    @override_settings(OUTPUT_COMPARE_MARGIN_BYTES=2)
+    def test_output_past_the_margin(self):
+        checker = comparators.Comparator(comparators.WHITESPACE).checker("ab")
+        self.assertTrue(checker.feed(b"a b "))
+        self.assertFalse(checker.feed(b" "))
+
+
+class FairSchedulerTests(SimpleTestCase):
+
+    def make(self, slots=1, max_queue_depth=10, max_queued_per_user=10):
+        return scheduler.FairScheduler(slots, max_queue_depth, max_queued_per_user)
+
+    def test_freed_slot_goes_to_the_participant_who_waited_their_turn(self):
+        fair = self.make()
+        a1 = fair.admit("a", "a1")
+        a2 = fair.admit("a", "a2")
+        b1 = fair.admit("b", "b1")
+        self.assertTrue(a1.granted.done())
+        self.assertFalse(a2.granted.done() or b1.granted.done())
+
+        a1.run(dict)
+        self.assertTrue(b1.granted.done())
+        self.assertFalse(a2.granted.done())
+        b1.run(dict)
+        self.assertTrue(a2.granted.done())
+
+    def test_identical_request_gets_the_original_verdict(self):
+        fair = self.make()
+        leader = fair.admit("a", "key")
+        duplicate = fair.admit("a", "key")
+        self.assertFalse(duplicate.leader)
+
+        leader.run(lambda: {"results": []})
+        verdict = duplicate.run(lambda: self.fail("a duplicate must not grade"))
+        self.assertTrue(verdict["coalesced"])
+        self.assertEqual(fair.stats["coalesced"], 1)
+        self.assertTrue(fair.admit("a", "key").leader)
+
+    def test_runs_past_the_queue_depth_are_refused_but_submissions_are_not(self):
+        fair = self.make(max_queue_depth=1)
+        fair.admit("a", "a1")
+        fair.admit("b", "b1")
+        with self.assertRaises(scheduler.Overloaded):
+            fair.admit("c", "c1")
+        self.assertTrue(fair.admit("c", "c1", reject=False).leader)
+
+    def test_withdrawn_while_waiting(self):
+        fair = self.make()
+        a1 = fair.admit("a", "a1")
+        b1 = fair.admit("b", "b1")
+        duplicate = fair.admit("b", "b1")
+
+        fair._withdraw(b1, RuntimeError("gave up"))
+        self.assertEqual(fair.snapshot()["waiting"], 0)
+        with self.assertRaises(RuntimeError):
+            duplicate.run(dict)
+        a1.run(dict)
+        self.assertEqual(fair.snapshot()["active"], 0)
+
+    def test_withdrawn_just_after_the_slot_was_granted(self):
+        fair = self.make()
+        a1 = fair.admit("a", "a1")
+        b1 = fair.admit("b", "b1")
+
+        fair._withdraw(a1, RuntimeError("gave up"))
+        self.assertTrue(b1.granted.done())
+        self.assertEqual(fair.snapshot()["active"], 1)
+
+    def test_cancelled_while_waiting_is_skipped(self):
+        fair = self.make()
+        a1 = fair.admit("a", "a1")
+        b1 = fair.admit("b", "b1")
+        c1 = fair.admit("c", "c1")
+        b1.granted.cancel()
+
+        a1.run(dict)
+        self.assertTrue(c1.granted.done())
+        fair._withdraw(b1, RuntimeError("cancelled"))
+        self.assertEqual(fair.snapshot()["active"], 1)
+        self.assertIsInstance(b1.shared.exception(), RuntimeError)
+
+    def test_cancelled_async_wait_gives_the_slot_on(self):
+        fair = self.make()
+        a1 = fair.admit("a", "a1")
+        b1 = fair.admit("b", "b1")
+        c1 = fair.admit("c", "c1")
+
+        async def cancel_b1():
+            waiting = asyncio.ensure_future(b1.run_async(dict))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(cancel_b1())
+        a1.run(dict)
+        self.assertTrue(c1.granted.done())
+        self.assertEqual(fair.snapshot()["active"], 1)
+
+
+def _utf8(text):
+    data = text.encode()
+    return b"\x01" + struct.pack(">H", len(data)) + data
+
+
+def _class_file(source=None):
+    """A minimal class file with a long constant and a field, and a SourceFile attribute when ``source``."""
+    pool = [
+        _utf8("Main"),                              # 1
+        b"\x07" + struct.pack(">H", 1),             # 2 Class Main
+        _utf8("java/lang/Object"),                  # 3
+        b"\x07" + struct.pack(">H", 3),             # 4 Class Object
+        b"\x05" + struct.pack(">q", 42),            # 5 and 6: a Long takes two entries
+        _utf8("SourceFile"),                        # 7
+        _utf8(source or "unused"),                  # 8
+        _utf8("x"),                                 # 9
+        _utf8("J"),                                 # 10
+        _utf8("ConstantValue"),                     # 11
+    ]
+    data = b"\xca\xfe\xba\xbe" + struct.pack(">HHH", 0, 61, 12) + b"".join(pool)
+    data += struct.pack(">HHHH", 0x21, 2, 4, 0)  # flags, this, super, no interfaces
+    data += struct.pack(">HHHHH", 1, 0x1A, 9, 10, 1) + struct.pack(">HIH", 11, 2, 5)  # one field
+    data += struct.pack(">H", 0)  # no methods
+    if source:
+        data += struct.pack(">H", 1) + struct.pack(">HIH", 7, 2, 8)
+    else:
+        data += struct.pack(">H", 0)
+    return data
+
+
+class SourceFileTests(SimpleTestCase):
+
+    def write(self, data):
+        fd, path = tempfile.mkstemp(suffix=".class")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def test_reads_the_source_file_attribute(self):
+        self.assertEqual(builds.source_file(self.write(_class_file("Helper.java"))), "Helper.java")
+
+    def test_without_the_attribute(self):
+        self.assertIsNone(builds.source_file(self.write(_class_file())))
+
+    def test_not_a_class_file(self):
+        self.assertIsNone(builds.source_file(self.write(b"not a class file")))
+        self.assertIsNone(builds.source_file(self.write(_class_file("Helper.java")[:40])))
+        self.assertIsNone(builds.source_file("/nonexistent/Main.class"))
+
+
+class BuildPlanTests(SimpleTestCase):
+
+    sources = {
+        "Main.java": "public class Main { Helper h; }",
+        "Helper.java": "class Helper { static class Node {} }",
+        "Other.java": "class Other { Helpers notHelper; }",
+    }
+    previous = {
+        "files": {"Main.java": "m", "Helper.java": "h", "Other.java": "o"},
+        "classes": {"Main.java": ["Main.class"], "Helper.java": ["Helper.class", "Helper$Node.class"],
+                    "Other.java": ["Other.class"]},
+    }
+
+    def plan(self, sources, **hashes):
+        return builds._plan(sources, dict(self.previous["files"], **hashes), self.previous)
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.plan(self.sources), set())
+
+    def test_files_mentioning_a_changed_type_are_compiled_again(self):
+        self.assertEqual(self.plan(self.sources, **{"Helper.java": "h2"}), {"Helper.java", "Main.java"})
+
+    def test_a_type_new_in_a_changed_file(self):
+        sources = dict(self.sources, **{"Main.java": "public class Main {} class Helpers {}"})
+        self.assertEqual(self.plan(sources, **{"Main.java": "m2"}), {"Main.java", "Other.java"})
+
+    def test_a_removed_file(self):
+        sources = {name: code for name, code in self.sources.items() if name != "Helper.java"}
+        self.assertEqual(self.plan(sources), {"Main.java"})
+
+
+def _frame(data):
+    data = data.encode() if isinstance(data, str) else data
+    return struct.pack(">i", len(data)) + data
+
+
+class JShellFramingTests(SimpleTestCase):
+    """JShellWorker reading and writing the JShellRunner framing, over a pipe instead of a JVM."""
+
+    def worker(self, answer=b"", done=True):
+        """A worker whose runner has written ``answer``, and exited if ``done``."""
+        read_fd, write_fd = os.pipe()
+        writer = os.fdopen(write_fd, "wb")
+        writer.write(answer)
+        writer.flush()
+        if done:
+            writer.close()
+        else:
+            self.addCleanup(writer.close)
+        stdout = os.fdopen(read_fd, "rb", buffering=0)
+        self.addCleanup(stdout.close)
+        worker = jshell_pool.JShellWorker.__new__(jshell_pool.JShellWorker)
+        worker.proc = SimpleNamespace(stdin=io.BytesIO(), stdout=stdout, poll=lambda: None)
+        worker.runs = 0
+        worker.retained_heap = 0
+        return worker
+
+    def test_request(self):
+        worker = self.worker()
+        limits = sandbox.Limits(time_limit_ms=1000, cpu_limit_seconds=2, output_limit_kb=1, thread_limit=4,
+                                stack_limit_kb=512)
+        worker.send({"Main.java": "class Main {}"}, [("twice", "int", "[2]")], limits)
+        expected = (struct.pack(">i", 1) + _frame("Main.java") + _frame("class Main {}")
+                    + struct.pack(">i", 1) + _frame("twice") + _frame("int") + _frame("[2]")
+                    + struct.pack(">qqiqq", 1000, limits.max_output_bytes, 4, 512 * 1024, 2_000_000_000))
+        self.assertEqual(worker.proc.stdin.getvalue(), expected)
+        self.assertEqual(worker.runs, 1)
+
+    def test_compile_answer(self):
+        answer = (struct.pack(">iqi", jshell_pool.COMPILE_ERRORS, 5, 1)
+                  + _frame("ERROR") + _frame("Main.java") + struct.pack(">qq", 3, 7) + _frame("';' expected"))
+        ok, nanos, diagnostics = self.worker(answer).read_compile()
+        self.assertFalse(ok)
+        self.assertEqual(nanos, 5)
+        self.assertEqual(diagnostics, [{"severity": "error", "file": "Main.java", "line": 3, "column": 7,
+                                        "message": "';' expected"}])
+
+    def test_case_and_trailer(self):
+        answer = (struct.pack(">iiq", 0, 0, 1500) + _frame("out") + _frame("") + _frame("4")
+                  + struct.pack(">q", 1 << 20))
+        worker = self.worker(answer)
+        self.assertEqual(worker.read_case(1), (0, 0, 1500, b"out", b"", "4"))
+        worker.read_trailer()
+        self.assertEqual(worker.retained_heap, 1 << 20)
+
+    def test_silence_times_out(self):
+        with self.assertRaises(jshell_pool.RunTimedOut):
+            self.worker(done=False).read_case(0.01)
+
+    def test_closed_output(self):
+        with self.assertRaises(EOFError):
+            self.worker(struct.pack(">iiq", 0, 0, 1)).read_case(1)
+
+
+class FakeJShellWorker:
+    """Answers evaluate() from a script: a list of cases, then the trailer or a hang."""
+
+    def __init__(self, cases, trailer=True):
+        self.cases = list(cases)
+        self.trailer = trailer
+        self.runs = 0
+        self.retained_heap = 0
+
+    def send(self, sources, calls, limits):
+        self.runs += 1
+
+    def read_compile(self):
+        return True, 0, []
+
+    def read_case(self, seconds):
+        if not self.cases:
+            raise jshell_pool.RunTimedOut("hung")
+        return self.cases.pop(0)
+
+    def read_trailer(self):
+        if not self.trailer:
+            raise jshell_pool.RunTimedOut("hung")
+
+    def alive(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class JShellEvaluateTests(SimpleTestCase):
+
+    def pool(self, *workers):
+        pool = jshell_pool.JShellPool.__new__(jshell_pool.JShellPool)
+        pool.size, pool.max_runs, pool.max_heap_bytes = len(workers), 100, 1 << 30
+        pool._idle = queue.LifoQueue()
+        for worker in reversed(workers):
+            pool._idle.put(worker)
+        pool._lock = threading.Lock()
+        pool._workers = set(workers)
+        pool.stats = dict.fromkeys(("submissions", "cases", "rejected", "spawned", "recycled", "crashed",
+                                    "timed_out"), 0)
+        pool._replace = lambda: None
+        return pool
+
+    calls = [("f", "int", "[1]"), ("f", "int", "[2]")]
+
+    def test_trailer_timeout_after_every_case(self):
+        worker = FakeJShellWorker([(0, 0, 1, b"", b"", "1"), (1, 0, 1, b"", b"", "2")], trailer=False)
+        results = self.pool(worker).evaluate({}, self.calls, sandbox.Limits())
+        self.assertEqual([run.value for run in results], ["1", "2"])
+
+    def test_no_result_recorded_after_stop(self):
+        first = FakeJShellWorker([(0, 0, 1, b"", b"", "1")])
+        seen = []
+        results = self.pool(first).evaluate({}, self.calls, sandbox.Limits(),
+                                            on_result=lambda index, run: seen.append(index) or True)
+        self.assertEqual(seen, [0])
+        self.assertEqual(len(results), 1)
+
+    def test_hung_case_is_charged_and_the_rest_run_elsewhere(self):
+        hung = FakeJShellWorker([])
+        other = FakeJShellWorker([(0, 0, 1, b"", b"", "2")])
+        results = self.pool(hung, other).evaluate({}, self.calls, sandbox.Limits())
+        self.assertEqual(results[0].limit, "time")
+        self.assertEqual(results[1].value, "2")
+
+
+def _case_frame(position, status, stdout, stderr="", value=""):
+    """A MultiCaseHarness frame."""
+    return struct.pack(">iiq", position, status, 1000) + _frame(stdout) + _frame(stderr) + _frame(value)
+
+
+class PipeProcesses:
+    """Stand-in runner processes whose stdout is a pipe."""
+
+    def process(self, answer, exited=False, returncode=-9):
+        """
+        A process that has written ``answer`` and then exits with
+        ``returncode`` if ``exited``, else keeps running until it is killed.
+        """
+        read_fd, write_fd = os.pipe()
+        writer = os.fdopen(write_fd, "wb")
+        writer.write(answer)
+        writer.flush()
+        if exited:
+            writer.close()
+        else:
+            self.addCleanup(writer.close)
+        stdout = os.fdopen(read_fd, "rb", buffering=0)
+        self.addCleanup(stdout.close)
+        return SimpleNamespace(stdin=io.BytesIO(), stdout=stdout, pid=0, returncode=returncode, poll=lambda: None,
+                               kill=writer.close, wait=lambda: None)
+
+    def patch_harness(self, *procs):
+        """Makes harness._run start ``procs`` in turn; returns the cases each one was given."""
+        started = []
+
+        def start(mode, class_name, classpath, cases, limits):
+            started.append(cases)
+            return procs[len(started) - 1]
+
+        for patch in (mock.patch.object(harness, "_start", start),
+                      mock.patch.object(harness, "_stop", lambda proc: proc.kill())):
+            patch.start()
+            self.addCleanup(patch.stop)
+        return started
+
+
+class StreamedOutputTests(PipeProcesses, SimpleTestCase):
+    """
+    The pool and the harness stop a run as soon as its streamed stdout goes
+    wrong, over a pipe instead of a JVM: a wrong first line followed by an
+    endless loop is a WA long before the time limit.
+    """
+
+    limits = sandbox.Limits(time_limit_ms=5000)
+
+    def checker(self, expected):
+        return comparators.Comparator().checker(expected)
+
+    def test_pool_stops_a_wrong_run(self):
+        worker = jvm_pool.JvmWorker.__new__(jvm_pool.JvmWorker)
+        worker.proc = self.process(struct.pack(">i", jvm_pool.STATUS_OUTPUT_CHUNK) + _frame("999\n"))
+        worker.runs = 0
+        pool = jvm_pool.JvmPool.__new__(jvm_pool.JvmPool)
+        pool._idle = queue.LifoQueue()
+        pool._idle.put(worker)
+        pool._lock = threading.Lock()
+        pool._workers = {worker}
+        pool.stats = dict.fromkeys(("runs", "spawned", "recycled", "crashed", "timed_out"), 0)
+        pool._replace = lambda: None
+
+        start = time.monotonic()
+        result = pool.run("/tmp", "Main", "", self.limits, self.checker("3\n").feed)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual((result.verdict, result.limit), (sandbox.WA, "mismatch"))
+        self.assertTrue(result.output.startswith("999"))
+        self.assertEqual(pool.stats["recycled"], 1)
+        self.assertFalse(pool._workers)
+
+    def test_pool_keeps_a_matching_run(self):
+        worker = jvm_pool.JvmWorker.__new__(jvm_pool.JvmWorker)
+        worker.proc = self.process(
+            struct.pack(">i", jvm_pool.STATUS_OUTPUT_CHUNK) + _frame("3")
+            + struct.pack(">iq?", jvm_pool.STATUS_OK, 0, False) + _frame("3\n") + _frame("")
+        )
+        worker.runs = 0
+        status, stdout, stderr = worker.run("/tmp", "Main", "", self.limits, self.checker("3\n").feed)
+        self.assertEqual((status, stdout, stderr), (jvm_pool.STATUS_OK, "3\n", ""))
+
+    def test_harness_stops_a_wrong_case_and_runs_the_rest(self):
+        started = self.patch_harness(
+            self.process(_case_frame(0, harness.STATUS_OUTPUT_CHUNK, "999\n")),
+            self.process(_case_frame(0, jvm_pool.STATUS_OK, "7\n")),
+        )
+        begin = time.monotonic()
+        results = harness.run_cases("Main", "/tmp", ["1 2", "3 4"], self.limits,
+                                    checkers=[self.checker("3\n"), self.checker("7\n")])
+        self.assertLess(time.monotonic() - begin, 1)
+        self.assertEqual([(run.verdict, run.limit) for run in results], [(sandbox.WA, "mismatch"), (sandbox.OK, None)])
+        self.assertEqual(started[1], [["3 4", str(self.checker("7\n").max_bytes)]])
+
+
+def _verdict(*passes, **extra):
+    results = [{"passed": ok, "verdict": sandbox.OK if ok else sandbox.WA} for ok in passes]
+    return dict({"results": results, "case_ids": list(range(len(passes))), "compile_ms": 40}, **extra)
+
+
+class VerdictReuseTests(SimpleTestCase):
+    """Which verdicts are memoized, and which cached ones answer a request."""
+
+    def test_runs_are_cacheable(self):
+        self.assertTrue(grading._cacheable(_verdict(True, False)))
+
+    def test_time_limit_is_not_cacheable(self):
+        verdict = _verdict(True)
+        verdict["results"].append({"passed": False, "verdict": sandbox.TLE})
+        self.assertFalse(grading._cacheable(verdict))
+
+    def test_only_compile_errors_are_cacheable(self):
+        self.assertTrue(grading._cacheable({"error": "';' expected", "compile_error": True}))
+        self.assertFalse(grading._cacheable({"error": "javac failed to start", "compile_error": False}))
+        self.assertFalse(grading._cacheable({"error": "backend unavailable"}))
+
+    def test_complete_verdict_is_reusable(self):
+        self.assertTrue(grading._reusable(_verdict(True, True, complete=True), fail_fast=False))
+        self.assertTrue(grading._reusable({"error": "';' expected", "compile_error": True}, fail_fast=False))
+
+    def test_partial_verdict_only_answers_fail_fast(self):
+        failed = _verdict(True, False, complete=False)
+        self.assertTrue(grading._reusable(failed, fail_fast=True))
+        self.assertFalse(grading._reusable(failed, fail_fast=False))
+        self.assertFalse(grading._reusable(_verdict(True, complete=False), fail_fast=True))
+
+    def test_missing_verdict_is_not_reusable(self):
+        self.assertFalse(grading._reusable(None, fail_fast=True))
+
+    def test_cache_hit_has_no_compile_or_usage(self):
+        cached = _verdict(True, usage={"wall_ms": 900})
+        hit = grading._from_cache(cached)
+        self.assertEqual((hit["compile_ms"], hit["usage"], hit["cached"]), (0, None, True))
+        self.assertEqual(hit["results"], cached["results"])
+        self.assertEqual(cached["usage"], {"wall_ms": 900})
+
+
+class ClassifyTests(SimpleTestCase):
+    """sandbox.classify turning how a run ended into a verdict."""
+
+    limits = sandbox.Limits(time_limit_ms=500, output_limit_kb=1)
+
+    def classify(self, returncode, limit=None, stderr="", limits=limits):
+        return sandbox.classify(returncode, "out", stderr, limit, limits, 10.0)
+
+    def test_clean_exit(self):
+        run = self.classify(0)
+        self.assertEqual((run.verdict, run.limit, run.output), (sandbox.OK, None, "out"))
+
+    def test_nonzero_exit(self):
+        self.assertEqual(self.classify(1).verdict, sandbox.RE)
+
+    def test_killed_by_the_cpu_limit(self):
+        for signum in (signal.SIGXCPU, signal.SIGKILL):
+            run = self.classify(-signum)
+            self.assertEqual((run.verdict, run.limit), (sandbox.TLE, "cpu"))
+
+    def test_wall_clock(self):
+        run = self.classify(None, "time")
+        self.assertEqual(run.verdict, sandbox.TLE)
+        self.assertEqual(run.output, "out\n[TLE] Time limit exceeded (500 ms)")
+
+    def test_out_of_memory(self):
+        run = self.classify(1, stderr='Exception in thread "main" java.lang.OutOfMemoryError: Java heap space')
+        self.assertEqual((run.verdict, run.limit), (sandbox.MLE, "memory"))
+
+    def test_output_limit(self):
+        self.assertEqual(self.classify(1, "output").verdict, sandbox.OLE)
+
+    def test_expected_output_cap_is_a_mismatch(self):
+        run = self.classify(1, "output", limits=self.limits.with_output_cap(10))
+        self.assertEqual((run.verdict, run.limit), (sandbox.WA, "mismatch"))
+
+    def test_threads(self):
+        self.assertEqual(self.classify(0, "threads").verdict, sandbox.RE)
+
+
+class HarnessTests(PipeProcesses, SimpleTestCase):
+    """editor/harness.py talking the MultiCaseHarness framing, over pipes instead of a JVM."""
+
+    limits = sandbox.Limits(time_limit_ms=50)
+
+    def test_encode_cases(self):
+        expected = (struct.pack(">i", 2) + struct.pack(">i", 1) + _frame("1 2")
+                    + struct.pack(">i", 2) + _frame("") + _frame("12"))
+        self.assertEqual(harness.encode_cases([["1 2"], [None, "12"]]), expected)
+
+    def test_read_frame(self):
+        proc = self.process(_case_frame(3, harness.STATUS_TIMEOUT, "out", "err", "[1]"), exited=True)
+        self.assertEqual(harness._read_frame(proc.stdout), (3, harness.STATUS_TIMEOUT, 1000, b"out", b"err", b"[1]"))
+        with self.assertRaises(EOFError):
+            harness._read_frame(proc.stdout)
+
+    def test_results_in_order(self):
+        self.patch_harness(self.process(
+            _case_frame(0, jvm_pool.STATUS_OK, "3") + _case_frame(1, jvm_pool.STATUS_ERROR, "", "boom", "[2]"),
+            exited=True,
+        ))
+        seen = []
+        results = harness.run_unit_cases("Main", "/tmp", [("f", "int", "[1]")] * 2, self.limits,
+                                         on_result=lambda index, run: seen.append(index))
+        self.assertEqual(seen, [0, 1])
+        self.assertEqual([(run.verdict, run.stdout, run.value) for run in results],
+                         [(sandbox.OK, "3", None), (sandbox.RE, "", "[2]")])
+        self.assertIs(results[0].usage, results[1].usage)
+
+    def test_case_at_a_limit_restarts_the_rest(self):
+        started = self.patch_harness(
+            self.process(_case_frame(0, jvm_pool.STATUS_THREAD_LIMIT, ""), exited=True),
+            self.process(_case_frame(0, jvm_pool.STATUS_OK, "7"), exited=True),
+        )
+        results = harness.run_cases("Main", "/tmp", ["1 2", "3 4"], self.limits)
+        self.assertEqual([(run.verdict, run.limit) for run in results], [(sandbox.RE, "threads"), (sandbox.OK, None)])
+        self.assertEqual(started, [[["1 2"], ["3 4"]], [["3 4"]]])
+
+    def test_stop_skips_the_rest(self):
+        started = self.patch_harness(self.process(_case_frame(0, jvm_pool.STATUS_ERROR, ""), exited=True))
+        results = harness.run_cases("Main", "/tmp", ["1 2", "3 4"], self.limits, on_result=lambda index, run: True)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(started), 1)
+
+    def test_crash_is_charged_to_the_running_case(self):
+        self.patch_harness(
+            self.process(b"", exited=True, returncode=134),
+            self.process(_case_frame(0, jvm_pool.STATUS_OK, "7"), exited=True),
+        )
+        results = harness.run_cases("Main", "/tmp", ["1 2", "3 4"], self.limits)
+        self.assertEqual((results[0].verdict, results[0].stderr), (sandbox.RE, "JVM exited with status 134"))
+        self.assertEqual(results[1].verdict, sandbox.OK)
+
+    @mock.patch.object(harness, "_STARTUP_SECONDS", 0)
+    def test_hang_is_charged_to_the_running_case(self):
+        self.patch_harness(
+            self.process(_case_frame(0, jvm_pool.STATUS_OK, "3")),
+            self.process(_case_frame(0, jvm_pool.STATUS_OK, "11"), exited=True),
+        )
+        results = harness.run_cases("Main", "/tmp", ["1 2", "3 4", "5 6"], self.limits)
+        self.assertEqual([(run.verdict, run.limit) for run in results],
+                         [(sandbox.OK, None), (sandbox.TLE, "time"), (sandbox.OK, None)])
+        self.assertEqual(results[2].stdout, "11")
+
+
+class SourceBlobTests(TestCase):
+    """Submitted code kept once per distinct text (editor/sources.py)."""
+
+    def test_compression_round_trip(self):
+        code = "class Main { public static void main(String[] a) { System.out.println(\"é\"); } }\n" * 20
+        data = sources.compress(code)
+        self.assertLess(len(data), len(code))
+        self.assertEqual(sources.decompress(memoryview(data)), code)
+
+    def test_attach_stores_each_text_once(self):
+        starter, edited = "class Main {}", "class Main { int x; }"
+        submissions = [Submission(), Submission(), Submission()]
+        with self.assertNumQueries(1):
+            sources.attach(submissions, [starter, edited, starter])
+        self.assertEqual(SourceBlob.objects.count(), 2)
+        self.assertEqual(submissions[0].source_id, submissions[2].source_id)
+        self.assertNotEqual(submissions[0].source_id, submissions[1].source_id)
+        self.assertEqual([sources.source_of(s) for s in submissions], [starter, edited, starter])
+        self.assertEqual(SourceBlob.objects.get(pk=submissions[1].source_id).size, len(edited))
+
+    def test_attach_skips_stored_texts(self):
+        sources.attach([Submission()], ["class Main {}"])
+        later = Submission()
+        sources.attach([later], ["class Main {}"])
+        self.assertEqual(SourceBlob.objects.count(), 1)
+        self.assertEqual(sources.source_of(later), "class Main {}")
+
+    def test_attach_nothing(self):
+        with self.assertNumQueries(0):
+            sources.attach([], [])
+
+    def test_submission_without_source(self):
+        self.assertIsNone(sources.source_of(Submission()))
+
+
+class TestCaseOutcomeTests(TestCase):
+    """Failure counts behind the SUBMIT case order (grading.record_outcomes, grading._test_cases)."""
+
+    def setUp(self):
+        self.question = Questions.objects.create(question_string="Add", question_type="IO")
+        self.first = self.question.test_cases.create(test_input="1 2", expected_output="3")
+        self.second = self.question.test_cases.create(test_input="3 4", expected_output="7")
+
+    def counts(self, case):
+        case.refresh_from_db()
+        return case.runs, case.failures
+
+    def test_counts_fresh_runs(self):
+        verdicts = [
+            {"results": [{"passed": False}, {"passed": True}], "case_ids": [self.second.pk, self.first.pk]},
+            {"results": [{"passed": False}], "case_ids": [self.second.pk], "cached": False},
+        ]
+        with self.assertNumQueries(3):  # runs +2 and +1, failures +2
+            grading.record_outcomes(verdicts)
+        self.assertEqual(self.counts(self.first), (1, 0))
+        self.assertEqual(self.counts(self.second), (2, 2))
+
+    def test_skips_cached_and_uncompiled_verdicts(self):
+        verdicts = [
+            {"results": [{"passed": False}], "case_ids": [self.first.pk], "cached": True},
+            {"error": "';' expected", "compile_error": True},
+        ]
+        with self.assertNumQueries(0):
+            grading.record_outcomes(verdicts)
+        self.assertEqual(self.counts(self.first), (0, 0))
+
+    @override_settings(ADAPTIVE_TEST_ORDER_ENABLED=True)
+    def test_likely_failures_run_first_in_fail_fast(self):
+        self.question.test_cases.filter(pk=self.second.pk).update(runs=4, failures=3)
+        self.assertEqual(grading._test_cases(self.question, fail_fast=True), [self.second, self.first])
+        self.assertEqual(grading._test_cases(self.question, fail_fast=False), [self.first, self.second])
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    "verdicts": dict(settings.CACHES["verdicts"], BACKEND="django.core.cache.backends.locmem.LocMemCache",
+                     LOCATION="verdict-tests"),
+})
+class VerdictCacheTests(SimpleTestCase):
+
+    question = SimpleNamespace(pk=7, suite_version=1)
+
+    def test_key_follows_the_test_suite(self):
+        bumped = SimpleNamespace(pk=7, suite_version=2)
+        self.assertNotEqual(verdict_cache._key(self.question, "class Main {}"),
+                            verdict_cache._key(bumped, "class Main {}"))
+        self.assertEqual(verdict_cache._key(self.question, "class Main {}"),
+                         verdict_cache._key(self.question, "\nclass Main {}  \n"))
+
+    def test_round_trip(self):
+        verdict = _verdict(True)
+        verdict_cache.put(self.question, "class Main {}", verdict)
+        self.assertEqual(verdict_cache.get(self.question, "class Main {}"), verdict)
+        self.assertIsNone(verdict_cache.get(SimpleNamespace(pk=7, suite_version=2), "class Main {}"))
+
+    def test_verdicts_from_an_older_format_are_not_served(self):
+        cache = verdict_cache.caches["verdicts"]
+        cache.set(verdict_cache._key(self.question, "class Old {}"), {"results": []}, version=cache.version - 1)
+        self.assertIsNone(verdict_cache.get(self.question, "class Old {}"))
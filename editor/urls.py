@@ -1,12 +1,14 @@
 from django.contrib import admin
 from django.urls import path
 from . import views
-from .views import run_code, submit_all
+from .views import run_code_async, submit_all_async
 
 app_name = "experimental_app"
 
 urlpatterns = [
-    path('run-code/', run_code, name='run-code'),
+    path('run-code/', run_code_async, name='run-code'),
+    path('run-code/jobs/', views.start_run_job, name='run-job'),
+    path('compile-check/', views.compile_check, name='compile-check'),
     path('editor/', views.editor, name='editor'),
-    path('submit-all/', submit_all, name='submit-all'),
+    path('submit-all/', submit_all_async, name='submit-all'),
 ]
@@ -0,0 +1,115 @@
+"""
+Resource accounting for compiles and runs.
+
+Every JVM we start is reaped with os.wait4, which hands back the child's
+rusage: user and system CPU time and peak resident set size. The kernel's
+peak RSS of a child also covers the web process image it was forked from,
+so while a program runs its own high-water mark (VmHWM) is sampled from
+/proc and preferred. Together with the wall time and the bytes it printed
+that makes a Usage. A harness JVM runs several test cases, so its cases
+share one Usage; warm-pool runs happen inside a shared JVM and only have
+wall time and output size.
+
+A verdict's ``usage`` (see ``summary``) adds up the distinct processes
+behind its test cases and is stored with each Submission in the same flat
+form; ``manage.py usage_report`` turns those into percentiles per question.
+A verdict served from the verdict cache has no usage, so its Submission
+records none and the report leaves it out.
+"""
+import os
+
+
+class Usage:
+    """What one process used. CPU and memory are None when no rusage was available."""
+
+    def __init__(self, wall_ms=0.0, user_ms=None, sys_ms=None, max_rss_kb=None, output_bytes=0):
+        self.wall_ms = wall_ms
+        self.user_ms = user_ms
+        self.sys_ms = sys_ms
+        self.max_rss_kb = max_rss_kb
+        self.output_bytes = output_bytes
+
+    @classmethod
+    def from_rusage(cls, rusage, wall_ms, output_bytes, peak_kb=None):
+        """``peak_kb``: the highest VmHWM sampled while the process ran, if any."""
+        if rusage is None:
+            return cls(wall_ms, max_rss_kb=peak_kb, output_bytes=output_bytes)
+        return cls(
+            wall_ms,
+            user_ms=rusage.ru_utime * 1000,
+            sys_ms=rusage.ru_stime * 1000,
+            max_rss_kb=peak_kb or rusage.ru_maxrss,  # kilobytes on Linux
+            output_bytes=output_bytes,
+        )
+
+
+def reap(proc, block=True):
+    """
+    Popen.wait (or with block=False, Popen.poll) through os.wait4, keeping
+    the child's rusage as ``proc.rusage``. Returns the return code, or None
+    while the process is still running.
+    """
+    if proc.returncode is not None:
+        return proc.returncode
+    try:
+        pid, status, rusage = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        # reaped elsewhere; the rusage is gone
+        return proc.wait() if block else proc.poll()
+    if pid == 0:
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.rusage = rusage
+    return proc.returncode
+
+
+def peak_rss_kb(pid):
+    """A running process's own peak resident set size (VmHWM), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def sample(pid):
+    """
+    (user_ms, sys_ms, max_rss_kb) of a running process from /proc, for
+    children reaped by someone else (asyncio's child watcher), or None.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        return int(fields[11]) * 1000 / ticks, int(fields[12]) * 1000 / ticks, peak_rss_kb(pid)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _sum(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values)) if values else None
+
+
+def summary(compile_result, runs):
+    """
+    The flat usage dict of one graded submission: the compile's wall and
+    CPU time, then wall time, CPU, peak RSS and output summed (peak: maxed)
+    over the distinct processes behind ``runs`` (sandbox.ExecutionResults).
+    """
+    processes = list({id(run.usage): run.usage for run in runs if run.usage is not None}.values())
+    rss = [u.max_rss_kb for u in processes if u.max_rss_kb is not None]
+    totals = {
+        "compile_ms": round(compile_result.compile_ms),
+        "compile_cpu_ms": _sum([compile_result.cpu_ms]),
+        "processes": len(processes),
+        "wall_ms": _sum(u.wall_ms for u in processes),
+        "user_ms": _sum(u.user_ms for u in processes),
+        "sys_ms": _sum(u.sys_ms for u in processes),
+        "max_rss_kb": max(rss) if rss else None,
+        "output_bytes": sum(u.output_bytes for u in processes),
+    }
+    return {key: value for key, value in totals.items() if value is not None}
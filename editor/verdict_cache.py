@@ -0,0 +1,25 @@
+"""
+Memoized grading verdicts.
+
+A verdict is keyed by (source hash, question id, test-suite version), so
+submitting code that was just run, or untouched starter code that other
+participants already submitted, is answered without compiling or spawning
+anything. Saving a question bumps its suite_version, which retires every
+verdict graded against the old test cases.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from editor.compile_cache import source_hash
+
+
+def _key(question, code):
+    return f"{question.pk}:{question.suite_version}:{source_hash(code.strip())}"
+
+
+def get(question, code):
+    return caches["verdicts"].get(_key(question, code))
+
+
+def put(question, code, verdict):
+    caches["verdicts"].set(_key(question, code), verdict, settings.VERDICT_CACHE_TIMEOUT)
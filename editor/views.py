@@ -1,18 +1,24 @@
 import json
-import os
-import subprocess
-import tempfile
+import secrets
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 from django.urls import reverse
 from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 from CodeEditor import settings
 from decorators import *
-from editor.forms import QuestionsForm, TestCaseFormSet
-from editor.models import Questions, ParticipantProfile, Submission
+from editor import (artifacts, builds, cds, compile_cache, grading, grading_queue, javac_service, jobs, jshell_pool,
+                    jvm_pool, scheduler, sources, standby, workspaces)
+from editor import compile_check as compile_checks
+from editor.forms import QuestionFileFormSet, QuestionsForm, TestCaseFormSet
+from editor.models import Questions, ParticipantProfile, QuestionFile, Submission
 
 
 @login_required(login_url='login')
@@ -56,14 +62,9 @@ def run_code(request):
       - question_id: the ID of the Questions object to run against
     Returns JSON: { results: [ { input, expected_output, actual_output, passed }, … ] }
     """
-    code = request.POST.get("code", "").strip()
-    qid = request.POST.get("question_id")
-
-    # Basic validation
-    if not code:
-        return JsonResponse({"error": "No code provided."}, status=400)
-    if not qid:
-        return JsonResponse({"error": "No question_id provided."}, status=400)
+    code, qid, error = parse_run_request(request)
+    if error:
+        return error
 
     # Lookup question
     try:
@@ -71,95 +72,176 @@ def run_code(request):
     except (Questions.DoesNotExist, ValueError):
         return JsonResponse({"error": "Invalid question_id."}, status=400)
 
-    test_cases = question.test_cases.all()
-    results = []
+    try:
+        ticket = scheduler.admit_run(request.user.pk, question, code, grading.RUN)
+    except scheduler.Overloaded as e:
+        return too_busy(e)
+    try:
+        verdict = ticket.run(lambda: grading.grade(question, code, grading.RUN, owner_id=request.user.pk))
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    return JsonResponse(verdict)
+
+
+async def run_code_async(request):
+    """
+    Async run_code (same POST params and JSON). Programs are started with
+    asyncio subprocesses, so one participant's run doesn't wait behind another's.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    code, qid, error = parse_run_request(request)
+    if error:
+        return error
 
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 1) Compile Main.java
-            cp = compile_java_file(code, "Main.java", temp_dir)
-            if cp.returncode != 0:
-                return JsonResponse({"error": cp.stderr}, status=200)
-
-            # 2) Branch on question type
-            if question.question_type == "IO":
-                # For each test case, run Main with test_input
-                for tc in test_cases:
-                    out = execute_java_file("Main", temp_dir, input_data=tc.test_input)
-                    expected = tc.expected_output.strip()
-                    actual = out.strip()
-                    results.append({
-                        "input": tc.test_input,
-                        "expected_output": expected,
-                        "actual_output": actual,
-                        "passed": actual == expected
-                    })
+        question = await Questions.objects.prefetch_related("test_cases", "files").aget(pk=int(qid))
+    except (Questions.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Invalid question_id."}, status=400)
 
-            else:
-                # Unit test via your existing CountPositiveRunner.java
-                runner_src = "/Users/jaden/PycharmProjects/CodeEditor/java/CountPositiveRunner.java"
-                dest = os.path.join(temp_dir, "CountPositiveRunner.java")
-                subprocess.run(["cp", runner_src, dest], check=True)
-
-                # Compile the runner
-                cr = subprocess.run(
-                    ["javac", dest], capture_output=True, text=True
-                )
-                if cr.returncode != 0:
-                    return JsonResponse({"error": cr.stderr}, status=200)
-
-                # Run the runner
-                out = execute_java_file("CountPositiveRunner", temp_dir)
-
-                # Parse lines for “Actual:” prefix
-                actual_val = None
-                for line in out.splitlines():
-                    if line.startswith("Actual:"):
-                        actual_val = line.split("Actual:")[1].strip()
-                        break
-
-                expected_val = "6"
-                passed = (actual_val == expected_val)
-                results.append({
-                    "input": None,
-                    "expected_output": expected_val,
-                    "actual_output": actual_val or out,
-                    "passed": passed
-                })
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    try:
+        ticket = scheduler.admit_run(owner_id, question, code, grading.RUN)
+    except scheduler.Overloaded as e:
+        return too_busy(e)
+    try:
+        verdict = await ticket.run_async(lambda: grading.grade_async(question, code, grading.RUN, owner_id=owner_id))
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    return JsonResponse(verdict)
+
+
+async def start_run_job(request):
+    """
+    Starts run_code as a background job (same POST params) and answers at
+    once with 202 { job_id, ws_url }. The compile-done, test-result and done
+    events are streamed by RunJobConsumer on ws_url; done carries the same
+    JSON run_code would have returned.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    code, qid, error = parse_run_request(request)
+    if error:
+        return error
+
+    try:
+        question = await Questions.objects.prefetch_related("test_cases", "files").aget(pk=int(qid))
+    except (Questions.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Invalid question_id."}, status=400)
+
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    try:
+        ticket = scheduler.admit_run(owner_id, question, code, grading.RUN)
+    except scheduler.Overloaded as e:
+        return too_busy(e)
+    job = jobs.start(
+        owner_id,
+        lambda progress: ticket.run(lambda: grading.grade(question, code, grading.RUN, progress, owner_id=owner_id)),
+        ready=ticket.ready,
+    )
+    return JsonResponse({"job_id": job.id, "ws_url": f"/ws/run-jobs/{job.id}/"}, status=202)
+
+
+async def compile_check(request):
+    """
+    Compiles the editor's code without running it, for as-you-type markers.
+    POST code, editor_id, seq (increasing per editor) and optionally
+    question_id, whose files are compiled along. Returns { ok,
+    diagnostics: [ { line, column, severity, message } ], compile_ms, cached },
+    or { stale: true } when a newer check from the same editor came in first.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    code = request.POST.get("code", "")
+    if not code.strip():
+        return JsonResponse({"ok": True, "diagnostics": [], "compile_ms": 0, "cached": True})
+    try:
+        seq = int(request.POST.get("seq", 0))
+    except ValueError:
+        return JsonResponse({"error": "Invalid seq."}, status=400)
 
+    sources = {"Main.java": code}
+    qid = request.POST.get("question_id", "")
+    if qid.isdigit():
+        sources = {f.name: f.content async for f in QuestionFile.objects.filter(question_id=int(qid))} | sources
+
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    key = compile_checks.begin(owner_id, request.POST.get("editor_id", ""), seq)
+    try:
+        response = await compile_checks.check(sources, key, seq)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
+    if response is None:
+        return JsonResponse({"stale": True})
+    return JsonResponse(response)
 
-    return JsonResponse({"results": results})
+
+def too_busy(error):
+    """HTTP 429 with Retry-After for a run the scheduler refused (editor/scheduler.py)."""
+    response = JsonResponse({"error": str(error), "retry_after": error.retry_after}, status=429)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def parse_run_request(request):
+    """
+    Validates run_code's POST params. Returns (code, question_id, None), or
+    (None, None, JsonResponse) describing what is missing.
+    """
+    code = request.POST.get("code", "").strip()
+    qid = request.POST.get("question_id")
+
+    # Basic validation
+    if not code:
+        return None, None, JsonResponse({"error": "No code provided."}, status=400)
+    if not qid:
+        return None, None, JsonResponse({"error": "No question_id provided."}, status=400)
+    return code, qid, None
+
+
+LIMIT_FIELDS = ['time_limit_ms', 'cpu_limit_seconds', 'memory_limit_mb', 'stack_limit_kb',
+                'output_limit_kb', 'thread_limit']
 
 
 # @user_passes_test(lambda u: u.is_superuser)
 def create_or_edit_questions(request, question_id=None):
-    """Create or edit a coding question along with its test cases."""
+    """Create or edit a coding question along with its test cases and extra source files."""
     question = get_object_or_404(Questions, pk=question_id) if question_id else None
 
     if request.method == 'POST':
         q_form = QuestionsForm(request.POST, instance=question)
         formset = TestCaseFormSet(request.POST, instance=question)
+        file_formset = QuestionFileFormSet(request.POST, instance=question, prefix='files')
 
-        if q_form.is_valid() and formset.is_valid():
+        if q_form.is_valid() and formset.is_valid() and file_formset.is_valid():
             saved_question = q_form.save()
             formset.instance = saved_question
             formset.save()
+            file_formset.instance = saved_question
+            file_formset.save()
+            # verdicts cached against the previous tests or files no longer apply
+            Questions.objects.filter(pk=saved_question.pk).update(suite_version=F("suite_version") + 1)
+            artifacts.prepare(saved_question)
             return redirect('create-or-edit-questions')
         else:
             print("q_form errors:", q_form.errors)
             print("formset errors:", formset.errors)
+            print("file formset errors:", file_formset.errors, file_formset.non_form_errors())
 
     q_form = QuestionsForm(instance=question)
     formset = TestCaseFormSet(instance=question)
+    file_formset = QuestionFileFormSet(instance=question, prefix='files')
     questions = Questions.objects.all()
 
     return render(request, 'create-or-edit-questions.html', {
         'q_form': q_form,
         'formset': formset,
+        'file_formset': file_formset,
         'question': question,
         'questions': questions,
+        'limit_fields': LIMIT_FIELDS,
     })
 
 
@@ -173,6 +255,31 @@ def delete_question(request, question_id):
     return render(request, 'confirm-delete.html', {'question': question})
 
 
+@user_passes_test(lambda u: u.is_superuser)
+def execution_stats(request):
+    """Counters from the execution layer (compile cache, pools, artifacts, grading queue) as JSON."""
+    stats = {
+        "compile_cache": compile_cache.snapshot(),
+        "artifacts": artifacts.snapshot(),
+        "cds": cds.snapshot(),
+        "compile_check": compile_checks.snapshot(),
+        "incremental_builds": builds.snapshot(),
+        "grading_queue": grading_queue.depth(),
+        "scheduler": scheduler.get_scheduler().snapshot(),
+    }
+    if javac_service._pools:
+        stats["javac_daemons"] = {lane: pool.snapshot() for lane, pool in javac_service._pools.items()}
+    if workspaces._pool is not None:
+        stats["workspaces"] = workspaces._pool.snapshot()
+    if jvm_pool._pool is not None:
+        stats["jvm_pool"] = jvm_pool._pool.snapshot()
+    if jshell_pool._pool is not None:
+        stats["jshell_pool"] = jshell_pool._pool.snapshot()
+    if standby._pool is not None:
+        stats["standby_jvms"] = standby._pool.snapshot()
+    return JsonResponse(stats)
+
+
 @login_required(login_url='control_app:login')
 def submit_all(request):
     """
@@ -187,58 +294,60 @@ def submit_all(request):
       • next="second-pass", keep_ids=[…], hide_ai=True
       • or next="thank-you", redirect_url="/…"
     """
+    items = _load_submission_items(request)
+    pairs = [(question, code) for question, code, _ in items]
+    ticket = scheduler.admit_submission(request.user.pk, pairs, grading.SUBMIT)
+    verdicts = ticket.run(lambda: grading.grade_many(pairs, grading.SUBMIT, owner_id=request.user.pk))
+    return _record_submit_all(request, items, verdicts)
+
+
+@async_login_required(login_url='control_app:login')
+async def submit_all_async(request):
+    """
+    Async submit_all (same payload and JSON). Grading runs on the event loop;
+    the database and session work stays in sync_to_async.
+    """
+    items = await sync_to_async(_load_submission_items)(request)
+    pairs = [(question, code) for question, code, _ in items]
+    owner_id = await sync_to_async(lambda: request.user.pk)()
+    ticket = scheduler.admit_submission(owner_id, pairs, grading.SUBMIT)
+    verdicts = await ticket.run_async(lambda: grading.grade_many_async(pairs, grading.SUBMIT, owner_id=owner_id))
+    return await sync_to_async(_record_submit_all)(request, items, verdicts)
+
+
+def _load_submission_items(request):
+    """[(question with prefetched test cases, code, attempt_no), …] from submit_all's JSON body."""
     payload = json.loads(request.body.decode('utf-8'))
     submissions = payload.get("submissions", [])
+    return [
+        (get_object_or_404(Questions.objects.prefetch_related("test_cases", "files"), pk=int(item["question_id"])),
+         item["code"],
+         int(item["attempt_no"]))
+        for item in submissions
+    ]
+
+
+def _record_submit_all(request, items, verdicts):
     user = request.user
     profile = request.user.participantprofile
     is_exp = (profile.group == ParticipantProfile.EXPERIMENTAL)
 
-    question_ids = []  # will track the order
     passed_ids = []  # those that passed on this pass
 
-    # 1) Compile, run & record each
-    for item in submissions:
-        qid = int(item["question_id"])
-        code = item["code"]
-        attempt = int(item["attempt_no"])
-        question = get_object_or_404(Questions, pk=qid)
-
-        # compile & run
-        is_correct = False
-        with tempfile.TemporaryDirectory() as tmp:
-            compile_proc = compile_java_file(code, "Main.java", tmp)
-            if compile_proc.returncode == 0:
-                if question.question_type == "IO":
-                    is_correct = all(
-                        execute_java_file("Main", tmp, input_data=tc.test_input).strip()
-                        == tc.expected_output.strip()
-                        for tc in question.test_cases.all()
-                    )
-                else:
-                    # unit‐test path
-                    runner_src = "/Users/jaden/PycharmProjects/CodeEditor/java/CountPositiveRunner.java"
-                    dest = os.path.join(tmp, "CountPositiveRunner.java")
-                    subprocess.run(["cp", runner_src, dest], check=True)
-                    compile_runner = subprocess.run(
-                        ["javac", dest], capture_output=True, text=True
-                    )
-                    if compile_runner.returncode == 0:
-                        out_lines = execute_java_file("CountPositiveRunner", tmp).splitlines()
-                        actual = next(
-                            (l.split("Actual:")[1].strip()
-                             for l in out_lines if l.startswith("Actual:")),
-                            None
-                        )
-                        is_correct = (actual == "6")
+    # Record each, all at once
+    new_submissions = []
+    for (question, code, attempt), verdict in zip(items, verdicts):
+        qid = question.id
+        is_correct = grading.passed(verdict)
         print(f"[DEBUG]    → is_correct = {is_correct}")
-        # record in DB
-        Submission.objects.create(
+        new_submissions.append(Submission(
             user=user,
             question=question,
             attempt_no=attempt,
             used_ai=(is_exp and attempt == 1),
-            is_correct=is_correct
-        )
+            is_correct=is_correct,
+            resource_usage=verdict.get("usage"),
+        ))
 
         # update counters & passed_ids
         if attempt == 1:
@@ -252,9 +361,13 @@ def submit_all(request):
             if is_correct and is_exp:
                 profile.second_attempt_correct += 1
     print(f"[DEBUG] final passed_ids = {passed_ids}")
-    profile.save()
+    with transaction.atomic():
+        sources.attach(new_submissions, [code for _, code, _ in items])
+        Submission.objects.bulk_create(new_submissions)
+        profile.save()
+        grading.record_outcomes(verdicts)
 
-    # 2) Decide what comes next
+    # Decide what comes next
     # — experimental, first pass
     # make absolutely sure the client-sent attempt_no is an int
     exp_pass_num = request.session.get("experimental_pass", 1)
@@ -290,32 +403,26 @@ def submit_all(request):
     })
 
 
-def compile_java_file(code, filename, temp_dir):
+@csrf_exempt
+@require_POST
+def grade_remote(request):
     """
-    Writes Java code to a file, compiles it, and returns the process result.
+    Grading worker endpoint for the remote backend (editor/grading.py).
+    Expects a JSON body { question_id, source, mode } and a
+    "Bearer <GRADING_REMOTE_TOKEN>" Authorization header; returns the verdict.
     """
-    file_path = os.path.join(temp_dir, filename)
-    with open(file_path, "w") as f:
-        f.write(code)
-
-    return subprocess.run(
-        ["javac", file_path],
-        capture_output=True,
-        text=True
-    )
-
+    token = settings.GRADING_REMOTE_TOKEN
+    if not token or not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return JsonResponse({"error": "Forbidden."}, status=403)
+    try:
+        payload = json.loads(request.body)
+        question = Questions.objects.prefetch_related("test_cases", "files").get(pk=int(payload["question_id"]))
+        source, mode = payload["source"], payload.get("mode", grading.RUN)
+    except (ValueError, KeyError, TypeError, Questions.DoesNotExist):
+        return JsonResponse({"error": "Invalid grading request."}, status=400)
 
-def execute_java_file(class_name, temp_dir, input_data=None):
-    """
-    Runs a compiled Java file and returns its output.
-    """
     try:
-        run_process = subprocess.run(
-            ["java", "-cp", temp_dir, class_name],
-            input=input_data,
-            capture_output=True,
-            text=True
-        )
-        return run_process.stdout.strip() or run_process.stderr.strip()
+        verdict = grading.grade(question, source, mode, backend=grading.local_backend())
     except Exception as e:
-        return str(e)
+        return JsonResponse({"error": str(e)}, status=500)
+    return JsonResponse(verdict)
@@ -0,0 +1,154 @@
+"""
+Pool of scratch directories for compiling and running submissions.
+
+Instead of creating and deleting a temporary directory per request, each
+process keeps WORKSPACE_POOL_SIZE directories under WORKSPACE_ROOT, which
+defaults to a directory in EXECUTION_CACHE_DIR. A job checks one out, and on
+return it is emptied and handed to the next job. When all are in use a job
+gets an extra workspace that is removed afterwards.
+
+WORKSPACE_QUOTA_MB is a per-file quota: programs cannot write a single file
+larger than that (RLIMIT_FSIZE, see sandbox.apply_file_limit), but nothing
+stops a run from writing many of them while it runs. A workspace found over
+the quota in total when it comes back is deleted and created afresh instead
+of being reused. Pointing WORKSPACE_ROOT at RAM-backed /dev/shm is faster,
+but then a run that writes many files uses up memory until it ends.
+"""
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+
+def _usage(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _wipe(path):
+    """Empties a workspace without removing the directory itself."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkspacePool:
+    """The workspaces of this process; names start with the pid so stale ones can be found."""
+
+    def __init__(self, root, size, quota_bytes):
+        self.root = Path(root)
+        self.size = size
+        self.quota_bytes = quota_bytes
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.stats = {"checkouts": 0, "reused": 0, "overflow": 0, "over_quota": 0, "wipe_ms": 0.0}
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._remove_stale()
+        for n in range(size):
+            self._idle.put(self._create(f"{os.getpid()}-{n}"))
+
+    def _create(self, name):
+        path = self.root / name
+        if path.exists():
+            shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(mode=0o700)
+        return path
+
+    def _remove_stale(self):
+        # left behind by processes that have exited
+        for path in self.root.iterdir():
+            pid = path.name.split("-", 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def checkout(self):
+        """Yields an empty workspace directory (a str) for one job."""
+        try:
+            path = self._idle.get_nowait()
+            overflow = False
+        except queue.Empty:
+            path = self._create(f"{os.getpid()}-x{uuid.uuid4().hex[:8]}")
+            overflow = True
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["overflow" if overflow else "reused"] += 1
+        try:
+            yield str(path)
+        finally:
+            if overflow:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                self._checkin(path)
+
+    def _checkin(self, path):
+        start = time.monotonic()
+        if _usage(path) > self.quota_bytes:
+            print(f"[WARN] workspace {path.name} went over its {self.quota_bytes // (1024 * 1024)} MB quota")
+            path = self._create(path.name)
+            with self._lock:
+                self.stats["over_quota"] += 1
+        else:
+            _wipe(path)
+        with self._lock:
+            self.stats["wipe_ms"] += (time.monotonic() - start) * 1000
+        self._idle.put(path)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, root=str(self.root), size=self.size, idle=self._idle.qsize())
+
+
+def default_root():
+    return str(Path(settings.EXECUTION_CACHE_DIR) / "workspaces")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns this process's workspace pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkspacePool(
+                settings.WORKSPACE_ROOT or default_root(),
+                settings.WORKSPACE_POOL_SIZE,
+                settings.WORKSPACE_QUOTA_MB * 1024 * 1024,
+            )
+        return _pool
+
+
+def checkout():
+    """A workspace for one compile-and-run job; use as ``with workspaces.checkout() as temp_dir``."""
+    return get_pool().checkout()
@@ -0,0 +1,209 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.StandardLocation;
+import javax.tools.ToolProvider;
+
+/**
+ * Long-running javac daemon used by editor/javac_service.py.
+ *
+ * Keeps one JavaCompiler and its platform file manager warm and compiles
+ * sources entirely in memory: sources come in on stdin, class bytes and
+ * structured diagnostics go back on stdout.
+ *
+ * Request:  int fileCount, fileCount x (bytes name, bytes source), bytes classpath
+ * Response: int status, long compileNanos,
+ *           int classCount, classCount x (bytes binaryName, bytes classFile),
+ *           int diagCount, diagCount x (bytes kind, bytes file, long line, long column, bytes message)
+ * where "bytes" is an int length followed by that many (UTF-8) bytes and
+ * status is 0 = compiled, 1 = compile errors, 2 = compiler crashed.
+ *
+ * The platform file manager is shared between requests, so each request
+ * sets its class path on it (empty when none is given) rather than passing
+ * -classpath, which would stay in effect for the requests after it.
+ */
+public class CompileServer {
+    static final int STATUS_OK = 0;
+    static final int STATUS_ERRORS = 1;
+    static final int STATUS_CRASHED = 2;
+
+    public static void main(String[] args) throws IOException {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        StandardJavaFileManager platform = compiler.getStandardFileManager(null, Locale.ENGLISH, StandardCharsets.UTF_8);
+        DataInputStream in = new DataInputStream(
+                new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        DataOutputStream out = new DataOutputStream(
+                new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+
+        while (true) {
+            int fileCount;
+            try {
+                fileCount = in.readInt();
+            } catch (EOFException e) {
+                return;
+            }
+            List<JavaFileObject> sources = new ArrayList<>();
+            for (int i = 0; i < fileCount; i++) {
+                String name = readString(in);
+                String code = readString(in);
+                sources.add(new MemorySource(name, code));
+            }
+            String classpath = readString(in);
+            compile(compiler, platform, sources, classpath, out);
+            out.flush();
+        }
+    }
+
+    private static void compile(JavaCompiler compiler, StandardJavaFileManager platform,
+                                List<JavaFileObject> sources, String classpath,
+                                DataOutputStream out) throws IOException {
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        List<File> entries = new ArrayList<>();
+        for (String entry : classpath.split(File.pathSeparator)) {
+            if (!entry.isEmpty()) {
+                entries.add(new File(entry));
+            }
+        }
+        MemoryFileManager fileManager = new MemoryFileManager(platform);
+        List<String> options = List.of("-proc:none");
+
+        int status;
+        String crash = null;
+        long start = System.nanoTime();
+        try {
+            platform.setLocation(StandardLocation.CLASS_PATH, entries);
+            boolean ok = compiler.getTask(null, fileManager, diagnostics, options, null, sources).call();
+            status = ok ? STATUS_OK : STATUS_ERRORS;
+        } catch (IOException | RuntimeException e) {
+            status = STATUS_CRASHED;
+            crash = String.valueOf(e);
+        }
+        long elapsed = System.nanoTime() - start;
+
+        out.writeInt(status);
+        out.writeLong(elapsed);
+
+        Map<String, MemoryClass> classes = status == STATUS_OK ? fileManager.classes : Map.of();
+        out.writeInt(classes.size());
+        for (Map.Entry<String, MemoryClass> entry : classes.entrySet()) {
+            writeString(out, entry.getKey());
+            writeBytes(out, entry.getValue().bytes.toByteArray());
+        }
+
+        List<Diagnostic<? extends JavaFileObject>> found = diagnostics.getDiagnostics();
+        out.writeInt(found.size() + (crash == null ? 0 : 1));
+        for (Diagnostic<? extends JavaFileObject> d : found) {
+            writeString(out, d.getKind().name());
+            writeString(out, d.getSource() == null ? "" : fileName(d.getSource()));
+            out.writeLong(d.getLineNumber());
+            out.writeLong(d.getColumnNumber());
+            writeString(out, d.getMessage(Locale.ENGLISH));
+        }
+        if (crash != null) {
+            writeString(out, Diagnostic.Kind.ERROR.name());
+            writeString(out, "");
+            out.writeLong(Diagnostic.NOPOS);
+            out.writeLong(Diagnostic.NOPOS);
+            writeString(out, "compiler crashed: " + crash);
+        }
+    }
+
+    private static String fileName(JavaFileObject source) {
+        String path = source.toUri().getPath();
+        return path.startsWith("/") ? path.substring(1) : path;
+    }
+
+    private static byte[] readBytes(DataInputStream in) throws IOException {
+        byte[] data = new byte[in.readInt()];
+        in.readFully(data);
+        return data;
+    }
+
+    private static String readString(DataInputStream in) throws IOException {
+        return new String(readBytes(in), StandardCharsets.UTF_8);
+    }
+
+    private static void writeBytes(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+
+    private static void writeString(DataOutputStream out, String value) throws IOException {
+        writeBytes(out, value.getBytes(StandardCharsets.UTF_8));
+    }
+
+    /** A source file held in memory under its file name (e.g. "Main.java"). */
+    static final class MemorySource extends SimpleJavaFileObject {
+        private final String code;
+
+        MemorySource(String name, String code) {
+            super(URI.create("string:///" + name), Kind.SOURCE);
+            this.code = code;
+        }
+
+        @Override
+        public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+            return code;
+        }
+    }
+
+    /** A class file javac writes into memory instead of onto disk. */
+    static final class MemoryClass extends SimpleJavaFileObject {
+        final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+
+        MemoryClass(String binaryName) {
+            super(URI.create("bytes:///" + binaryName.replace('.', '/') + Kind.CLASS.extension), Kind.CLASS);
+        }
+
+        @Override
+        public OutputStream openOutputStream() {
+            return bytes;
+        }
+    }
+
+    /** Reads platform/classpath classes as usual, keeps compiler output in memory. */
+    static final class MemoryFileManager extends ForwardingJavaFileManager<StandardJavaFileManager> {
+        final Map<String, MemoryClass> classes = new LinkedHashMap<>();
+
+        MemoryFileManager(StandardJavaFileManager platform) {
+            super(platform);
+        }
+
+        @Override
+        public JavaFileObject getJavaFileForOutput(Location location, String className,
+                                                   JavaFileObject.Kind kind, FileObject sibling) {
+            MemoryClass output = new MemoryClass(className);
+            classes.put(className, output);
+            return output;
+        }
+
+        @Override
+        public void close() {
+            // The platform file manager is shared across requests; keep it open.
+        }
+    }
+}
@@ -0,0 +1,502 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.management.MemoryUsage;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.Field;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+
+import jdk.jshell.DeclarationSnippet;
+import jdk.jshell.Diag;
+import jdk.jshell.JShell;
+import jdk.jshell.Snippet;
+import jdk.jshell.SnippetEvent;
+import jdk.jshell.SourceCodeAnalysis;
+import jdk.jshell.TypeDeclSnippet;
+
+/**
+ * Long-lived JShell runner used by editor/jshell_pool.py: grades UNIT
+ * submissions without a javac or java launch.
+ *
+ * Request:  int fileCount, fileCount x (bytes name, bytes source),
+ *           int caseCount, caseCount x (bytes methodName, bytes argTypes, bytes argsJson),
+ *           long timeoutMillis, long maxOutputBytes, int maxThreads, long stackBytes, long cpuNanos
+ * Response: int compileStatus, long evalNanos,
+ *           int diagnosticCount, diagnosticCount x (bytes kind, bytes file, long line, long column, bytes message),
+ *           then, if the files compiled, one frame per case as MultiCaseHarness writes them
+ *           (int index, int status, long elapsedNanos, bytes stdout, bytes stderr, bytes value)
+ *           and finally long retainedHeap
+ * where "bytes" is an int length followed by that many (UTF-8) bytes.
+ *
+ * The files are evaluated snippet by snippet in a JShell session that runs
+ * code inside this JVM (the "local" execution engine), and each case calls
+ * the method through MultiCaseHarness's unit-mode argument conversion, which
+ * must be on the classpath. As in a .java file, only imports and type
+ * declarations are accepted: any other snippet is reported, never run, and
+ * so is a type declared twice. A session serves one request and is then
+ * closed; the next one is created and warmed up while the runner waits.
+ * Unless no loaded class has static state, every case after the first gets
+ * a fresh session, so nothing leaks between cases. A case stopped at a limit
+ * (or one that leaves threads running) ends the runner right after its
+ * frame, without the trailer; the pool starts a new one.
+ */
+public class JShellRunner {
+    static final int COMPILED = 0;
+    static final int COMPILE_ERRORS = 1;
+
+    static final int STATUS_OK = 0;
+    static final int STATUS_ERROR = 1;
+    static final int STATUS_OUTPUT_LIMIT = 3;
+    static final int STATUS_MEMORY_LIMIT = 4;
+    static final int STATUS_THREAD_LIMIT = 5;
+    static final int STATUS_TIMEOUT = 6;
+    static final int STATUS_CPU_LIMIT = 7;
+
+    private static final long WATCH_MILLIS = 10;
+    // how a snippet hands a class it declared back to the runner
+    private static final String TARGET_PROPERTY = "codeeditor.jshell.target";
+
+    private static final PrintStream REAL_ERR = System.err;
+    private static final PrintStream NULL_OUT = new PrintStream(OutputStream.nullOutputStream());
+
+    private static Method unitCall;
+    private static JShell session;
+
+    public static void main(String[] args) throws Exception {
+        unitCall = Class.forName("MultiCaseHarness$Unit")
+                .getDeclaredMethod("call", Class.class, String.class, String.class, String.class);
+        unitCall.setAccessible(true);
+
+        DataInputStream requests = new DataInputStream(
+                new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        DataOutputStream control = new DataOutputStream(
+                new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        // Nothing but response frames may reach the real stdout.
+        System.setOut(NULL_OUT);
+
+        session = newSession();
+        while (true) {
+            String[][] files;
+            try {
+                files = new String[requests.readInt()][];
+            } catch (EOFException e) {
+                break;  // the pool closed our stdin
+            }
+            for (int i = 0; i < files.length; i++) {
+                files[i] = new String[]{readText(requests), readText(requests)};
+            }
+            String[][] cases = new String[requests.readInt()][];
+            for (int i = 0; i < cases.length; i++) {
+                cases[i] = new String[]{readText(requests), readText(requests), readText(requests)};
+            }
+            long timeoutMillis = requests.readLong();
+            long maxOutputBytes = requests.readLong();
+            int maxThreads = requests.readInt();
+            long stackBytes = requests.readLong();
+            long cpuNanos = requests.readLong();
+
+            boolean tainted = serve(files, cases, control,
+                    new long[]{timeoutMillis, maxOutputBytes, maxThreads, stackBytes, cpuNanos});
+            if (tainted) {
+                Runtime.getRuntime().halt(0);
+            }
+            control.writeLong(retainedHeap());
+            control.flush();
+            session.close();
+            session = newSession();
+        }
+        Runtime.getRuntime().halt(0);
+    }
+
+    /** A session with the compiler already loaded and warm. */
+    private static JShell newSession() {
+        JShell fresh = JShell.builder()
+                .executionEngine("local")
+                .in(new ByteArrayInputStream(new byte[0]))
+                .out(NULL_OUT)
+                .err(NULL_OUT)
+                .build();
+        for (SnippetEvent event : fresh.eval("int warmUp = 1;")) {
+            fresh.drop(event.snippet());
+        }
+        return fresh;
+    }
+
+    /** Answers one request. Returns true when a case left this JVM unfit for another. */
+    private static boolean serve(String[][] files, String[][] cases, DataOutputStream control, long[] limits)
+            throws IOException {
+        long start = System.nanoTime();
+        List<Object[]> diagnostics = new ArrayList<>();
+        Map<String, Class<?>> classes = load(files, diagnostics);
+        boolean compiled = classes != null && diagnostics.isEmpty();
+
+        control.writeInt(compiled ? COMPILED : COMPILE_ERRORS);
+        control.writeLong(System.nanoTime() - start);
+        control.writeInt(diagnostics.size());
+        for (Object[] d : diagnostics) {
+            writeText(control, (String) d[0]);
+            writeText(control, (String) d[1]);
+            control.writeLong((Long) d[2]);
+            control.writeLong((Long) d[3]);
+            writeText(control, (String) d[4]);
+        }
+        control.flush();
+        if (!compiled) {
+            return false;
+        }
+
+        boolean stateful = classes.values().stream().anyMatch(JShellRunner::hasStaticState);
+        for (int i = 0; i < cases.length; i++) {
+            if (i > 0 && stateful) {
+                session.close();
+                session = newSession();
+                classes = load(files, new ArrayList<>());
+                if (classes == null) {
+                    return true;  // loaded before, so this JVM is the problem
+                }
+            }
+            if (runCase(i, classes.get("Main"), cases[i], control, limits)) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /**
+     * Evaluates every file and returns the classes they declare by name, Main
+     * among them, or null. Problems go to diagnostics as
+     * {kind, file, line, column, message}.
+     */
+    private static Map<String, Class<?>> load(String[][] files, List<Object[]> diagnostics) {
+        SourceCodeAnalysis analysis = session.sourceCodeAnalysis();
+        List<String> types = new ArrayList<>();
+        for (String[] file : files) {
+            String name = file[0];
+            String text = file[1];
+            String remaining = text;
+            while (!remaining.isBlank()) {
+                int offset = text.length() - remaining.length();
+                while (Character.isWhitespace(text.charAt(offset))) {
+                    offset++;
+                }
+                SourceCodeAnalysis.CompletionInfo info = analysis.analyzeCompletion(remaining);
+                // an incomplete snippet is evaluated as it is, for its errors
+                String source = info.source() != null ? info.source() : remaining;
+                remaining = info.source() != null ? info.remaining() : "";
+                int at = offset;
+                String rejected = reject(analysis.sourceToSnippets(source), types);
+                if (rejected != null) {
+                    long[] position = lineAndColumn(text, at);
+                    diagnostics.add(new Object[]{"ERROR", name, position[0], position[1], rejected});
+                    continue;  // never evaluated, so never run
+                }
+                for (SnippetEvent event : session.eval(source)) {
+                    if (event.causeSnippet() != null) {
+                        continue;  // an update to an earlier snippet, reported with it
+                    }
+                    session.diagnostics(event.snippet())
+                            .filter(Diag::isError)
+                            .forEach(diag -> diagnostics.add(diagnostic(name, text, at, diag)));
+                }
+            }
+        }
+        // names still unresolved once every file is in, like javac's "cannot find symbol"
+        session.snippets().forEach(snippet -> {
+            Snippet.Status status = session.status(snippet);
+            if (snippet instanceof DeclarationSnippet && (status == Snippet.Status.RECOVERABLE_DEFINED
+                    || status == Snippet.Status.RECOVERABLE_NOT_DEFINED)) {
+                session.unresolvedDependencies((DeclarationSnippet) snippet).forEach(missing ->
+                        diagnostics.add(new Object[]{"ERROR", "", 0L, 0L, "cannot find symbol: " + missing}));
+            }
+        });
+
+        Map<String, Class<?>> classes = new LinkedHashMap<>();
+        for (String type : types) {
+            session.eval("System.getProperties().put(\"" + TARGET_PROPERTY + "\", " + type + ".class);");
+            Object loaded = System.getProperties().remove(TARGET_PROPERTY);
+            if (loaded instanceof Class) {
+                classes.put(type, (Class<?>) loaded);
+            }
+        }
+        if (!classes.containsKey("Main")) {
+            if (diagnostics.isEmpty()) {
+                diagnostics.add(new Object[]{"ERROR", "Main.java", 0L, 0L, "class Main is missing"});
+            }
+            return null;
+        }
+        return classes;
+    }
+
+    /**
+     * Why a piece of source cannot be part of a .java file (it is a method,
+     * variable or statement, or redeclares a type), or null. Declared type
+     * names are added to ``types``.
+     */
+    private static String reject(List<Snippet> snippets, List<String> types) {
+        for (Snippet snippet : snippets) {
+            switch (snippet.kind()) {
+                case TYPE_DECL:
+                    String type = ((TypeDeclSnippet) snippet).name();
+                    if (types.contains(type)) {
+                        return "duplicate class: " + type;
+                    }
+                    types.add(type);
+                    break;
+                case IMPORT:
+                case ERRONEOUS:  // evaluated for its errors, which stop the request before any case runs
+                    break;
+                default:
+                    return "class, interface, enum, or record expected";
+            }
+        }
+        return null;
+    }
+
+    private static Object[] diagnostic(String file, String text, int offset, Diag diag) {
+        long[] position = lineAndColumn(text, offset + Math.max(0, (int) diag.getStartPosition()));
+        return new Object[]{"ERROR", file, position[0], position[1], diag.getMessage(Locale.ROOT)};
+    }
+
+    /** 1-based {line, column} of an offset into text. */
+    private static long[] lineAndColumn(String text, int offset) {
+        int position = Math.max(0, Math.min(text.length(), offset));
+        long line = 1;
+        long lineStart = 0;
+        for (int i = 0; i < position; i++) {
+            if (text.charAt(i) == '\n') {
+                line++;
+                lineStart = i + 1;
+            }
+        }
+        return new long[]{line, position - lineStart + 1};
+    }
+
+    /** True when a class (or a class nested in it) has state a case could change for the next. */
+    private static boolean hasStaticState(Class<?> type) {
+        for (Field field : type.getDeclaredFields()) {
+            int modifiers = field.getModifiers();
+            if (Modifier.isStatic(modifiers) && !field.isSynthetic()
+                    && (!Modifier.isFinal(modifiers)
+                        || !(field.getType().isPrimitive() || field.getType() == String.class))) {
+                return true;
+            }
+        }
+        for (Class<?> nested : type.getDeclaredClasses()) {
+            if (hasStaticState(nested)) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /** Runs one case and writes its frame. Returns true when it left this JVM unfit for another. */
+    private static boolean runCase(int index, Class<?> target, String[] call, DataOutputStream control, long[] limits)
+            throws IOException {
+        long timeoutMillis = limits[0];
+        long maxThreads = limits[2];
+        long stackBytes = limits[3];
+        long cpuNanos = limits[4];
+        long[] budget = {limits[1]};  // stdout and stderr share one output budget
+        CappedOutputStream out = new CappedOutputStream(budget);
+        CappedOutputStream err = new CappedOutputStream(budget);
+        String[] value = new String[1];
+        long caseStart = System.nanoTime();
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+        System.setOut(new PrintStream(out, true, StandardCharsets.UTF_8));
+        System.setErr(new PrintStream(err, true, StandardCharsets.UTF_8));
+
+        int status = STATUS_OK;
+        boolean tainted;
+        try {
+            ThreadGroup group = new ThreadGroup("case-" + index);
+            Throwable[] failure = new Throwable[1];
+            Thread job = new Thread(group, () -> {
+                try {
+                    value[0] = (String) unitCall.invoke(null, target, call[0], call[1], call[2]);
+                } catch (Throwable e) {
+                    failure[0] = e;
+                }
+            }, "main", stackBytes);
+            job.setContextClassLoader(target.getClassLoader());
+            job.start();
+
+            long deadline = caseStart + timeoutMillis * 1_000_000L;
+            CpuMeter cpu = new CpuMeter();
+            while (hasLiveThreads(group, true)) {
+                if (job.isAlive()) {
+                    job.join(WATCH_MILLIS);
+                } else {
+                    Thread.sleep(WATCH_MILLIS);
+                }
+                if (out.overflowed() || err.overflowed()) {
+                    status = STATUS_OUTPUT_LIMIT;
+                    break;
+                }
+                if (maxThreads > 0 && group.activeCount() > maxThreads) {
+                    status = STATUS_THREAD_LIMIT;
+                    break;
+                }
+                if (System.nanoTime() > deadline) {
+                    status = STATUS_TIMEOUT;
+                    break;
+                }
+                if (cpuNanos > 0 && cpu.sample(group) > cpuNanos) {
+                    status = STATUS_CPU_LIMIT;
+                    break;
+                }
+            }
+            if (status == STATUS_OK && (out.overflowed() || err.overflowed())) {
+                status = STATUS_OUTPUT_LIMIT;
+            } else if (status == STATUS_OK && failure[0] != null) {
+                Throwable cause = failure[0];
+                // unwrap Method.invoke twice: the runner's call of Unit.call, then Unit.call's of the method
+                while (cause instanceof InvocationTargetException && cause.getCause() != null) {
+                    cause = cause.getCause();
+                }
+                status = cause instanceof OutOfMemoryError ? STATUS_MEMORY_LIMIT : STATUS_ERROR;
+                System.err.print("Exception in thread \"main\" ");
+                cause.printStackTrace();
+            }
+            tainted = status >= STATUS_OUTPUT_LIMIT || hasLiveThreads(group, false);
+        } finally {
+            System.out.flush();
+            System.err.flush();
+            System.setOut(NULL_OUT);
+            System.setErr(REAL_ERR);
+        }
+
+        control.writeInt(index);
+        control.writeInt(status);
+        control.writeLong(System.nanoTime() - caseStart);
+        writeBytes(control, out.toByteArray());
+        writeBytes(control, err.toByteArray());
+        writeBytes(control, value[0] == null || status != STATUS_OK
+                ? new byte[0] : value[0].getBytes(StandardCharsets.UTF_8));
+        control.flush();
+        return tainted;
+    }
+
+    private static boolean hasLiveThreads(ThreadGroup group, boolean nonDaemonOnly) {
+        Thread[] threads = new Thread[group.activeCount() + 8];
+        int count = group.enumerate(threads);
+        for (int i = 0; i < count; i++) {
+            if (threads[i].isAlive() && !(nonDaemonOnly && threads[i].isDaemon())) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /** Heap still in use after the last collection, summed over the heap pools. */
+    private static long retainedHeap() {
+        long used = 0;
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() != MemoryType.HEAP) {
+                continue;
+            }
+            MemoryUsage usage = pool.getCollectionUsage();
+            if (usage == null) {
+                usage = pool.getUsage();
+            }
+            used += usage.getUsed();
+        }
+        return used;
+    }
+
+    private static String readText(DataInputStream in) throws IOException {
+        byte[] data = new byte[in.readInt()];
+        in.readFully(data);
+        return new String(data, StandardCharsets.UTF_8);
+    }
+
+    private static void writeText(DataOutputStream out, String text) throws IOException {
+        writeBytes(out, text.getBytes(StandardCharsets.UTF_8));
+    }
+
+    private static void writeBytes(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+
+    /** CPU time of a thread group's threads, counting the ones that have ended by their last sample. */
+    static final class CpuMeter {
+        private final ThreadMXBean threads = ManagementFactory.getThreadMXBean();
+        private final Map<Long, Long> seen = new HashMap<>();
+
+        long sample(ThreadGroup group) {
+            Thread[] live = new Thread[group.activeCount() + 8];
+            int count = group.enumerate(live);
+            for (int i = 0; i < count; i++) {
+                long nanos = threads.getThreadCpuTime(live[i].getId());
+                if (nanos > 0) {
+                    seen.put(live[i].getId(), nanos);
+                }
+            }
+            long total = 0;
+            for (long nanos : seen.values()) {
+                total += nanos;
+            }
+            return total;
+        }
+    }
+
+    /** Collects a case's output until the shared budget runs out, then drops the rest. */
+    static final class CappedOutputStream extends OutputStream {
+        private final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+        private final long[] budget;
+        private volatile boolean overflowed;
+
+        CappedOutputStream(long[] budget) {
+            this.budget = budget;
+        }
+
+        @Override
+        public void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public void write(byte[] data, int off, int len) {
+            synchronized (budget) {
+                int kept = (int) Math.min(len, Math.max(budget[0], 0));
+                bytes.write(data, off, kept);
+                budget[0] -= len;
+                if (kept < len) {
+                    overflowed = true;
+                }
+            }
+        }
+
+        boolean overflowed() {
+            return overflowed;
+        }
+
+        byte[] toByteArray() {
+            synchronized (budget) {
+                return bytes.toByteArray();
+            }
+        }
+    }
+}
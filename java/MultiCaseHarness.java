@@ -0,0 +1,711 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.Array;
+import java.lang.reflect.Constructor;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collection;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * Runs every test case of one submission in a single JVM, used by
+ * editor/harness.py.
+ *
+ * Usage:  java MultiCaseHarness mode classpath className timeoutMillis maxOutputBytes maxThreads stackBytes
+ * stdin:  int caseCount, caseCount x (int fieldCount, fieldCount x bytes field)
+ * stdout: one frame per case, written as soon as the case finishes:
+ *         int index, int status, long elapsedNanos, bytes stdout, bytes stderr, bytes value
+ * where "bytes" is an int length followed by that many (UTF-8) bytes.
+ *
+ * In "io" mode, the stdout a running case has printed since the last check is
+ * also sent as a frame with status STATUS_OUTPUT_CHUNK (stderr and value
+ * empty), so the caller can compare it with the expected output and kill the
+ * harness as soon as it goes wrong. The case's own frame still carries the
+ * whole of its stdout.
+ *
+ * In "io" mode a case is (input) or (input, maxOutputBytes): main runs with
+ * input on System.in, and the optional second field lowers the output
+ * budget for that case (editor/comparators.py derives it from the expected
+ * output).
+ * In "unit" mode a case is (methodName, argTypes, argsJson): the named
+ * method of className is called with the JSON arguments converted to the
+ * comma-separated Java types (on a new instance unless it is static), and
+ * value is its return value as JSON. value is empty when nothing was returned.
+ *
+ * Each case loads the class in a fresh class loader, so static state does
+ * not leak between cases, and runs on its own thread with its own
+ * System.in/out/err. A case stopped at a limit (or one that leaves threads
+ * running) may have left the JVM in a bad state, so the harness exits right
+ * after reporting it; the caller starts a new harness for the remaining cases.
+ */
+public class MultiCaseHarness {
+    static final int STATUS_OK = 0;
+    static final int STATUS_ERROR = 1;
+    static final int STATUS_EXITED = 2;
+    static final int STATUS_OUTPUT_LIMIT = 3;
+    static final int STATUS_MEMORY_LIMIT = 4;
+    static final int STATUS_THREAD_LIMIT = 5;
+    static final int STATUS_TIMEOUT = 6;
+    // 7 is PooledRunner's STATUS_CPU_LIMIT
+    static final int STATUS_OUTPUT_CHUNK = 8;
+
+    private static final long WATCH_MILLIS = 10;
+
+    private static final Object LOCK = new Object();
+    private static final PrintStream REAL_ERR = System.err;
+    private static final PrintStream NULL_OUT = new PrintStream(OutputStream.nullOutputStream());
+
+    private static DataOutputStream control;
+    private static int caseIndex;
+    private static long caseStart;
+    private static CappedOutputStream stdoutBuffer;
+    private static CappedOutputStream stderrBuffer;
+    private static int streamed;
+    private static String caseValue;
+    private static boolean running;
+    private static boolean tainted;
+
+    public static void main(String[] args) throws IOException {
+        boolean unit = args[0].equals("unit");
+        String classpath = args[1];
+        String className = args[2];
+        long timeoutMillis = Long.parseLong(args[3]);
+        long maxOutputBytes = Long.parseLong(args[4]);
+        int maxThreads = Integer.parseInt(args[5]);
+        long stackBytes = Long.parseLong(args[6]);
+
+        DataInputStream requests = new DataInputStream(
+                new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        byte[][][] cases = new byte[requests.readInt()][][];
+        for (int i = 0; i < cases.length; i++) {
+            cases[i] = new byte[requests.readInt()][];
+            for (int f = 0; f < cases[i].length; f++) {
+                cases[i][f] = readBytes(requests);
+            }
+        }
+
+        control = new DataOutputStream(
+                new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        // Nothing but result frames may reach the real stdout.
+        System.setOut(NULL_OUT);
+
+        // A case calling System.exit() ends this JVM; still report what it printed.
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> finish(STATUS_EXITED)));
+
+        URL[] urls = toUrls(classpath);
+        for (int i = 0; i < cases.length; i++) {
+            int status = runCase(i, urls, className, unit, cases[i], timeoutMillis, maxOutputBytes, maxThreads, stackBytes);
+            finish(status);
+            if (tainted) {
+                break;
+            }
+        }
+        // Skip the shutdown hook and any threads a case left behind.
+        Runtime.getRuntime().halt(0);
+    }
+
+    private static int runCase(int index, URL[] urls, String className, boolean unit, byte[][] fields,
+                               long timeoutMillis, long maxOutputBytes, int maxThreads, long stackBytes) {
+        // stdout and stderr share one output budget
+        long[] budget = {maxOutputBytes};
+        if (!unit && fields.length > 1) {
+            budget[0] = Math.min(maxOutputBytes, Long.parseLong(text(fields[1])));
+        }
+        CappedOutputStream out = new CappedOutputStream(budget);
+        CappedOutputStream err = new CappedOutputStream(budget);
+        synchronized (LOCK) {
+            caseIndex = index;
+            caseStart = System.nanoTime();
+            stdoutBuffer = out;
+            stderrBuffer = err;
+            streamed = 0;
+            caseValue = null;
+            running = true;
+        }
+        System.setIn(new ByteArrayInputStream(unit ? new byte[0] : fields[0]));
+        System.setOut(new PrintStream(out, true, StandardCharsets.UTF_8));
+        System.setErr(new PrintStream(err, true, StandardCharsets.UTF_8));
+
+        int status = STATUS_OK;
+        try {
+            URLClassLoader loader = new URLClassLoader(urls, ClassLoader.getPlatformClassLoader());
+            ThreadGroup group = new ThreadGroup("case-" + index);
+            Throwable[] failure = new Throwable[1];
+            Thread job = new Thread(group, () -> {
+                try {
+                    Class<?> target = Class.forName(className, true, loader);
+                    if (unit) {
+                        String value = Unit.call(target, text(fields[0]), text(fields[1]), text(fields[2]));
+                        synchronized (LOCK) {
+                            caseValue = value;
+                        }
+                    } else {
+                        Method main = target.getMethod("main", String[].class);
+                        main.setAccessible(true);
+                        main.invoke(null, (Object) new String[0]);
+                    }
+                } catch (Throwable e) {
+                    failure[0] = e;
+                }
+            }, "main", stackBytes);
+            job.setContextClassLoader(loader);
+            job.start();
+
+            // Like a real JVM, the case is over once all of its non-daemon threads are.
+            long deadline = caseStart + timeoutMillis * 1_000_000L;
+            while (hasLiveThreads(group, true)) {
+                if (job.isAlive()) {
+                    job.join(WATCH_MILLIS);
+                } else {
+                    Thread.sleep(WATCH_MILLIS);
+                }
+                if (!unit) {
+                    sendOutput();
+                }
+                if (out.overflowed() || err.overflowed()) {
+                    status = STATUS_OUTPUT_LIMIT;
+                    break;
+                }
+                if (maxThreads > 0 && group.activeCount() > maxThreads) {
+                    status = STATUS_THREAD_LIMIT;
+                    break;
+                }
+                if (System.nanoTime() > deadline) {
+                    status = STATUS_TIMEOUT;
+                    break;
+                }
+            }
+            if (status == STATUS_OK && (out.overflowed() || err.overflowed())) {
+                status = STATUS_OUTPUT_LIMIT;
+            } else if (status == STATUS_OK && failure[0] != null) {
+                Throwable cause = failure[0] instanceof InvocationTargetException
+                        ? failure[0].getCause() : failure[0];
+                status = cause instanceof OutOfMemoryError ? STATUS_MEMORY_LIMIT : STATUS_ERROR;
+                System.err.print("Exception in thread \"main\" ");
+                cause.printStackTrace();
+            }
+            tainted = status >= STATUS_OUTPUT_LIMIT || hasLiveThreads(group, false);
+            if (!tainted) {
+                loader.close();
+            }
+        } catch (Throwable e) {
+            status = STATUS_ERROR;
+            e.printStackTrace();
+        } finally {
+            System.out.flush();
+            System.err.flush();
+            System.setIn(new ByteArrayInputStream(new byte[0]));
+            System.setOut(NULL_OUT);
+            System.setErr(REAL_ERR);
+        }
+        return status;
+    }
+
+    private static boolean hasLiveThreads(ThreadGroup group, boolean nonDaemonOnly) {
+        Thread[] threads = new Thread[group.activeCount() + 8];
+        int count = group.enumerate(threads);
+        for (int i = 0; i < count; i++) {
+            if (threads[i].isAlive() && !(nonDaemonOnly && threads[i].isDaemon())) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /** Sends the stdout the case printed since the last chunk, if there is any. */
+    private static void sendOutput() {
+        synchronized (LOCK) {
+            if (!running) {
+                return;
+            }
+            byte[] chunk = stdoutBuffer.since(streamed);
+            if (chunk.length == 0) {
+                return;
+            }
+            streamed += chunk.length;
+            try {
+                control.writeInt(caseIndex);
+                control.writeInt(STATUS_OUTPUT_CHUNK);
+                control.writeLong(System.nanoTime() - caseStart);
+                writeBytes(control, chunk);
+                writeBytes(control, new byte[0]);
+                writeBytes(control, new byte[0]);
+                control.flush();
+            } catch (IOException ignored) {
+                // The caller has gone away; finish() has nobody to report to either.
+            }
+        }
+    }
+
+    private static void finish(int status) {
+        synchronized (LOCK) {
+            if (!running) {
+                return;
+            }
+            running = false;
+            try {
+                control.writeInt(caseIndex);
+                control.writeInt(status);
+                control.writeLong(System.nanoTime() - caseStart);
+                writeBytes(control, stdoutBuffer.toByteArray());
+                writeBytes(control, stderrBuffer.toByteArray());
+                writeBytes(control, caseValue == null ? new byte[0] : caseValue.getBytes(StandardCharsets.UTF_8));
+                control.flush();
+            } catch (IOException ignored) {
+                // The caller has gone away; nobody is left to report to.
+            }
+        }
+    }
+
+    private static URL[] toUrls(String classpath) throws IOException {
+        String[] entries = classpath.split(File.pathSeparator);
+        URL[] urls = new URL[entries.length];
+        for (int i = 0; i < entries.length; i++) {
+            urls[i] = Paths.get(entries[i]).toUri().toURL();
+        }
+        return urls;
+    }
+
+    private static String text(byte[] data) {
+        return new String(data, StandardCharsets.UTF_8);
+    }
+
+    private static byte[] readBytes(DataInputStream in) throws IOException {
+        byte[] data = new byte[in.readInt()];
+        in.readFully(data);
+        return data;
+    }
+
+    private static void writeBytes(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+
+    /** Calls one method of the submission with JSON arguments and renders what it returns as JSON. */
+    static final class Unit {
+        static String call(Class<?> target, String methodName, String argTypes, String argsJson) throws Exception {
+            List<String> typeNames = splitTypes(argTypes);
+            Object parsed = new Json(argsJson.isBlank() ? "[]" : argsJson).parse();
+            if (!(parsed instanceof List)) {
+                throw new IllegalArgumentException("test arguments must be a JSON array");
+            }
+            List<?> values = (List<?>) parsed;
+            if (values.size() != typeNames.size()) {
+                throw new IllegalArgumentException("expected " + typeNames.size() + " arguments, got " + values.size());
+            }
+
+            Class<?>[] parameterTypes = new Class<?>[typeNames.size()];
+            Object[] arguments = new Object[typeNames.size()];
+            for (int i = 0; i < typeNames.size(); i++) {
+                JavaType type = JavaType.parse(typeNames.get(i));
+                parameterTypes[i] = type.raw;
+                arguments[i] = type.convert(values.get(i));
+            }
+            Method method;
+            try {
+                method = target.getDeclaredMethod(methodName, parameterTypes);
+            } catch (NoSuchMethodException e) {
+                throw new NoSuchMethodException("Main has no method " + methodName + "(" + argTypes + ")");
+            }
+            method.setAccessible(true);
+            Object instance = null;
+            if (!Modifier.isStatic(method.getModifiers())) {
+                Constructor<?> constructor = target.getDeclaredConstructor();
+                constructor.setAccessible(true);
+                instance = constructor.newInstance();
+            }
+            return Json.write(method.invoke(instance, arguments));
+        }
+
+        /** Splits "int[], Map<String, Integer>" on the commas that are not inside <...>. */
+        static List<String> splitTypes(String spec) {
+            List<String> types = new ArrayList<>();
+            int depth = 0;
+            StringBuilder current = new StringBuilder();
+            for (char c : spec.toCharArray()) {
+                if (c == ',' && depth == 0) {
+                    types.add(current.toString().trim());
+                    current.setLength(0);
+                    continue;
+                }
+                depth += c == '<' ? 1 : c == '>' ? -1 : 0;
+                current.append(c);
+            }
+            if (!current.toString().isBlank()) {
+                types.add(current.toString().trim());
+            }
+            return types;
+        }
+    }
+
+    /** A parameter type such as int, String, int[][] or List<Integer>, and how to build it from JSON. */
+    static final class JavaType {
+        private static final Map<String, Class<?>> NAMED = new LinkedHashMap<>();
+
+        static {
+            Class<?>[] known = {int.class, long.class, double.class, float.class, short.class, byte.class,
+                    boolean.class, char.class, Integer.class, Long.class, Double.class, Float.class,
+                    Short.class, Byte.class, Boolean.class, Character.class, String.class, Object.class};
+            for (Class<?> c : known) {
+                NAMED.put(c.getSimpleName(), c);
+            }
+        }
+
+        final Class<?> raw;
+        final JavaType element;  // arrays and lists
+
+        private JavaType(Class<?> raw, JavaType element) {
+            this.raw = raw;
+            this.element = element;
+        }
+
+        static JavaType parse(String spec) {
+            spec = spec.trim();
+            if (spec.endsWith("[]")) {
+                JavaType element = parse(spec.substring(0, spec.length() - 2));
+                return new JavaType(Array.newInstance(element.raw, 0).getClass(), element);
+            }
+            int open = spec.indexOf('<');
+            if (open > 0 && spec.endsWith(">")) {
+                String base = spec.substring(0, open).trim();
+                if (base.equals("List") || base.equals("ArrayList") || base.equals("Collection")) {
+                    Class<?> raw = base.equals("ArrayList") ? ArrayList.class : base.equals("List") ? List.class : Collection.class;
+                    return new JavaType(raw, parse(spec.substring(open + 1, spec.length() - 1)));
+                }
+            }
+            Class<?> named = NAMED.get(spec);
+            if (named == null) {
+                throw new IllegalArgumentException("unsupported argument type: " + spec);
+            }
+            return new JavaType(named, null);
+        }
+
+        Object convert(Object json) {
+            if (json == null) {
+                if (raw.isPrimitive()) {
+                    throw new IllegalArgumentException("null given for " + raw.getSimpleName());
+                }
+                return null;
+            }
+            if (raw.isArray()) {
+                List<?> items = (List<?>) json;
+                Object array = Array.newInstance(element.raw, items.size());
+                for (int i = 0; i < items.size(); i++) {
+                    Array.set(array, i, element.convert(items.get(i)));
+                }
+                return array;
+            }
+            if (element != null) {
+                List<Object> list = new ArrayList<>();
+                for (Object item : (List<?>) json) {
+                    list.add(element.convert(item));
+                }
+                return list;
+            }
+            if (raw == int.class || raw == Integer.class) {
+                return ((Number) json).intValue();
+            } else if (raw == long.class || raw == Long.class) {
+                return ((Number) json).longValue();
+            } else if (raw == double.class || raw == Double.class) {
+                return ((Number) json).doubleValue();
+            } else if (raw == float.class || raw == Float.class) {
+                return ((Number) json).floatValue();
+            } else if (raw == short.class || raw == Short.class) {
+                return ((Number) json).shortValue();
+            } else if (raw == byte.class || raw == Byte.class) {
+                return ((Number) json).byteValue();
+            } else if (raw == char.class || raw == Character.class) {
+                return ((String) json).charAt(0);
+            }
+            return json;  // boolean, String, Object
+        }
+    }
+
+    /** Just enough JSON for test arguments and return values. */
+    static final class Json {
+        private final String text;
+        private int pos;
+
+        Json(String text) {
+            this.text = text;
+        }
+
+        Object parse() {
+            Object value = value();
+            skipWhitespace();
+            if (pos != text.length()) {
+                throw error("trailing characters");
+            }
+            return value;
+        }
+
+        private Object value() {
+            skipWhitespace();
+            if (pos >= text.length()) {
+                throw error("unexpected end");
+            }
+            char c = text.charAt(pos);
+            if (c == '[') {
+                pos++;
+                List<Object> items = new ArrayList<>();
+                skipWhitespace();
+                if (peek(']')) {
+                    return items;
+                }
+                do {
+                    items.add(value());
+                    skipWhitespace();
+                } while (peek(','));
+                expect(']');
+                return items;
+            }
+            if (c == '{') {
+                pos++;
+                Map<String, Object> object = new LinkedHashMap<>();
+                skipWhitespace();
+                if (peek('}')) {
+                    return object;
+                }
+                do {
+                    skipWhitespace();
+                    String key = string();
+                    skipWhitespace();
+                    expect(':');
+                    object.put(key, value());
+                    skipWhitespace();
+                } while (peek(','));
+                expect('}');
+                return object;
+            }
+            if (c == '"') {
+                return string();
+            }
+            if (text.startsWith("true", pos)) {
+                pos += 4;
+                return Boolean.TRUE;
+            }
+            if (text.startsWith("false", pos)) {
+                pos += 5;
+                return Boolean.FALSE;
+            }
+            if (text.startsWith("null", pos)) {
+                pos += 4;
+                return null;
+            }
+            int start = pos;
+            while (pos < text.length() && "+-0123456789.eE".indexOf(text.charAt(pos)) >= 0) {
+                pos++;
+            }
+            String number = text.substring(start, pos);
+            if (number.isEmpty()) {
+                throw error("unexpected character '" + c + "'");
+            }
+            if (number.contains(".") || number.contains("e") || number.contains("E")) {
+                return Double.parseDouble(number);
+            }
+            return Long.parseLong(number);
+        }
+
+        private String string() {
+            expect('"');
+            StringBuilder out = new StringBuilder();
+            while (pos < text.length()) {
+                char c = text.charAt(pos++);
+                if (c == '"') {
+                    return out.toString();
+                }
+                if (c != '\\') {
+                    out.append(c);
+                    continue;
+                }
+                char escaped = text.charAt(pos++);
+                switch (escaped) {
+                    case 'n': out.append('\n'); break;
+                    case 't': out.append('\t'); break;
+                    case 'r': out.append('\r'); break;
+                    case 'b': out.append('\b'); break;
+                    case 'f': out.append('\f'); break;
+                    case 'u':
+                        out.append((char) Integer.parseInt(text.substring(pos, pos + 4), 16));
+                        pos += 4;
+                        break;
+                    default: out.append(escaped);
+                }
+            }
+            throw error("unterminated string");
+        }
+
+        private void skipWhitespace() {
+            while (pos < text.length() && Character.isWhitespace(text.charAt(pos))) {
+                pos++;
+            }
+        }
+
+        private boolean peek(char c) {
+            if (pos < text.length() && text.charAt(pos) == c) {
+                pos++;
+                return true;
+            }
+            return false;
+        }
+
+        private void expect(char c) {
+            if (!peek(c)) {
+                throw error("expected '" + c + "'");
+            }
+        }
+
+        private IllegalArgumentException error(String message) {
+            return new IllegalArgumentException("bad test arguments JSON at " + pos + ": " + message);
+        }
+
+        static String write(Object value) {
+            StringBuilder out = new StringBuilder();
+            write(value, out);
+            return out.toString();
+        }
+
+        private static void write(Object value, StringBuilder out) {
+            if (value == null) {
+                out.append("null");
+            } else if (value instanceof Boolean || value instanceof Integer || value instanceof Long
+                    || value instanceof Short || value instanceof Byte) {
+                out.append(value);
+            } else if (value instanceof Double || value instanceof Float) {
+                double d = ((Number) value).doubleValue();
+                if (Double.isFinite(d)) {
+                    out.append(d);
+                } else {
+                    writeString(String.valueOf(d), out);
+                }
+            } else if (value.getClass().isArray()) {
+                out.append('[');
+                for (int i = 0; i < Array.getLength(value); i++) {
+                    if (i > 0) {
+                        out.append(", ");
+                    }
+                    write(Array.get(value, i), out);
+                }
+                out.append(']');
+            } else if (value instanceof Iterable) {
+                out.append('[');
+                boolean first = true;
+                for (Object item : (Iterable<?>) value) {
+                    if (!first) {
+                        out.append(", ");
+                    }
+                    first = false;
+                    write(item, out);
+                }
+                out.append(']');
+            } else if (value instanceof Map) {
+                out.append('{');
+                boolean first = true;
+                for (Map.Entry<?, ?> entry : ((Map<?, ?>) value).entrySet()) {
+                    if (!first) {
+                        out.append(", ");
+                    }
+                    first = false;
+                    writeString(String.valueOf(entry.getKey()), out);
+                    out.append(": ");
+                    write(entry.getValue(), out);
+                }
+                out.append('}');
+            } else {
+                writeString(String.valueOf(value), out);
+            }
+        }
+
+        private static void writeString(String value, StringBuilder out) {
+            out.append('"');
+            for (char c : value.toCharArray()) {
+                switch (c) {
+                    case '"': out.append("\\\""); break;
+                    case '\\': out.append("\\\\"); break;
+                    case '\n': out.append("\\n"); break;
+                    case '\r': out.append("\\r"); break;
+                    case '\t': out.append("\\t"); break;
+                    default:
+                        if (c < 0x20) {
+                            out.append(String.format("\\u%04x", (int) c));
+                        } else {
+                            out.append(c);
+                        }
+                }
+            }
+            out.append('"');
+        }
+    }
+
+    /** Collects a case's output until the shared budget runs out, then drops the rest. */
+    static final class CappedOutputStream extends OutputStream {
+        private final Buffer bytes = new Buffer();
+        private final long[] budget;
+        private volatile boolean overflowed;
+
+        CappedOutputStream(long[] budget) {
+            this.budget = budget;
+        }
+
+        @Override
+        public void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public void write(byte[] data, int off, int len) {
+            synchronized (budget) {
+                int kept = (int) Math.min(len, Math.max(budget[0], 0));
+                bytes.write(data, off, kept);
+                budget[0] -= len;
+                if (kept < len) {
+                    overflowed = true;
+                }
+            }
+        }
+
+        boolean overflowed() {
+            return overflowed;
+        }
+
+        byte[] toByteArray() {
+            synchronized (budget) {
+                return bytes.toByteArray();
+            }
+        }
+
+        /** What was kept from byte {@code offset} on. */
+        byte[] since(int offset) {
+            synchronized (budget) {
+                return bytes.since(offset);
+            }
+        }
+    }
+
+    /** A ByteArrayOutputStream that can copy out just its tail. */
+    static final class Buffer extends ByteArrayOutputStream {
+        byte[] since(int offset) {
+            return Arrays.copyOfRange(buf, Math.min(offset, count), count);
+        }
+    }
+}
@@ -0,0 +1,363 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.management.MemoryUsage;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.Map;
+
+/**
+ * Long-lived runner JVM used by editor/jvm_pool.py.
+ *
+ * Reads one job at a time from stdin, loads the job's main class in a
+ * throwaway class loader, points System.in/System.out/System.err at the job's
+ * input and capture buffers, calls main on a fresh thread, and writes the
+ * result back on the original stdout.
+ *
+ * Request:  bytes classpath, bytes className, bytes input,
+ *           long maxOutputBytes, int maxThreads, long stackBytes, long cpuNanos
+ * Response: int status, long retainedHeap, boolean lingering, bytes stdout, bytes stderr
+ * where "bytes" is an int length followed by that many (UTF-8) bytes.
+ *
+ * While the job runs, the stdout it has printed since the last check is sent
+ * ahead of the response as (int STATUS_OUTPUT_CHUNK, bytes chunk), so the
+ * pool can compare it with the expected output and kill this JVM as soon as
+ * it goes wrong. The response still carries the whole of stdout.
+ *
+ * A job is over once every non-daemon thread it started has ended, as in a
+ * JVM of its own. If threads of it are still alive after that (daemons, or
+ * threads cut short by a limit), the response says so and the pool retires
+ * this JVM instead of running another job next to them.
+ *
+ * CPU time is the summed CPU time of the job's threads, checked while it
+ * runs (0 means no limit). The wall-clock limit is enforced by the pool,
+ * which kills this JVM when a job does not answer in time.
+ */
+public class PooledRunner {
+    static final int STATUS_OK = 0;
+    static final int STATUS_ERROR = 1;
+    static final int STATUS_EXITED = 2;
+    static final int STATUS_OUTPUT_LIMIT = 3;
+    static final int STATUS_MEMORY_LIMIT = 4;
+    static final int STATUS_THREAD_LIMIT = 5;
+    // 6 is MultiCaseHarness's STATUS_TIMEOUT
+    static final int STATUS_CPU_LIMIT = 7;
+    static final int STATUS_OUTPUT_CHUNK = 8;
+
+    private static final long WATCH_MILLIS = 20;
+
+    private static final Object LOCK = new Object();
+    private static final PrintStream REAL_ERR = System.err;
+    private static final PrintStream NULL_OUT = new PrintStream(OutputStream.nullOutputStream());
+
+    private static DataOutputStream control;
+    private static CappedOutputStream stdoutBuffer;
+    private static CappedOutputStream stderrBuffer;
+    private static int streamed;
+    private static boolean running;
+    private static boolean lingering;
+
+    public static void main(String[] args) throws IOException {
+        DataInputStream requests = new DataInputStream(
+                new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        control = new DataOutputStream(
+                new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        // Nothing but result frames may reach the real stdout.
+        System.setOut(NULL_OUT);
+
+        // A program calling System.exit() ends this JVM; still report what it
+        // printed so the pool can answer the request before replacing us.
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> finish(STATUS_EXITED)));
+
+        while (true) {
+            String classpath;
+            try {
+                classpath = readString(requests);
+            } catch (EOFException e) {
+                return;
+            }
+            String className = readString(requests);
+            byte[] input = readBytes(requests);
+            long maxOutputBytes = requests.readLong();
+            int maxThreads = requests.readInt();
+            long stackBytes = requests.readLong();
+            long cpuNanos = requests.readLong();
+            finish(runJob(classpath, className, input, maxOutputBytes, maxThreads, stackBytes, cpuNanos));
+        }
+    }
+
+    private static int runJob(String classpath, String className, byte[] input,
+                              long maxOutputBytes, int maxThreads, long stackBytes, long cpuNanos) {
+        // stdout and stderr share one output budget
+        long[] budget = {maxOutputBytes};
+        CappedOutputStream out = new CappedOutputStream(budget);
+        CappedOutputStream err = new CappedOutputStream(budget);
+        synchronized (LOCK) {
+            stdoutBuffer = out;
+            stderrBuffer = err;
+            streamed = 0;
+            running = true;
+            lingering = false;
+        }
+        System.setIn(new ByteArrayInputStream(input));
+        System.setOut(new PrintStream(out, true, StandardCharsets.UTF_8));
+        System.setErr(new PrintStream(err, true, StandardCharsets.UTF_8));
+
+        int status = STATUS_OK;
+        URLClassLoader loader = null;
+        try {
+            loader = new URLClassLoader(toUrls(classpath), ClassLoader.getPlatformClassLoader());
+            Method main = Class.forName(className, true, loader).getMethod("main", String[].class);
+            main.setAccessible(true);
+
+            // main runs in its own thread group so the threads it starts can be counted
+            ThreadGroup group = new ThreadGroup("job");
+            Throwable[] failure = new Throwable[1];
+            Thread job = new Thread(group, () -> {
+                try {
+                    main.invoke(null, (Object) new String[0]);
+                } catch (Throwable e) {
+                    failure[0] = e;
+                }
+            }, "main", stackBytes);
+            job.setContextClassLoader(loader);
+            job.start();
+            CpuMeter cpu = new CpuMeter();
+            while (hasLiveThreads(group, true)) {
+                if (job.isAlive()) {
+                    job.join(WATCH_MILLIS);
+                } else {
+                    Thread.sleep(WATCH_MILLIS);
+                }
+                sendOutput();
+                if (out.overflowed() || err.overflowed()) {
+                    status = STATUS_OUTPUT_LIMIT;
+                    break;
+                }
+                if (maxThreads > 0 && group.activeCount() > maxThreads) {
+                    status = STATUS_THREAD_LIMIT;
+                    break;
+                }
+                if (cpuNanos > 0 && cpu.sample(group) > cpuNanos) {
+                    status = STATUS_CPU_LIMIT;
+                    break;
+                }
+            }
+            if (out.overflowed() || err.overflowed()) {
+                status = STATUS_OUTPUT_LIMIT;
+            } else if (status == STATUS_OK && failure[0] != null) {
+                Throwable cause = failure[0] instanceof InvocationTargetException
+                        ? failure[0].getCause() : failure[0];
+                status = cause instanceof OutOfMemoryError ? STATUS_MEMORY_LIMIT : STATUS_ERROR;
+                System.err.print("Exception in thread \"main\" ");
+                cause.printStackTrace();
+            }
+            synchronized (LOCK) {
+                lingering = hasLiveThreads(group, false);
+            }
+        } catch (Throwable e) {
+            status = STATUS_ERROR;
+            e.printStackTrace();
+        } finally {
+            System.out.flush();
+            System.err.flush();
+            System.setIn(new ByteArrayInputStream(new byte[0]));
+            System.setOut(NULL_OUT);
+            System.setErr(REAL_ERR);
+            if (loader != null && status == STATUS_OK && !lingering) {
+                try {
+                    loader.close();
+                } catch (IOException ignored) {
+                    // Only cached jar handles; the pool recycles us eventually.
+                }
+            }
+        }
+        return status;
+    }
+
+    private static void finish(int status) {
+        synchronized (LOCK) {
+            if (!running) {
+                return;
+            }
+            running = false;
+            try {
+                control.writeInt(status);
+                control.writeLong(retainedHeap());
+                control.writeBoolean(lingering);
+                writeBytes(control, stdoutBuffer.toByteArray());
+                writeBytes(control, stderrBuffer.toByteArray());
+                control.flush();
+            } catch (IOException ignored) {
+                // The pool has gone away; nobody is left to report to.
+            }
+        }
+    }
+
+    /** Sends the stdout the job printed since the last chunk, if there is any. */
+    private static void sendOutput() {
+        synchronized (LOCK) {
+            if (!running) {
+                return;
+            }
+            byte[] chunk = stdoutBuffer.since(streamed);
+            if (chunk.length == 0) {
+                return;
+            }
+            streamed += chunk.length;
+            try {
+                control.writeInt(STATUS_OUTPUT_CHUNK);
+                writeBytes(control, chunk);
+                control.flush();
+            } catch (IOException ignored) {
+                // The pool has gone away; finish() has nobody to report to either.
+            }
+        }
+    }
+
+    private static boolean hasLiveThreads(ThreadGroup group, boolean nonDaemonOnly) {
+        Thread[] threads = new Thread[group.activeCount() + 8];
+        int count = group.enumerate(threads);
+        for (int i = 0; i < count; i++) {
+            if (threads[i].isAlive() && !(nonDaemonOnly && threads[i].isDaemon())) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /** Heap still in use after the most recent collection of each heap pool. */
+    private static long retainedHeap() {
+        long used = 0;
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() != MemoryType.HEAP) {
+                continue;
+            }
+            MemoryUsage usage = pool.getCollectionUsage();
+            if (usage == null) {
+                usage = pool.getUsage();
+            }
+            used += usage.getUsed();
+        }
+        return used;
+    }
+
+    private static URL[] toUrls(String classpath) throws IOException {
+        String[] entries = classpath.split(File.pathSeparator);
+        URL[] urls = new URL[entries.length];
+        for (int i = 0; i < entries.length; i++) {
+            urls[i] = Paths.get(entries[i]).toUri().toURL();
+        }
+        return urls;
+    }
+
+    /** Sums the CPU time of a job's threads, remembering those that have ended. */
+    static final class CpuMeter {
+        private final ThreadMXBean threads = ManagementFactory.getThreadMXBean();
+        private final Map<Long, Long> seen = new HashMap<>();
+
+        long sample(ThreadGroup group) {
+            Thread[] live = new Thread[group.activeCount() + 8];
+            int count = group.enumerate(live);
+            for (int i = 0; i < count; i++) {
+                long nanos = threads.getThreadCpuTime(live[i].getId());
+                if (nanos > 0) {
+                    seen.put(live[i].getId(), nanos);
+                }
+            }
+            long total = 0;
+            for (long nanos : seen.values()) {
+                total += nanos;
+            }
+            return total;
+        }
+    }
+
+    /** Collects a job's output until the shared budget runs out, then drops the rest. */
+    static final class CappedOutputStream extends OutputStream {
+        private final Buffer bytes = new Buffer();
+        private final long[] budget;
+        private volatile boolean overflowed;
+
+        CappedOutputStream(long[] budget) {
+            this.budget = budget;
+        }
+
+        @Override
+        public void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public void write(byte[] data, int off, int len) {
+            synchronized (budget) {
+                int kept = (int) Math.min(len, Math.max(budget[0], 0));
+                bytes.write(data, off, kept);
+                budget[0] -= len;
+                if (kept < len) {
+                    overflowed = true;
+                }
+            }
+        }
+
+        boolean overflowed() {
+            return overflowed;
+        }
+
+        byte[] toByteArray() {
+            synchronized (budget) {
+                return bytes.toByteArray();
+            }
+        }
+
+        /** What was kept from byte {@code offset} on. */
+        byte[] since(int offset) {
+            synchronized (budget) {
+                return bytes.since(offset);
+            }
+        }
+    }
+
+    /** A ByteArrayOutputStream that can copy out just its tail. */
+    static final class Buffer extends ByteArrayOutputStream {
+        byte[] since(int offset) {
+            return Arrays.copyOfRange(buf, Math.min(offset, count), count);
+        }
+    }
+
+    private static byte[] readBytes(DataInputStream in) throws IOException {
+        byte[] data = new byte[in.readInt()];
+        in.readFully(data);
+        return data;
+    }
+
+    private static String readString(DataInputStream in) throws IOException {
+        return new String(readBytes(in), StandardCharsets.UTF_8);
+    }
+
+    private static void writeBytes(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+}
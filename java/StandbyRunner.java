@@ -0,0 +1,99 @@
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.Scanner;
+
+/**
+ * Pre-started JVM used by editor/standby.py.
+ *
+ * Starts up, prints "READY" on stdout and blocks reading one control line
+ * from stdin: the program's class directory, a tab and its main class.
+ * It then runs that program's main exactly as "java -cp dir Main" would:
+ * everything after the control line is the program's stdin, stdout and
+ * stderr are the program's own, an uncaught exception ends the JVM with
+ * exit code 1, and the JVM exits when the program's threads are done.
+ * One program per JVM; the pool starts a new one for the next run.
+ */
+public class StandbyRunner {
+    public static void main(String[] args) throws Throwable {
+        // touch the classes nearly every program needs while nobody is waiting
+        new Scanner("0").nextInt();
+        URLClassLoader.class.getName();
+
+        PrintStream out = System.out;
+        out.println("READY");
+        out.flush();
+
+        String line = readControlLine(new FileInputStream(FileDescriptor.in));
+        if (line == null) {
+            return;  // the pool shut down before handing us a program
+        }
+        int tab = line.indexOf('\t');
+        String classDir = line.substring(0, tab);
+        String className = line.substring(tab + 1);
+
+        URLClassLoader loader = new URLClassLoader(
+                new URL[]{Paths.get(classDir).toUri().toURL()}, ClassLoader.getPlatformClassLoader());
+        Thread.currentThread().setContextClassLoader(loader);
+        Method main;
+        try {
+            main = Class.forName(className, true, loader).getMethod("main", String[].class);
+        } catch (ClassNotFoundException | NoSuchMethodException e) {
+            System.err.println("Error: Could not find or load main class " + className);
+            System.err.println("Caused by: " + e);
+            System.exit(1);
+            return;
+        }
+        main.setAccessible(true);
+        try {
+            main.invoke(null, (Object) new String[0]);
+        } catch (InvocationTargetException e) {
+            // let the JVM report it ("Exception in thread "main" ...", exit code 1)
+            Throwable cause = e.getCause();
+            cause.setStackTrace(withoutRunnerFrames(cause.getStackTrace()));
+            throw cause;
+        }
+    }
+
+    /**
+     * Reads bytes up to a newline straight from the stdin file descriptor,
+     * without buffering past it, so System.in starts at the program's input.
+     */
+    private static String readControlLine(InputStream in) throws IOException {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != '\n') {
+            if (b < 0) {
+                return null;
+            }
+            line.write(b);
+        }
+        return line.toString(StandardCharsets.UTF_8);
+    }
+
+    /** The program's own frames: drops the reflective call from this class. */
+    private static StackTraceElement[] withoutRunnerFrames(StackTraceElement[] trace) {
+        int end = trace.length;
+        while (end > 0 && isRunnerFrame(trace[end - 1])) {
+            end--;
+        }
+        return Arrays.copyOf(trace, end);
+    }
+
+    private static boolean isRunnerFrame(StackTraceElement frame) {
+        String name = frame.getClassName();
+        return name.equals(StandbyRunner.class.getName())
+                || name.startsWith("java.lang.reflect.")
+                || name.startsWith("jdk.internal.reflect.");
+    }
+}
@@ -1,8 +1,12 @@
 (function () {
     console.log("manualDiagnostics.js loaded");
 
+    // Wait this long after the last keystroke before asking the server to compile.
+    const CHECK_DELAY_MS = 400;
+
     /**
      * Analyze the content of a single Monaco editor and set markers.
+     * Used when no compile-check endpoint is available, or it fails.
      * @param {monaco.editor.IStandaloneCodeEditor} editorInstance
      */
     function updateManualDiagnostics(editorInstance) {
@@ -95,16 +99,106 @@
     }
 
     /**
-     * Initialize manual diagnostics for multiple editors.
+     * Turn one javac diagnostic ({line, column, severity, message}) into a marker.
+     * javac points at a single column; the marker covers the word there, or
+     * the whole line when there is no column.
+     */
+    function javacMarker(model, d) {
+        const line = Math.min(Math.max(d.line, 1), model.getLineCount());
+        const severity = {
+            error: monaco.MarkerSeverity.Error,
+            warning: monaco.MarkerSeverity.Warning,
+        }[d.severity] || monaco.MarkerSeverity.Info;
+        if (!d.column) {
+            return {
+                startLineNumber: line, startColumn: 1,
+                endLineNumber: line, endColumn: model.getLineMaxColumn(line),
+                message: d.message, severity
+            };
+        }
+        const word = model.getWordAtPosition({lineNumber: line, column: d.column});
+        return {
+            startLineNumber: line,
+            startColumn: d.column,
+            endLineNumber: line,
+            endColumn: word && word.startColumn === d.column ? word.endColumn : d.column + 1,
+            message: d.message,
+            severity
+        };
+    }
+
+    /**
+     * Compiles one editor's code on the server after a pause in typing and
+     * shows javac's diagnostics. A newer edit aborts the request in flight,
+     * and the server drops a check that is overtaken while it waits.
+     */
+    function watchWithCompiler(editorId, editorInstance, checkUrl) {
+        let timer = null;
+        let inFlight = null;
+        let seq = 0;
+
+        async function check() {
+            const model = editorInstance.getModel();
+            if (!model) return;
+            if (inFlight) inFlight.abort();
+            const controller = inFlight = new AbortController();
+            const versionId = model.getAlternativeVersionId();
+
+            const data = new FormData();
+            data.append("code", model.getValue());
+            data.append("editor_id", editorId);
+            data.append("question_id", editorId);  // editors are keyed by question id
+            // increasing across page reloads too, since the server remembers the newest per editor
+            seq = Math.max(seq + 1, Date.now());
+            data.append("seq", String(seq));
+            try {
+                const resp = await fetch(checkUrl, {
+                    method: "POST",
+                    body: data,
+                    signal: controller.signal,
+                    headers: {"X-CSRFToken": document.querySelector('[name=csrfmiddlewaretoken]')?.value || ""}
+                });
+                if (!resp.ok) throw new Error(`compile check failed with ${resp.status}`);
+                const result = await resp.json();
+                // overtaken by a newer check, or the code changed meanwhile
+                if (result.stale || controller !== inFlight || model.getAlternativeVersionId() !== versionId) return;
+                monaco.editor.setModelMarkers(model, 'manualDiagnostics', []);
+                monaco.editor.setModelMarkers(model, 'javac', result.diagnostics.map(d => javacMarker(model, d)));
+            } catch (err) {
+                if (err.name === 'AbortError') return;
+                console.warn("Compile check unavailable, using local diagnostics:", err);
+                monaco.editor.setModelMarkers(model, 'javac', []);
+                updateManualDiagnostics(editorInstance);
+            } finally {
+                if (inFlight === controller) inFlight = null;
+            }
+        }
+
+        editorInstance.onDidChangeModelContent(() => {
+            clearTimeout(timer);
+            timer = setTimeout(check, CHECK_DELAY_MS);
+        });
+        check();  // initial run
+    }
+
+    /**
+     * Initialize diagnostics for multiple editors.
+     * With options.checkUrl, markers come from the server's compile-check
+     * endpoint; without it, from the local heuristics above.
      * @param {Object<string, monaco.editor.IStandaloneCodeEditor>} editorsMap
+     * @param {{checkUrl?: string}} [options]
      */
-    function initManualDiagnostics(editorsMap) {
+    function initManualDiagnostics(editorsMap, options = {}) {
         if (!editorsMap || typeof editorsMap !== 'object') {
             console.warn("initManualDiagnostics: invalid editorsMap provided");
             return;
         }
         console.log("initManualDiagnostics called with editors:", Object.keys(editorsMap));
-        Object.values(editorsMap).forEach(editorInstance => {
+        Object.entries(editorsMap).forEach(([editorId, editorInstance]) => {
+            if (options.checkUrl) {
+                watchWithCompiler(editorId, editorInstance, options.checkUrl);
+                return;
+            }
             editorInstance.onDidChangeModelContent(() => updateManualDiagnostics(editorInstance));
             updateManualDiagnostics(editorInstance);  // initial run
         });
@@ -0,0 +1,63 @@
+(function () {
+    console.log("runJobs.js loaded");
+
+    function socketUrl(path) {
+        const scheme = window.location.protocol === "https:" ? "wss://" : "ws://";
+        return scheme + window.location.host + path;
+    }
+
+    /**
+     * Runs code as a server-side job and streams its progress over a WebSocket.
+     * Resolves with the final verdict (the same JSON run-code returns), or with
+     * the error JSON if the job could not be started. Rejects if the socket
+     * fails before the verdict arrives, so callers can fall back to run-code.
+     * @param {{jobUrl: string, code: string, questionId: string, attemptNo: string,
+     *          onEvent: function(Object)}} options
+     */
+    async function runCodeAsJob({jobUrl, code, questionId, attemptNo, onEvent}) {
+        const response = await fetch(jobUrl, {
+            credentials: 'same-origin',
+            method: "POST",
+            headers: {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-CSRFToken": document.querySelector('[name=csrfmiddlewaretoken]').value
+            },
+            body: new URLSearchParams({
+                code,
+                question_id: questionId,
+                attempt_no: attemptNo
+            })
+        });
+        const job = await response.json();
+        if (!job.job_id) {
+            return job;
+        }
+
+        return new Promise((resolve, reject) => {
+            const socket = new WebSocket(socketUrl(job.ws_url));
+            let lastSeq = -1;
+            let finished = false;
+
+            socket.onmessage = (message) => {
+                const event = JSON.parse(message.data);
+                if (event.seq <= lastSeq) return;
+                lastSeq = event.seq;
+                if (event.type === "done") {
+                    finished = true;
+                    socket.close();
+                    resolve(event.verdict);
+                } else if (onEvent) {
+                    onEvent(event);
+                }
+            };
+            socket.onerror = () => {
+                if (!finished) reject(new Error("run job socket failed"));
+            };
+            socket.onclose = () => {
+                if (!finished) reject(new Error("run job socket closed before the verdict"));
+            };
+        });
+    }
+
+    window.runCodeAsJob = runCodeAsJob;
+})();